@@ -154,12 +154,29 @@ class BaseStreamingKustoResultTable(BaseKustoResultTable):
 class KustoResultTable(BaseKustoResultTable):
     """Iterator over a Kusto result table."""
 
+    # Set while the table is placed in shared memory by `azure.kusto.data.shared_result.SharedResult`
+    _shared_handle = None
+
     def __init__(self, json_table: Dict[str, Any]):
         super().__init__(json_table)
         errors = [row for row in json_table["Rows"] if isinstance(row, dict)]
         if errors:
             raise KustoMultiApiError(errors)
 
+    def _to_json_table(self) -> Dict[str, Any]:
+        """Returns the table in the json form it was parsed from, including the table kind resolved after parsing."""
+        json_table = {"TableName": self.table_name, "TableId": self.table_id, "Columns": self.raw_columns, "Rows": self.raw_rows}
+        if self.table_kind is not None:
+            json_table["TableKind"] = self.table_kind.value
+        return json_table
+
+    def __reduce__(self):
+        # Only the raw rows are pickled - the parsed KustoResultRow objects are rebuilt lazily on the other side.
+        # When the table is shared, only the handle to the shared memory segment is pickled.
+        if self._shared_handle is not None:
+            return self._shared_handle.open, ()
+        return _restore_table, (type(self), self._to_json_table())
+
     @property
     def rows(self) -> List[KustoResultRow]:
         if not self.kusto_result_rows:
@@ -194,6 +211,10 @@ class KustoResultTable(BaseKustoResultTable):
         return json.dumps(d, default=str)
 
 
+def _restore_table(table_type: type, json_table: Dict[str, Any]) -> KustoResultTable:
+    return table_type(json_table)
+
+
 class KustoStreamingResultTable(BaseStreamingKustoResultTable):
     """
     Iterator over a Kusto result table in streaming.
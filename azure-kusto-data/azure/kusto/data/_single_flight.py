@@ -0,0 +1,75 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _SingleFlight:
+    """
+    Coalesces concurrent calls with the same key across threads: while a call for a key is in flight, other callers with the same key wait for it
+    and receive its result (or its exception) instead of making the call themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        self._forget(key)
+        future.set_result(result)
+        return result
+
+    def in_flight_count(self) -> int:
+        return len(self._calls)
+
+    def _forget(self, key: Hashable):
+        with self._lock:
+            del self._calls[key]
+
+
+class _AsyncSingleFlight:
+    """
+    Coalesces concurrent calls with the same key across asyncio tasks.
+    The call runs in its own task, so cancelling one of the waiting callers doesn't cancel the call for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        return await asyncio.shield(task)
+
+    def in_flight_count(self) -> int:
+        return len(self._calls)
+
+    def _on_done(self, key: Hashable, task: "asyncio.Task[Any]"):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved, in case all of the callers were cancelled before the call failed
+        if not task.cancelled():
+            task.exception()
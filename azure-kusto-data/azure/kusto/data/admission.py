@@ -0,0 +1,271 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+from .exceptions import KustoCircuitOpenError, KustoNetworkError, KustoThrottlingError
+
+T = TypeVar("T")
+
+
+class AdmissionController:
+    """
+    Limits the load a client puts on the cluster, before the cluster has to push back with throttling errors:
+    - A token bucket limits the rate of requests. Requests over the rate wait for their turn.
+    - A limit on the amount of requests in flight. Requests over the limit wait, in order, for a request to complete.
+    - A circuit breaker: after `failure_threshold` throttling or network errors within `failure_window`, requests fail fast with
+      `KustoCircuitOpenError` for `cool_down` (or the throttling error's Retry-After delay, if longer). A single probe request is then let through,
+      and the breaker closes if it didn't fail the same way.
+    Enable it with `set_admission_controller` on the sync or aio client. Every request to the service is admitted, including each retry of a
+    retry policy. Share a controller between the clients of a process, sync and aio alike, to limit the process as a whole.
+    """
+
+    DEFAULT_FAILURE_THRESHOLD = 5
+    DEFAULT_FAILURE_WINDOW = timedelta(seconds=10)
+    DEFAULT_COOL_DOWN = timedelta(seconds=30)
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        failure_threshold: Optional[int] = DEFAULT_FAILURE_THRESHOLD,
+        failure_window: timedelta = DEFAULT_FAILURE_WINDOW,
+        cool_down: timedelta = DEFAULT_COOL_DOWN,
+        time_provider: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param Optional[float] requests_per_second: The sustained rate of requests. If not provided, the rate isn't limited.
+        :param Optional[int] burst: The amount of requests that can be sent at once after an idle period. Defaults to one second's worth of requests.
+        :param Optional[int] max_in_flight: The maximum amount of concurrent requests. If not provided, it isn't limited.
+        :param Optional[int] failure_threshold: The amount of errors that opens the circuit breaker. If None, there is no circuit breaker.
+        :param timedelta failure_window: The period the errors are counted over.
+        :param timedelta cool_down: How long the circuit breaker stays open.
+        :param time_provider: Returns the current time in seconds. Used by tests.
+        """
+        if requests_per_second is not None and requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+        if burst is not None and burst <= 0:
+            raise ValueError("burst must be positive")
+        if max_in_flight is not None and max_in_flight <= 0:
+            raise ValueError("max_in_flight must be positive")
+        if failure_threshold is not None and failure_threshold <= 0:
+            raise ValueError("failure_threshold must be positive")
+        self.requests_per_second = requests_per_second
+        self.burst = burst or max(1, int(requests_per_second or 1))
+        self.max_in_flight = max_in_flight
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window.total_seconds()
+        self.cool_down = cool_down.total_seconds()
+        self._time_provider = time_provider
+        self._lock = threading.Lock()
+
+        self._tokens = float(self.burst)
+        self._last_refill = time_provider()
+
+        self._in_flight = 0
+        # Wakes a waiting request, handing it a slot. Returns False if the request can't take it.
+        self._waiters: Deque[Callable[[], bool]] = deque()
+
+        self._failures: Deque[float] = deque()
+        self._open_until: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests are currently rejected by the circuit breaker."""
+        with self._lock:
+            return self._open_until is not None and (self._time_provider() < self._open_until or self._probe_in_flight)
+
+    def _check_circuit(self) -> bool:
+        """Raises if the circuit breaker is open. Returns whether the request is the probe of a breaker that is half-open."""
+        with self._lock:
+            if self._open_until is None:
+                return False
+            now = self._time_provider()
+            if now < self._open_until:
+                raise KustoCircuitOpenError(self._open_until - now)
+            if self._probe_in_flight:
+                raise KustoCircuitOpenError(0)
+            self._probe_in_flight = True
+            return True
+
+    def _reserve_token(self) -> float:
+        """Takes a token, possibly ahead of time. Returns how long to wait for it, in seconds."""
+        if self.requests_per_second is None:
+            return 0
+        with self._lock:
+            now = self._time_provider()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.requests_per_second)
+            self._last_refill = now
+            self._tokens -= 1
+            return 0 if self._tokens >= 0 else -self._tokens / self.requests_per_second
+
+    def _refund_token(self):
+        """Returns the token of a request that wasn't sent after all."""
+        if self.requests_per_second is None:
+            return
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def _take_slot(self, waiter: Callable[[], bool]) -> bool:
+        """Takes a slot if one is free and no one is waiting. Otherwise, queues the waiter and returns False."""
+        with self._lock:
+            if self.max_in_flight is None or (self._in_flight < self.max_in_flight and not self._waiters):
+                self._in_flight += 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def _release_slot(self):
+        with self._lock:
+            while self._waiters:
+                # The slot is handed over, so the count doesn't change
+                if self._waiters.popleft()():
+                    return
+            self._in_flight -= 1
+
+    def _record_result(self, error: Optional[Exception], is_probe: bool):
+        if self.failure_threshold is None:
+            return
+        failed = isinstance(error, (KustoThrottlingError, KustoNetworkError))
+        with self._lock:
+            now = self._time_provider()
+            if is_probe:
+                self._probe_in_flight = False
+                if not failed:
+                    self._open_until = None
+                    self._failures.clear()
+                    return
+            if not failed:
+                return
+            self._failures.append(now)
+            while self._failures and self._failures[0] <= now - self.failure_window:
+                self._failures.popleft()
+            if is_probe or len(self._failures) >= self.failure_threshold:
+                retry_after = error.get_retry_after() if isinstance(error, KustoThrottlingError) else None
+                self._open_until = now + max(self.cool_down, retry_after or 0)
+                self._failures.clear()
+
+    def _abandon_probe(self):
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _acquire(self) -> bool:
+        is_probe = self._check_circuit()
+        delay = self._reserve_token()
+        try:
+            if delay > 0:
+                time.sleep(delay)
+            self._take_slot_sync()
+        except BaseException:
+            # The request won't be sent, so it gives back its token and its probe
+            self._refund_token()
+            if is_probe:
+                self._abandon_probe()
+            raise
+        return is_probe
+
+    def _take_slot_sync(self):
+        event = threading.Event()
+
+        def wake() -> bool:
+            event.set()
+            return True
+
+        if self._take_slot(wake):
+            return
+        try:
+            event.wait()
+        except BaseException:
+            # Interrupted, e.g. by a KeyboardInterrupt. If the slot was handed over meanwhile it is released, otherwise the waiter is dequeued.
+            with self._lock:
+                handed_over = wake not in self._waiters
+                if not handed_over:
+                    self._waiters.remove(wake)
+            if handed_over:
+                self._release_slot()
+            raise
+
+    async def _acquire_async(self) -> bool:
+        is_probe = self._check_circuit()
+        delay = self._reserve_token()
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._take_slot_async()
+        except BaseException:
+            self._refund_token()
+            if is_probe:
+                self._abandon_probe()
+            raise
+        return is_probe
+
+    async def _take_slot_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def hand_over():
+            # Runs on the waiter's loop. A waiter that was cancelled meanwhile passes the slot on.
+            if future.done():
+                self._release_slot()
+            else:
+                future.set_result(None)
+
+        def wake() -> bool:
+            try:
+                loop.call_soon_threadsafe(hand_over)
+            except RuntimeError:
+                # The waiter's loop was closed
+                return False
+            return True
+
+        if self._take_slot(wake):
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                woken = wake not in self._waiters
+                if not woken:
+                    self._waiters.remove(wake)
+            # If the slot was handed over before the cancellation, it is released here, otherwise by hand_over
+            if woken and future.done() and not future.cancelled():
+                self._release_slot()
+            raise
+
+
+def _execute_admitted(controller: AdmissionController, send: Callable[[], T]) -> T:
+    """Sends a request once the controller admits it, and reports its outcome to the circuit breaker."""
+    is_probe = controller._acquire()
+    error = None
+    try:
+        return send()
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        controller._release_slot()
+        controller._record_result(error, is_probe)
+
+
+async def _execute_admitted_async(controller: AdmissionController, send: Callable[[], Awaitable[T]]) -> T:
+    """The aio equivalent of `_execute_admitted`."""
+    is_probe = await controller._acquire_async()
+    error = None
+    try:
+        return await send()
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        controller._release_slot()
+        controller._record_result(error, is_probe)
@@ -1,6 +1,8 @@
+import asyncio
+import functools
 import io
 from datetime import timedelta
-from typing import Optional, Union
+from typing import AsyncIterator, Iterable, List, Optional, Union
 
 from azure.core.tracing import SpanKind
 from azure.core.tracing.decorator_async import distributed_trace_async
@@ -8,14 +10,20 @@ from azure.core.tracing.decorator_async import distributed_trace_async
 from .response import KustoStreamingResponseDataSet
 from .._decorators import aio_documented_by, documented_by
 from .._telemetry import MonitoredActivity, Span
+from ..admission import _execute_admitted_async
+from ..bulk import QueryRequest, QueryResult, _to_query_requests
 from ..aio.streaming_response import JsonTokenReader, StreamingDataSetEnumerator
 from ..client import KustoClient as KustoClientSync
 from ..client_base import ExecuteRequestParams, _KustoClientBase
 from ..client_request_properties import ClientRequestProperties
 from ..data_format import DataFormat
 from ..exceptions import KustoAioSyntaxError, KustoClosedError, KustoNetworkError
+from ..hedging import _execute_hedged_async
 from ..kcsb import KustoConnectionStringBuilder
+from ..operations import OperationHandle, _AsyncOperationPoller, _get_operation_id
 from ..response import KustoResponseDataSet
+from ..retry import _execute_with_retry_policy_async
+from ..scheduler import _execute_scheduled_async
 
 try:
     from aiohttp import ClientResponse, ClientSession
@@ -30,12 +38,14 @@ class KustoClient(_KustoClientBase):
         super().__init__(kcsb, True)
 
         self._session = ClientSession()
+        self._operation_poller = _AsyncOperationPoller(self)
 
     async def __aenter__(self) -> "KustoClient":
         return self
 
     async def close(self):
         if not self._is_closed:
+            await self._operation_poller.close()
             await self._session.close()
             if self._aad_helper:
                 await self._aad_helper.close_async()
@@ -56,6 +66,39 @@ class KustoClient(_KustoClientBase):
     async def execute_query(self, database: str, query: str, properties: ClientRequestProperties = None) -> KustoResponseDataSet:
         database = self._get_database_or_default(database)
         Span.set_query_attributes(self._kusto_cluster, database, properties)
+        request_key = self._get_request_key(database, query, properties)
+        if request_key is not None and self._query_cache is not None and self._query_cache.blocking_io:
+            get_cached_response = functools.partial(self._get_cached_response, database, query, properties, request_key)
+            cached_response = await asyncio.get_running_loop().run_in_executor(None, get_cached_response)
+        else:
+            cached_response = self._get_cached_response(database, query, properties, request_key)
+        if cached_response is not None:
+            return cached_response
+
+        if request_key is not None and self._request_coalescer is not None:
+            return await self._request_coalescer.do(request_key, lambda: self._execute_query(database, query, properties, request_key))
+        return await self._execute_query(database, query, properties, request_key)
+
+    @aio_documented_by(KustoClientSync._execute_query)
+    async def _execute_query(self, database: str, query: str, properties: Optional[ClientRequestProperties], request_key=None) -> KustoResponseDataSet:
+        if self._hedging_policy is not None:
+            response = await _execute_hedged_async(
+                self._hedging_policy,
+                properties,
+                lambda hedged_properties: self._send_query(database, query, hedged_properties),
+                lambda client_request_id: self.cancel_query(database, client_request_id),
+            )
+        else:
+            response = await self._send_query(database, query, properties)
+        cache = self._query_cache
+        if request_key is not None and cache is not None:
+            if cache.blocking_io:
+                await asyncio.get_running_loop().run_in_executor(None, cache.put, request_key, response)
+            else:
+                cache.put(request_key, response)
+        return response
+
+    async def _send_query(self, database: str, query: str, properties: Optional[ClientRequestProperties]) -> KustoResponseDataSet:
         request = ExecuteRequestParams._from_query(
             query,
             database,
@@ -85,6 +128,15 @@ class KustoClient(_KustoClientBase):
         )
         return await self._execute(self._mgmt_endpoint, request, properties)
 
+    @aio_documented_by(KustoClientSync.cancel_query)
+    async def cancel_query(self, database: Optional[str], client_request_id: str) -> KustoResponseDataSet:
+        return await self.execute_mgmt(database, self._get_cancel_query_command(client_request_id))
+
+    @aio_documented_by(KustoClientSync.execute_mgmt_async_operation)
+    async def execute_mgmt_async_operation(self, database: Optional[str], query: str, properties: ClientRequestProperties = None) -> OperationHandle:
+        response = await self.execute_mgmt(database, query, properties)
+        return self._operation_poller.add(self._get_database_or_default(database), _get_operation_id(response))
+
     @distributed_trace_async(name_of_span="AioKustoClient.streaming_ingest", kind=SpanKind.CLIENT)
     @aio_documented_by(KustoClientSync.execute_streaming_ingest)
     async def execute_streaming_ingest(
@@ -143,7 +195,19 @@ class KustoClient(_KustoClientBase):
             query, database, properties, self._request_headers, timeout, self._mgmt_default_timeout, self._client_server_delta, self.client_details
         )
         response = await self._execute(self._query_endpoint, request, properties, stream_response=True)
-        return StreamingDataSetEnumerator(JsonTokenReader(response.content))
+        client_request_id = request.request_headers["x-ms-client-request-id"]
+        return StreamingDataSetEnumerator(
+            JsonTokenReader(response.content), lambda abandoned: self._close_streaming_query(response, database, client_request_id, abandoned)
+        )
+
+    async def _close_streaming_query(self, response: ClientResponse, database: Optional[str], client_request_id: str, abandoned: bool):
+        response.close()
+        if abandoned and not self._is_closed:
+            try:
+                await self.cancel_query(database, client_request_id)
+            except Exception:
+                # Best effort - the query may have already completed, or the cluster may be unreachable
+                pass
 
     @distributed_trace_async(name_of_span="AioKustoClient.streaming_query", kind=SpanKind.CLIENT)
     @aio_documented_by(KustoClientSync.execute_streaming_query)
@@ -160,6 +224,36 @@ class KustoClient(_KustoClientBase):
         response = await self._execute_streaming_query_parsed(database, query, timeout, properties)
         return KustoStreamingResponseDataSet(response)
 
+    @aio_documented_by(KustoClientSync.execute_many)
+    def execute_many(
+        self,
+        queries: Iterable[Union[QueryRequest, str]],
+        max_concurrency: int = _KustoClientBase._default_bulk_concurrency,
+        ordered: bool = False,
+    ) -> AsyncIterator[QueryResult]:
+        queries = _to_query_requests(queries)
+        return self._execute_many(queries, self._get_bulk_concurrency(max_concurrency, len(queries)), ordered)
+
+    async def _execute_many(self, queries: List[QueryRequest], max_concurrency: int, ordered: bool) -> AsyncIterator[QueryResult]:
+        if max_concurrency == 0:
+            return
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(index: int, request: QueryRequest) -> QueryResult:
+            async with semaphore:
+                try:
+                    return QueryResult(index, request, await self.execute(request.database, request.query, request.properties))
+                except Exception as e:
+                    return QueryResult(index, request, error=e)
+
+        tasks = [asyncio.ensure_future(run(index, request)) for index, request in enumerate(queries)]
+        try:
+            for task in tasks if ordered else asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
     @aio_documented_by(KustoClientSync._execute)
     async def _execute(
         self,
@@ -169,6 +263,33 @@ class KustoClient(_KustoClientBase):
         stream_response: bool = False,
     ) -> Union[KustoResponseDataSet, ClientResponse]:
         """Executes given query against this client"""
+        if self._retry_policy is None or request.payload is not None:
+            return await self._admit_and_execute(endpoint, request, properties, stream_response)
+
+        async def send(timeout: timedelta, retry: int) -> Union[KustoResponseDataSet, ClientResponse]:
+            attempt, attempt_properties = request._for_attempt(properties, retry, timeout)
+            return await self._admit_and_execute(endpoint, attempt, attempt_properties, stream_response)
+
+        return await _execute_with_retry_policy_async(self._retry_policy, request.timeout, endpoint == self._query_endpoint, send)
+
+    async def _admit_and_execute(
+        self, endpoint: str, request: ExecuteRequestParams, properties: Optional[ClientRequestProperties], stream_response: bool
+    ) -> Union[KustoResponseDataSet, ClientResponse]:
+        send = functools.partial(self._execute_once, endpoint, request, properties, stream_response)
+        # Requests only take a scheduler slot once admitted, so slots aren't held while waiting for the rate limit
+        if self._request_scheduler is not None:
+            send = functools.partial(_execute_scheduled_async, self._request_scheduler, send)
+        if self._admission_controller is not None:
+            return await _execute_admitted_async(self._admission_controller, send)
+        return await send()
+
+    async def _execute_once(
+        self,
+        endpoint: str,
+        request: ExecuteRequestParams,
+        properties: Optional[ClientRequestProperties] = None,
+        stream_response: bool = False,
+    ) -> Union[KustoResponseDataSet, ClientResponse]:
         if self._is_closed:
             raise KustoClosedError()
         await self.validate_endpoint_async()
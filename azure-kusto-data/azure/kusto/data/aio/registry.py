@@ -0,0 +1,119 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Union
+
+from .client import KustoClient
+from ..kcsb import KustoConnectionStringBuilder
+from ..registry import _ClientHandleBase, _ClientRegistryBase, client_key
+
+
+class AsyncKustoClientHandle(_ClientHandleBase):
+    """The aio equivalent of `azure.kusto.data.registry.KustoClientHandle`."""
+
+    async def close(self):
+        for client in self._release():
+            await client.close()
+
+    async def __aenter__(self) -> "AsyncKustoClientHandle":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class AsyncKustoClientRegistry(_ClientRegistryBase):
+    """
+    The aio equivalent of `azure.kusto.data.registry.KustoClientRegistry`.
+    Since an aio client's connections belong to the event loop it was created on, clients are shared per event loop as well, and idle clients are
+    only closed on their own loop. The clients of a loop that was closed are dropped, since they can't be closed anymore.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: Optional[timedelta] = _ClientRegistryBase.DEFAULT_IDLE_TIMEOUT,
+        client_factory: Callable[[KustoConnectionStringBuilder], KustoClient] = KustoClient,
+        time_provider: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(client_factory, idle_timeout, time_provider)
+        self._sweeps: Dict[asyncio.AbstractEventLoop, asyncio.TimerHandle] = {}
+        self._sweep_tasks: Set["asyncio.Task[None]"] = set()
+
+    def _key(self, kcsb: KustoConnectionStringBuilder) -> Hashable:
+        return asyncio.get_running_loop(), client_key(kcsb)
+
+    def _owns(self, key: Hashable) -> bool:
+        return key[0] is asyncio.get_running_loop()
+
+    def _evict_idle(self) -> List[Any]:
+        for key, entry in list(self._entries.items()):
+            if entry.references == 0 and key[0].is_closed():
+                del self._entries[key]
+        return super()._evict_idle()
+
+    def _schedule_sweep(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop in self._sweeps:
+                return
+            delay = self._next_sweep_delay()
+            if delay is None:
+                return
+            self._sweeps[loop] = loop.call_later(delay, self._start_sweep, loop)
+
+    def _start_sweep(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            self._sweeps.pop(loop, None)
+        task = loop.create_task(self._sweep())
+        self._sweep_tasks.add(task)
+        task.add_done_callback(self._sweep_tasks.discard)
+
+    async def _sweep(self):
+        with self._lock:
+            evicted = self._evict_idle()
+        for client in evicted:
+            await client.close()
+        self._schedule_sweep()
+
+    async def acquire(self, kcsb: Union[KustoConnectionStringBuilder, str]) -> AsyncKustoClientHandle:
+        """Returns a handle to the shared client of the connection string's cluster and identity on the running event loop."""
+        entry, kcsb, evicted = self._acquire_entry(kcsb)
+        for client in evicted:
+            await client.close()
+        return AsyncKustoClientHandle(self, entry, kcsb.initial_catalog)
+
+    async def close(self):
+        """Closes all of the clients, including the ones with open handles."""
+        with self._lock:
+            for handle in self._sweeps.values():
+                handle.cancel()
+            self._sweeps.clear()
+        for client in self._clear():
+            await client.close()
+
+    async def __aenter__(self) -> "AsyncKustoClientRegistry":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+_default_registry: Optional[AsyncKustoClientRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_registry() -> AsyncKustoClientRegistry:
+    """Returns the process-wide aio registry."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = AsyncKustoClientRegistry()
+        return _default_registry
+
+
+async def get_shared_client(kcsb: Union[KustoConnectionStringBuilder, str]) -> AsyncKustoClientHandle:
+    """Returns a handle to the process-wide shared aio client of the connection string's cluster and identity, on the running event loop."""
+    return await get_default_registry().acquire(kcsb)
@@ -55,6 +55,20 @@ class KustoStreamingResponseDataSet(BaseKustoResponseDataSet):
     def set_skip_incomplete_tables(self, value: bool):
         self._skip_incomplete_tables = value
 
+    async def close(self):
+        """
+        Releases the connection of the response.
+        If the results weren't read to their end, the query is also cancelled on the service, so it stops computing results no one reads.
+        Use the data set as a context manager to close it when leaving the block, including on `break`, exceptions and task cancellation.
+        """
+        await self.streamed_data.close()
+
+    async def __aenter__(self) -> "KustoStreamingResponseDataSet":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
     @property
     def errors_count(self) -> int:
         if not self.finished:
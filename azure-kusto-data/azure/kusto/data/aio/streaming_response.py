@@ -1,4 +1,5 @@
-from typing import Any, Tuple, Dict, Iterator
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Set, Tuple
 
 import aiohttp
 import ijson
@@ -8,6 +9,9 @@ from azure.kusto.data._models import WellKnownDataSet
 from azure.kusto.data.exceptions import KustoTokenParsingError, KustoUnsupportedApiError, KustoMultiApiError
 from azure.kusto.data.streaming_response import JsonTokenType, FrameType, JsonToken
 
+# Holds references to the cleanups of cancelled streaming queries, so they aren't garbage collected while running
+_background_closes: Set["asyncio.Task[None]"] = set()
+
 
 class JsonTokenReader:
     def __init__(self, stream: aiohttp.StreamReader):
@@ -97,17 +101,47 @@ class JsonTokenReader:
 
 
 class StreamingDataSetEnumerator:
-    def __init__(self, reader: JsonTokenReader):
+    def __init__(self, reader: JsonTokenReader, on_close: Optional[Callable[[bool], Awaitable[None]]] = None):
+        """
+        :param JsonTokenReader reader: The reader of the response's content.
+        :param on_close: Awaited once when the enumerator is closed, with whether the data set was abandoned before its completion frame was read.
+        """
         self.reader = reader
         self.done = False
         self.started = False
         self.started_primary_results = False
         self.finished_primary_results = False
+        self.completed = False
+        self.closed = False
+        self._on_close = on_close
 
     def __aiter__(self) -> "StreamingDataSetEnumerator":
         return self
 
+    async def close(self):
+        """Releases the response. If the data set wasn't read to its completion, the query is abandoned, and on_close cancels it on the service."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._on_close is not None:
+            await self._on_close(not self.completed)
+
+    def _close_in_background(self):
+        # The current task is being cancelled, so awaiting the cleanup in it could be interrupted. Run it in its own task instead.
+        if self.closed:
+            return
+        task = asyncio.ensure_future(self.close())
+        _background_closes.add(task)
+        task.add_done_callback(_background_closes.discard)
+
     async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return await self._read_next_frame()
+        except asyncio.CancelledError:
+            self._close_in_background()
+            raise
+
+    async def _read_next_frame(self) -> Dict[str, Any]:
         if self.done:
             raise StopIteration()
 
@@ -127,6 +161,8 @@ class StreamingDataSetEnumerator:
             self.started_primary_results = True
         elif self.started_primary_results:
             self.finished_primary_results = True
+        if parsed_frame["FrameType"] == FrameType.DataSetCompletion:
+            self.completed = True
 
         return parsed_frame
 
@@ -159,14 +195,18 @@ class StreamingDataSetEnumerator:
             return res
 
     async def row_iterator(self) -> Iterator[list]:
-        await self.reader.read_token_of_type(JsonTokenType.START_ARRAY)
-        while True:
-            token = await self.reader.read_token_of_type(JsonTokenType.START_ARRAY, JsonTokenType.END_ARRAY, JsonTokenType.START_MAP)
-            if token.token_type == JsonTokenType.START_MAP:
-                raise KustoMultiApiError([await self.parse_object(skip_start=True)])
-            if token.token_type == JsonTokenType.END_ARRAY:
-                return
-            yield await self.parse_array(skip_start=True)
+        try:
+            await self.reader.read_token_of_type(JsonTokenType.START_ARRAY)
+            while True:
+                token = await self.reader.read_token_of_type(JsonTokenType.START_ARRAY, JsonTokenType.END_ARRAY, JsonTokenType.START_MAP)
+                if token.token_type == JsonTokenType.START_MAP:
+                    raise KustoMultiApiError([await self.parse_object(skip_start=True)])
+                if token.token_type == JsonTokenType.END_ARRAY:
+                    return
+                yield await self.parse_array(skip_start=True)
+        except asyncio.CancelledError:
+            self._close_in_background()
+            raise
 
     async def parse_array(self, skip_start: bool) -> list:
         if not skip_start:
@@ -0,0 +1,168 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import threading
+from concurrent.futures import Future
+from datetime import timedelta
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from ._models import KustoResultTable
+from .client_request_properties import ClientRequestProperties
+from .exceptions import KustoClientError
+from .response import KustoResponseDataSet
+
+if TYPE_CHECKING:
+    from .aio.client import KustoClient as AioKustoClient
+    from .client import KustoClient
+
+_RESULT_NAME_PREFIX = "batch_result_"
+
+
+class QueryBatch:
+    """
+    Combines several independent queries into a single request, and splits the response back into a result table per query.
+    Each query is sent as a statement of a batch, `<query> | as ['batch_result_<index>']`, so its primary result is returned as a named table.
+
+    The queries must be single tabular expressions (no `let`, `declare` or `set` statements), each returning a single result.
+    The batch runs as one query: if one of the queries fails, the whole batch fails.
+        batch = QueryBatch()
+        errors = batch.add("Events | where Level == 'Error' | count")
+        sources = batch.add("Events | distinct Source")
+        results = batch.execute(client, "db")
+        results[errors], results[sources]
+    """
+
+    def __init__(self):
+        self.queries: List[str] = []
+
+    def add(self, query: str) -> int:
+        """Adds a query to the batch, and returns the index of its result."""
+        self.queries.append(query.strip().rstrip(";"))
+        return len(self.queries) - 1
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    @property
+    def query(self) -> str:
+        """The batch's query text."""
+        if not self.queries:
+            raise KustoClientError("The batch has no queries")
+        return ";\n".join("{}\n| as ['{}{}']".format(query, _RESULT_NAME_PREFIX, i) for i, query in enumerate(self.queries))
+
+    def split_results(self, response: KustoResponseDataSet) -> List[KustoResultTable]:
+        """Returns the result table of each query of the batch, in the order they were added."""
+        tables = {table.table_name: table for table in response.primary_results}
+        results = []
+        for i in range(len(self.queries)):
+            table = tables.get(_RESULT_NAME_PREFIX + str(i))
+            if table is None:
+                raise KustoClientError("The response has no result for query {} of the batch".format(i))
+            results.append(table)
+        return results
+
+    def execute(self, client: "KustoClient", database: Optional[str], properties: Optional[ClientRequestProperties] = None) -> List[KustoResultTable]:
+        """Executes the batch in a single request, and returns the result table of each query, in the order they were added."""
+        return self.split_results(client.execute_query(database, self.query, properties))
+
+    async def execute_async(
+        self, client: "AioKustoClient", database: Optional[str], properties: Optional[ClientRequestProperties] = None
+    ) -> List[KustoResultTable]:
+        """The aio equivalent of `execute`."""
+        return self.split_results(await client.execute_query(database, self.query, properties))
+
+
+class QueryBatcher:
+    """
+    Automatically batches queries submitted within a short time window, using `QueryBatch`.
+    `submit` returns a future of the query's result table. The pending queries are sent as a batch once `window` has passed since the first of them
+    was submitted, or as soon as there are `max_batch_size` of them. If the batch fails, every one of its futures fails with the same error.
+        with QueryBatcher(client, "db") as batcher:
+            errors = batcher.submit("Events | where Level == 'Error' | count")
+            sources = batcher.submit("Events | distinct Source")
+        errors.result(), sources.result()
+    """
+
+    def __init__(
+        self,
+        client: "KustoClient",
+        database: Optional[str],
+        window: timedelta = timedelta(milliseconds=20),
+        max_batch_size: int = 10,
+        properties: Optional[ClientRequestProperties] = None,
+    ):
+        """
+        :param KustoClient client: The client to execute the batches with.
+        :param Optional[str] database: Database against the queries will be executed. If not provided, will default to the "Initial Catalog" of the client
+        :param timedelta window: How long a batch waits for more queries after its first one.
+        :param int max_batch_size: The maximum amount of queries in a batch.
+        :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties, applied to every batch.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.client = client
+        self.database = database
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.properties = properties
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, Future]] = []
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    def submit(self, query: str) -> "Future[KustoResultTable]":
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise KustoClientError("The batcher is closed")
+            self._pending.append((query, future))
+            if len(self._pending) >= self.max_batch_size:
+                batch = self._take_pending()
+            else:
+                batch = None
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window.total_seconds(), self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            # Don't block the caller, as it only asked for a future
+            threading.Thread(target=self._execute, args=(batch,), daemon=True).start()
+        return future
+
+    def flush(self):
+        """Sends the pending queries now."""
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._execute(batch)
+
+    def close(self):
+        """Sends the pending queries, and stops accepting new ones."""
+        with self._lock:
+            self._closed = True
+        self.flush()
+
+    def __enter__(self) -> "QueryBatcher":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _take_pending(self) -> List[Tuple[str, Future]]:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        return pending
+
+    def _execute(self, pending: List[Tuple[str, Future]]):
+        batch = QueryBatch()
+        for query, _ in pending:
+            batch.add(query)
+        try:
+            results = batch.execute(self.client, self.database, self.properties)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            future.set_result(result)
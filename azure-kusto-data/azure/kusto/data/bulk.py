@@ -0,0 +1,221 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, List, Optional, Tuple, TypeVar, Union, TYPE_CHECKING
+
+from .client_request_properties import ClientRequestProperties, _copy_properties
+from .exceptions import KustoClientError
+from .response import KustoResponseDataSet
+from .retry import _is_transient_error
+
+if TYPE_CHECKING:
+    from .client import KustoClient
+
+T = TypeVar("T")
+
+
+@dataclass
+class QueryRequest:
+    """A single query or management command to run as part of a bulk execution."""
+
+    query: str
+    database: Optional[str] = None
+    properties: Optional[ClientRequestProperties] = None
+
+
+@dataclass
+class QueryResult:
+    """
+    The outcome of a single request of a bulk execution.
+    Exactly one of `response` and `error` is set.
+    """
+
+    index: int
+    request: QueryRequest
+    response: Optional[KustoResponseDataSet] = None
+    error: Optional[Exception] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    def result(self) -> KustoResponseDataSet:
+        """Returns the response, or raises the error the request failed with."""
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+def _to_query_requests(requests: Iterable[Union[QueryRequest, str]]) -> List[QueryRequest]:
+    return [r if isinstance(r, QueryRequest) else QueryRequest(r) for r in requests]
+
+
+def _execute_with_retries(
+    func: Callable[[], T], retries: int, max_delay_seconds: float = 30, is_retryable: Callable[[Exception], bool] = _is_transient_error
+) -> T:
+    """Calls func, retrying it up to `retries` times with jittered exponential backoff while it fails with retryable (by default, transient) errors."""
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+        time.sleep(random.uniform(0, min(max_delay_seconds, 2**attempt)))
+        attempt += 1
+
+
+def _merge_data_sets(responses: List[KustoResponseDataSet]) -> KustoResponseDataSet:
+    """
+    Merges the responses of queries that return the same tables into a single data set, by concatenating the rows of the corresponding tables.
+    The merged data set has the type of the first response.
+    """
+    first = responses[0]
+    for response in responses[1:]:
+        if [[c.column_name for c in t.columns] for t in response.tables] != [[c.column_name for c in t.columns] for t in first.tables]:
+            raise KustoClientError("Can't merge query results with different tables or columns")
+
+    merged_tables = []
+    for index, table in enumerate(first.tables):
+        merged_table = table._to_json_table()
+        merged_table["Rows"] = [row for response in responses for row in response.tables[index].raw_rows]
+        merged_tables.append(merged_table)
+    return type(first)._from_json_tables(merged_tables, first.tables_names)
+
+
+def _kql_datetime_literal(value: datetime) -> str:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return "datetime({})".format(value.strftime("%Y-%m-%dT%H:%M:%S.%fZ"))
+
+
+TIME_PARTITION_START_PARAMETER = "_startTime"
+TIME_PARTITION_END_PARAMETER = "_endTime"
+
+
+def split_time_range(start: datetime, end: datetime, partitions: int) -> List[Tuple[datetime, datetime]]:
+    """Splits [start, end) into `partitions` consecutive sub-ranges of equal length."""
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    if end <= start:
+        raise ValueError("end must be later than start")
+    step = (end - start) / partitions
+    bounds = [start + step * i for i in range(partitions)] + [end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def execute_time_partitioned_query(
+    client: "KustoClient",
+    database: Optional[str],
+    query: str,
+    start: datetime,
+    end: datetime,
+    partitions: int,
+    max_concurrency: int = 4,
+    retries: int = 3,
+    properties: Optional[ClientRequestProperties] = None,
+) -> KustoResponseDataSet:
+    """
+    Executes a query over a long time range as several smaller queries over consecutive sub-ranges, concurrently, and merges their results in order.
+    The query must filter on the `_startTime` and `_endTime` datetime query parameters, as a half-open range, e.g.:
+        Telemetry | where Timestamp >= _startTime and Timestamp < _endTime | summarize count() by bin(Timestamp, 1h)
+    The parameters are declared and set for each sub-range by this function. Since the slices are merged by concatenating their rows,
+    aggregations must be done per slice (as in the example), or re-aggregated after merging.
+    Each slice is retried on its own when it fails with a transient error (throttling, network errors or non-permanent service errors).
+    :param KustoClient client: The client to execute the query with.
+    :param Optional[str] database: Database against query will be executed. If not provided, will default to the "Initial Catalog" of the client
+    :param str query: The query, referring to the `_startTime` and `_endTime` parameters.
+    :param datetime start: The start of the time range (inclusive). Naive datetimes are treated as UTC.
+    :param datetime end: The end of the time range (exclusive).
+    :param int partitions: The amount of sub-ranges to split the time range into.
+    :param int max_concurrency: The maximum amount of sub-range queries executed at once.
+    :param int retries: The maximum amount of retries for each sub-range query.
+    :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties, applied to every sub-range query.
+    :return: A data set with the rows of every sub-range, in time order.
+    """
+    declaration = "declare query_parameters({}:datetime, {}:datetime);\n".format(TIME_PARTITION_START_PARAMETER, TIME_PARTITION_END_PARAMETER)
+
+    def run(time_range: Tuple[datetime, datetime]) -> KustoResponseDataSet:
+        slice_properties = _copy_properties(properties)
+        slice_properties.set_parameter(TIME_PARTITION_START_PARAMETER, _kql_datetime_literal(time_range[0]))
+        slice_properties.set_parameter(TIME_PARTITION_END_PARAMETER, _kql_datetime_literal(time_range[1]))
+        return _execute_with_retries(lambda: client.execute_query(database, declaration + query, slice_properties), retries)
+
+    time_ranges = split_time_range(start, end, partitions)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(time_ranges)))) as executor:
+        responses = list(executor.map(run, time_ranges))
+    return _merge_data_sets(responses)
+
+
+KEYS_PARAMETER = "_keys"
+
+
+def split_keys(keys: Iterable[Any], max_chunk_size: int, max_chunk_bytes: int) -> List[List[Any]]:
+    """
+    Splits keys into consecutive chunks of up to `max_chunk_size` keys, whose JSON encoding is up to about `max_chunk_bytes` long.
+    Repeated keys are kept once. A key longer than `max_chunk_bytes` gets a chunk of its own.
+    """
+    if max_chunk_size < 1:
+        raise ValueError("max_chunk_size must be at least 1")
+    chunks: List[List[Any]] = []
+    chunk: List[Any] = []
+    chunk_bytes = 0
+    for key in dict.fromkeys(keys):
+        key_bytes = len(json.dumps(key)) + 1
+        if chunk and (len(chunk) >= max_chunk_size or chunk_bytes + key_bytes > max_chunk_bytes):
+            chunks.append(chunk)
+            chunk, chunk_bytes = [], 0
+        chunk.append(key)
+        chunk_bytes += key_bytes
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def execute_chunked_in_query(
+    client: "KustoClient",
+    database: Optional[str],
+    query: str,
+    keys: Iterable[Any],
+    max_chunk_size: int = 10_000,
+    max_chunk_bytes: int = 512 * 1024,
+    max_concurrency: int = 4,
+    retries: int = 3,
+    properties: Optional[ClientRequestProperties] = None,
+) -> KustoResponseDataSet:
+    """
+    Executes a query that looks up a large set of keys, e.g. `where Id in (<keys>)`, as several queries over chunks of the keys, concurrently,
+    and merges their results in order.
+    The query must refer to the keys as the `_keys` dynamic query parameter, e.g.:
+        Events | where DeviceId in (_keys)
+    The parameter is declared and set to a `dynamic([...])` array of each chunk's keys by this function, instead of inlining the keys in the query text.
+    Since the chunks are merged by concatenating their rows, aggregations must be done per key, or re-aggregated after merging.
+    Each chunk is retried on its own when it fails with a transient error (throttling, network errors or non-permanent service errors).
+    :param KustoClient client: The client to execute the query with.
+    :param Optional[str] database: Database against query will be executed. If not provided, will default to the "Initial Catalog" of the client
+    :param str query: The query, referring to the `_keys` parameter.
+    :param keys: The keys to look up. They must be JSON serializable: strings, numbers or booleans.
+    :param int max_chunk_size: The maximum amount of keys in a chunk.
+    :param int max_chunk_bytes: The maximum size of a chunk's keys, as JSON, so requests stay within the service's request size limit.
+    :param int max_concurrency: The maximum amount of chunk queries executed at once.
+    :param int retries: The maximum amount of retries for each chunk query.
+    :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties, applied to every chunk query.
+    :return: A data set with the rows of every chunk, in the order of the chunks.
+    """
+    declaration = "declare query_parameters({}:dynamic);\n".format(KEYS_PARAMETER)
+
+    def run(chunk: List[Any]) -> KustoResponseDataSet:
+        chunk_properties = _copy_properties(properties)
+        chunk_properties.set_parameter(KEYS_PARAMETER, "dynamic({})".format(json.dumps(chunk)))
+        return _execute_with_retries(lambda: client.execute_query(database, declaration + query, chunk_properties), retries)
+
+    # Without keys, a single query over an empty array still returns the result's tables and columns
+    chunks = split_keys(keys, max_chunk_size, max_chunk_bytes) or [[]]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(chunks)))) as executor:
+        responses = list(executor.map(run, chunks))
+    return _merge_data_sets(responses)
@@ -1,9 +1,13 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
+import contextvars
+import functools
 import socket
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import timedelta
-from typing import AnyStr, IO, List, Optional, TYPE_CHECKING, Tuple, Union
+from typing import AnyStr, Callable, IO, Iterable, Iterator, List, Optional, TYPE_CHECKING, Tuple, Union
 
 import requests
 import requests.adapters
@@ -16,13 +20,19 @@ from azure.core.tracing import SpanKind
 from azure.kusto.data._telemetry import Span, MonitoredActivity
 from azure.kusto.data.exceptions import KustoServiceError
 
+from .admission import _execute_admitted
+from .bulk import QueryRequest, QueryResult, _to_query_requests
 from .client_base import ExecuteRequestParams, _KustoClientBase
 from .client_request_properties import ClientRequestProperties
 from .data_format import DataFormat
 from .exceptions import KustoClosedError, KustoNetworkError
+from .hedging import _execute_hedged
 
 from .kcsb import KustoConnectionStringBuilder
+from .operations import OperationHandle, _OperationPoller, _get_operation_id
 from .response import KustoResponseDataSet, KustoStreamingResponseDataSet
+from .scheduler import _execute_scheduled
+from .retry import _execute_with_retry_policy
 from .streaming_response import JsonTokenReader, StreamingDataSetEnumerator
 
 if TYPE_CHECKING:
@@ -61,9 +71,6 @@ class KustoClient(_KustoClientBase):
     _streaming_ingest_default_timeout = timedelta(minutes=10)
     _client_server_delta = timedelta(seconds=30)
 
-    # The maximum amount of connections to be able to operate in parallel
-    _max_pool_size = 100
-
     def __init__(self, kcsb: Union[KustoConnectionStringBuilder, str]):
         """
         Kusto Client constructor.
@@ -80,9 +87,11 @@ class KustoClient(_KustoClientBase):
         )
         self._session.mount("http://", adapter)
         self._session.mount("https://", adapter)
+        self._operation_poller = _OperationPoller(self)
 
     def close(self):
         if not self._is_closed:
+            self._operation_poller.close()
             self._session.close()
             if self._aad_helper:
                 self._aad_helper.close()
@@ -176,6 +185,31 @@ class KustoClient(_KustoClientBase):
         """
         database = self._get_database_or_default(database)
         Span.set_query_attributes(self._kusto_cluster, database, properties)
+        request_key = self._get_request_key(database, query, properties)
+        cached_response = self._get_cached_response(database, query, properties, request_key)
+        if cached_response is not None:
+            return cached_response
+
+        if request_key is not None and self._request_coalescer is not None:
+            return self._request_coalescer.do(request_key, lambda: self._execute_query(database, query, properties, request_key))
+        return self._execute_query(database, query, properties, request_key)
+
+    def _execute_query(self, database: str, query: str, properties: Optional[ClientRequestProperties], request_key=None) -> KustoResponseDataSet:
+        """Executes a query against the service, hedged when a hedging policy is set, and caches the result under request_key when a query cache is set"""
+        if self._hedging_policy is not None:
+            response = _execute_hedged(
+                self._hedging_policy,
+                properties,
+                lambda hedged_properties: self._send_query(database, query, hedged_properties),
+                lambda client_request_id: self.cancel_query(database, client_request_id),
+            )
+        else:
+            response = self._send_query(database, query, properties)
+        if request_key is not None and self._query_cache is not None:
+            self._query_cache.put(request_key, response)
+        return response
+
+    def _send_query(self, database: str, query: str, properties: Optional[ClientRequestProperties]) -> KustoResponseDataSet:
         request = ExecuteRequestParams._from_query(
             query,
             database,
@@ -213,6 +247,29 @@ class KustoClient(_KustoClientBase):
         )
         return self._execute(self._mgmt_endpoint, request, properties)
 
+    def cancel_query(self, database: Optional[str], client_request_id: str) -> KustoResponseDataSet:
+        """
+        Cancels a running query, by the client request id it was sent with.
+        :param Optional[str] database: Database to run the cancel command against. If not provided, will default to the "Initial Catalog" value
+        :param str client_request_id: The client request id of the query.
+        :return: Kusto response data set, with the result of the cancellation.
+        """
+        return self.execute_mgmt(database, self._get_cancel_query_command(client_request_id))
+
+    def execute_mgmt_async_operation(self, database: Optional[str], query: str, properties: Optional[ClientRequestProperties] = None) -> OperationHandle:
+        """
+        Execute a KQL control command that runs asynchronously on the service, such as `.export async`, `.set-or-append async` or `.purge`,
+        and return a handle of its operation.
+        The state of the operations in flight is polled in the background, with batched `.show operations` commands.
+        :param Optional[str] database: Database against query will be executed. If not provided, will default to the "Initial Catalog" value
+        :param str query: The command. It must return an OperationId.
+        :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties.
+        :return: A handle that completes when the operation ends.
+        :rtype: azure.kusto.data.operations.OperationHandle
+        """
+        response = self.execute_mgmt(database, query, properties)
+        return self._operation_poller.add(self._get_database_or_default(database), _get_operation_id(response))
+
     @distributed_trace(name_of_span="KustoClient.streaming_ingest", kind=SpanKind.CLIENT)
     def execute_streaming_ingest(
         self,
@@ -282,7 +339,33 @@ class KustoClient(_KustoClientBase):
         )
         response = self._execute(self._query_endpoint, request, properties, stream_response=True)
         response.raw.decode_content = True
-        return StreamingDataSetEnumerator(JsonTokenReader(response.raw))
+        client_request_id = request.request_headers["x-ms-client-request-id"]
+        enumerator = StreamingDataSetEnumerator(
+            JsonTokenReader(response.raw),
+            lambda abandoned: self._close_streaming_query(response, database, client_request_id, abandoned, enumerator.interrupted),
+        )
+        return enumerator
+
+    def _close_streaming_query(self, response: Response, database: Optional[str], client_request_id: str, abandoned: bool, interrupted: bool = False):
+        response.close()
+        if not abandoned or self._is_closed:
+            return
+        if interrupted:
+            # The user asked to stop, so the cancellation is sent in the background rather than holding them up
+            properties = ClientRequestProperties()
+            properties.set_option(ClientRequestProperties.request_timeout_option_name, self._interrupted_cancel_timeout)
+            cancel = functools.partial(self.execute_mgmt, database, self._get_cancel_query_command(client_request_id), properties)
+            threading.Thread(target=self._cancel_quietly, args=(cancel,), name="KustoCancelQuery", daemon=True).start()
+        else:
+            self._cancel_quietly(functools.partial(self.cancel_query, database, client_request_id))
+
+    @staticmethod
+    def _cancel_quietly(cancel: Callable[[], object]):
+        try:
+            cancel()
+        except Exception:
+            # Best effort - the query may have already completed, or the cluster may be unreachable
+            pass
 
     @distributed_trace(name_of_span="KustoClient.streaming_query", kind=SpanKind.CLIENT)
     def execute_streaming_query(
@@ -306,6 +389,43 @@ class KustoClient(_KustoClientBase):
 
         return KustoStreamingResponseDataSet(self._execute_streaming_query_parsed(database, query, timeout, properties))
 
+    def execute_many(
+        self,
+        queries: Iterable[Union[QueryRequest, str]],
+        max_concurrency: int = _KustoClientBase._default_bulk_concurrency,
+        ordered: bool = False,
+    ) -> Iterator[QueryResult]:
+        """
+        Executes many independent queries or management commands concurrently, on a pool of threads sharing this client's connections and credentials.
+        Results are yielded as soon as they are available. A failing request doesn't stop the others - its error is returned in its result.
+        Requests that didn't start yet are cancelled if the iteration is stopped early.
+        :param queries: The queries and commands to execute. Plain strings are executed against the default database.
+        :param int max_concurrency: The maximum amount of requests in flight at once.
+        :param bool ordered: If True, results are yielded in the order of the requests. Otherwise, in the order they complete.
+        :return: An iterator over a `QueryResult` per request.
+        """
+        # Validated here rather than in the generator, so invalid arguments fail at the call
+        queries = _to_query_requests(queries)
+        return self._execute_many(queries, self._get_bulk_concurrency(max_concurrency, len(queries)), ordered)
+
+    def _execute_many(self, queries: List[QueryRequest], max_concurrency: int, ordered: bool) -> Iterator[QueryResult]:
+        if max_concurrency == 0:
+            return
+
+        def run(index: int, request: QueryRequest) -> QueryResult:
+            try:
+                return QueryResult(index, request, self.execute(request.database, request.query, request.properties))
+            except Exception as e:
+                return QueryResult(index, request, error=e)
+
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="KustoClient.execute_many")
+        try:
+            futures = [executor.submit(contextvars.copy_context().run, run, index, request) for index, request in enumerate(queries)]
+            for future in futures if ordered else as_completed(futures):
+                yield future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def _execute(
         self,
         endpoint: str,
@@ -314,6 +434,33 @@ class KustoClient(_KustoClientBase):
         stream_response: bool = False,
     ) -> Union[KustoResponseDataSet, Response]:
         """Executes given query against this client"""
+        if self._retry_policy is None or request.payload is not None:
+            return self._admit_and_execute(endpoint, request, properties, stream_response)
+
+        def send(timeout: timedelta, retry: int) -> Union[KustoResponseDataSet, Response]:
+            attempt, attempt_properties = request._for_attempt(properties, retry, timeout)
+            return self._admit_and_execute(endpoint, attempt, attempt_properties, stream_response)
+
+        return _execute_with_retry_policy(self._retry_policy, request.timeout, endpoint == self._query_endpoint, send)
+
+    def _admit_and_execute(
+        self, endpoint: str, request: ExecuteRequestParams, properties: Optional[ClientRequestProperties], stream_response: bool
+    ) -> Union[KustoResponseDataSet, Response]:
+        send = functools.partial(self._execute_once, endpoint, request, properties, stream_response)
+        # Requests only take a scheduler slot once admitted, so slots aren't held while waiting for the rate limit
+        if self._request_scheduler is not None:
+            send = functools.partial(_execute_scheduled, self._request_scheduler, send)
+        if self._admission_controller is not None:
+            return _execute_admitted(self._admission_controller, send)
+        return send()
+
+    def _execute_once(
+        self,
+        endpoint: str,
+        request: ExecuteRequestParams,
+        properties: Optional[ClientRequestProperties] = None,
+        stream_response: bool = False,
+    ) -> Union[KustoResponseDataSet, Response]:
         if self._is_closed:
             raise KustoClosedError()
         self.validate_endpoint()
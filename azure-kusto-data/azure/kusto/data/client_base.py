@@ -1,27 +1,39 @@
 import abc
 import asyncio
+import copy
 import io
 import json
 import uuid
 from datetime import timedelta
-from typing import Union, Optional, Any, NoReturn, ClassVar, TYPE_CHECKING
+from typing import Union, Optional, Any, NoReturn, ClassVar, Tuple, TYPE_CHECKING
 from urllib.parse import urljoin
 
 from requests import Response, Session
 
 from azure.kusto.data._cloud_settings import CloudSettings
+from .admission import AdmissionController
 from .client_details import ClientDetails
-from .client_request_properties import ClientRequestProperties
+from .client_request_properties import ClientRequestProperties, _copy_properties
 from .exceptions import KustoServiceError, KustoThrottlingError, KustoApiError
+from .hedging import HedgingPolicy
 from .kcsb import KustoConnectionStringBuilder
+from ._single_flight import _AsyncSingleFlight, _SingleFlight
 from .kusto_trusted_endpoints import well_known_kusto_endpoints
+from .local_query import find_refinement
+from .query_cache import BaseQueryResultCache, cache_identity
 from .response import KustoResponseDataSet, KustoResponseDataSetV2, KustoResponseDataSetV1
+from .retry import RetryPolicy
+from .scheduler import RequestScheduler
 from .security import _AadHelper
 
 if TYPE_CHECKING:
     import aiohttp
 
 
+# The shortest service timeout of a retry whose timeout was cut to the retry deadline
+_MIN_SERVER_TIMEOUT = timedelta(seconds=1)
+
+
 class _KustoClientBase(abc.ABC):
     API_VERSION = "2024-12-12"
 
@@ -29,6 +41,12 @@ class _KustoClientBase(abc.ABC):
     _query_default_timeout: ClassVar[timedelta] = timedelta(minutes=4, seconds=30)
     _streaming_ingest_default_timeout: ClassVar[timedelta] = timedelta(minutes=10)
     _client_server_delta: ClassVar[timedelta] = timedelta(seconds=30)
+    # The service timeout of the cancellation of a streaming query interrupted by the user
+    _interrupted_cancel_timeout: ClassVar[timedelta] = timedelta(seconds=10)
+    _default_bulk_concurrency: ClassVar[int] = 10
+
+    # The maximum amount of connections to be able to operate in parallel (also aiohttp's default connection limit)
+    _max_pool_size: ClassVar[int] = 100
 
     _aad_helper: _AadHelper
     client_details: ClientDetails
@@ -37,6 +55,7 @@ class _KustoClientBase(abc.ABC):
 
     def __init__(self, kcsb: Union[KustoConnectionStringBuilder, str], is_async):
         self._kcsb = kcsb
+        self._is_async = is_async
         self._proxy_url: Optional[str] = None
         if not isinstance(kcsb, KustoConnectionStringBuilder):
             self._kcsb = KustoConnectionStringBuilder(kcsb)
@@ -60,6 +79,14 @@ class _KustoClientBase(abc.ABC):
 
         self.client_details = self._kcsb.client_details
         self._is_closed: bool = False
+        self._query_cache: Optional[BaseQueryResultCache] = None
+        self._cache_identity = cache_identity(self._kcsb)
+        self._answer_refinements_locally = False
+        self._request_coalescer: Union[_SingleFlight, _AsyncSingleFlight, None] = None
+        self._hedging_policy: Optional[HedgingPolicy] = None
+        self._retry_policy: Optional[RetryPolicy] = None
+        self._admission_controller: Optional[AdmissionController] = None
+        self._request_scheduler: Optional[RequestScheduler] = None
 
         self.default_database = self._kcsb.initial_catalog
 
@@ -76,6 +103,85 @@ class _KustoClientBase(abc.ABC):
             if isinstance(self._session, Session):
                 self._aad_helper.token_provider.set_session(self._session)
 
+    def set_query_cache(self, cache: Optional[BaseQueryResultCache], answer_refinements_locally: bool = False):
+        """
+        Sets a cache for the results of `execute_query`, or disables caching when None is given.
+        Use `azure.kusto.data.query_cache.QueryResultCache` for an in-memory cache, or `azure.kusto.data.disk_query_cache.DiskQueryResultCache`
+        for a cache that persists across processes. The same cache can be shared by several clients.
+        :param answer_refinements_locally: When True, a query that is a cached query followed by simple operators (`where`, `project`, `take`,
+        `top`, `count` and `summarize count()`) is evaluated locally over the cached result, instead of being sent to the service.
+        See `azure.kusto.data.local_query` for the supported subset of KQL.
+        """
+        self._query_cache = cache
+        self._answer_refinements_locally = answer_refinements_locally
+
+    def set_hedging_policy(self, policy: Optional[HedgingPolicy]):
+        """
+        Sets a policy for hedging `execute_query` requests, or disables hedging when None is given.
+        See `azure.kusto.data.hedging.HedgingPolicy`. The same policy can be shared by several clients.
+        """
+        self._hedging_policy = policy
+
+    def set_retry_policy(self, policy: Optional[RetryPolicy]):
+        """
+        Sets a policy for retrying `execute_query` and `execute_mgmt` requests that failed with transient errors, or disables retrying when None
+        is given. See `azure.kusto.data.retry.RetryPolicy`.
+        """
+        self._retry_policy = policy
+
+    def set_admission_controller(self, controller: Optional[AdmissionController]):
+        """
+        Sets a controller that limits the rate and the concurrency of this client's requests, and fails fast while the cluster is overloaded, or
+        removes it when None is given. See `azure.kusto.data.admission.AdmissionController`. Share a controller between clients to limit them together.
+        """
+        self._admission_controller = controller
+
+    def set_request_scheduler(self, scheduler: Optional[RequestScheduler]):
+        """
+        Sets a scheduler that runs this client's requests in priority lanes, or removes it when None is given.
+        See `azure.kusto.data.scheduler.RequestScheduler`. Share a scheduler between clients to schedule their requests together.
+        With an admission controller set as well, requests only take a slot once the controller admitted them.
+        """
+        self._request_scheduler = scheduler
+
+    def set_request_coalescing(self, enabled: bool):
+        """
+        Enables or disables coalescing of identical concurrent queries.
+        When enabled, concurrent `execute_query` calls (from threads, or from asyncio tasks for the aio client) with the same database, query text,
+        options and parameters share a single request to the service, and all of them receive the same result, or the same exception.
+        The shared request is sent with the properties of the first caller, including its client request id.
+        """
+        if not enabled:
+            self._request_coalescer = None
+        elif self._request_coalescer is None:
+            self._request_coalescer = _AsyncSingleFlight() if self._is_async else _SingleFlight()
+
+    def _get_request_key(self, database: str, query: str, properties: Optional[ClientRequestProperties]):
+        if self._query_cache is None and self._request_coalescer is None:
+            return None
+        return BaseQueryResultCache.make_key(self._kusto_cluster, database, query, properties, self._cache_identity)
+
+    def _get_cached_response(self, database: str, query: str, properties: Optional[ClientRequestProperties], request_key) -> Optional[KustoResponseDataSet]:
+        if request_key is None or self._query_cache is None:
+            return None
+        cached_response = self._query_cache.get(request_key)
+        if cached_response is None and self._answer_refinements_locally:
+            cache = self._query_cache
+            cached_response = find_refinement(
+                query, lambda base: cache.get(BaseQueryResultCache.make_key(self._kusto_cluster, database, base, properties, self._cache_identity))
+            )
+        return cached_response
+
+    def _get_bulk_concurrency(self, max_concurrency: int, requests_count: int) -> int:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        # More concurrent requests than connections in the pool would only wait for a connection
+        return min(max_concurrency, requests_count, self._max_pool_size)
+
+    @staticmethod
+    def _get_cancel_query_command(client_request_id: str) -> str:
+        return '.cancel query "{}"'.format(client_request_id.replace("\\", "\\\\").replace('"', '\\"'))
+
     def validate_endpoint(self):
         if not self._endpoint_validated and self._aad_helper is not None:
             # Trusted-endpoint validation must run for every authentication method. Gating it on the
@@ -266,3 +372,36 @@ class ExecuteRequestParams:
         self.request_headers = request_headers
         self.timeout = timeout
         self.payload = payload
+        self.client_request_id_prefix = client_request_id_prefix
+        self.client_server_delta = client_server_delta
+
+    def _for_attempt(
+        self, properties: Optional[ClientRequestProperties], retry: int, timeout: timedelta
+    ) -> Tuple["ExecuteRequestParams", Optional[ClientRequestProperties]]:
+        """
+        Returns the request and properties of an attempt of a retried request, with the attempt's timeout.
+        Retries get a new client request id, and when the attempt's timeout was cut to the retry deadline, so is the service's timeout of the query.
+        """
+        attempt = copy.copy(self)
+        attempt.timeout = timeout
+        if retry == 0 and timeout >= self.timeout:
+            return attempt, properties
+
+        attempt_properties = _copy_properties(properties)
+        if retry == 0:
+            attempt_properties.client_request_id = properties.client_request_id if properties else None
+        elif properties is not None and properties.client_request_id:
+            attempt_properties.client_request_id = "{};retry{}".format(properties.client_request_id, retry)
+        else:
+            attempt_properties.client_request_id = self.client_request_id_prefix + str(uuid.uuid4())
+        # The headers are shared with the request, so that it carries the client request id of its latest attempt, e.g. to cancel it
+        if attempt_properties.client_request_id is not None:
+            attempt.request_headers["x-ms-client-request-id"] = attempt_properties.client_request_id.encode("ascii", "replace").decode("ascii", "strict")
+
+        if timeout < self.timeout and self.json_payload is not None and "csl" in self.json_payload:
+            # The service keeps its margin from the client's timeout, so it reports the timeout before the client gives up
+            server_timeout = max(timeout - self.client_server_delta, _MIN_SERVER_TIMEOUT)
+            attempt_properties.set_option(ClientRequestProperties.request_timeout_option_name, server_timeout)
+            attempt_properties._options.pop(ClientRequestProperties.no_request_timeout_option_name, None)
+            attempt.json_payload = dict(self.json_payload, properties=attempt_properties.to_json())
+        return attempt, attempt_properties
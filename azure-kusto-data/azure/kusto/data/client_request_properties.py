@@ -1,5 +1,5 @@
 import json
-from typing import Any
+from typing import Any, Optional
 
 from ._string_utils import assert_string_is_not_empty
 
@@ -58,3 +58,14 @@ class ClientRequestProperties:
     def get_tracing_attributes(self) -> dict:
         """Gets dictionary of attributes to be documented during tracing"""
         return {self._CLIENT_REQUEST_ID: str(self.client_request_id)}
+
+
+def _copy_properties(properties: Optional[ClientRequestProperties]) -> ClientRequestProperties:
+    """Copies the options and parameters of the properties. The client request id isn't copied, since every request needs its own."""
+    copy = ClientRequestProperties()
+    if properties is not None:
+        copy._options = dict(properties._options)
+        copy._parameters = dict(properties._parameters)
+        copy.application = properties.application
+        copy.user = properties.user
+    return copy
@@ -0,0 +1,179 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Hashable, List, Optional, Tuple, Union
+
+from .query_cache import BaseQueryResultCache, QueryCacheStatistics
+from .response import KustoResponseDataSet, _result_from_json, _result_to_json
+
+_FILE_SUFFIX = ".kqr.json"
+
+
+class DiskQueryResultCache(BaseQueryResultCache):
+    """
+    A query result cache that persists results as files in a directory, so they survive the process and can be shared by several processes
+    (e.g. notebooks and scheduled jobs re-running the same historical queries).
+    Each result is stored in its own file, named after a fingerprint of the query key. When the total size of the files exceeds `max_size_bytes`,
+    the least recently used results are deleted.
+    Results don't expire unless a `ttl` is given, use `invalidate` or `clear` to remove them explicitly.
+
+    Results are keyed by the authentication identity of the client as well, so processes that authenticate as different principals never share them.
+    The aio client reads and writes the files in an executor, so they don't block the event loop.
+
+    To use it, call `set_query_cache` on a client. Only `execute_query` calls are cached.
+    """
+
+    DEFAULT_MAX_SIZE_BYTES = 10 * 1024 * 1024 * 1024
+    blocking_io = True
+
+    def __init__(
+        self,
+        directory: Union[str, os.PathLike],
+        max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+        ttl: Optional[timedelta] = None,
+        time_provider: Callable[[], float] = time.time,
+    ):
+        """
+        :param directory: The directory the results are stored in. It is created if it doesn't exist.
+        :param int max_size_bytes: Upper bound on the total size of the cached results' files.
+        :param Optional[timedelta] ttl: Default time to live of the cached results. None means results don't expire.
+        :param time_provider: Returns the current (wall clock) time in seconds. Used by tests.
+        """
+        if max_size_bytes <= 0:
+            raise ValueError("max_size_bytes must be positive")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = max_size_bytes
+        self.ttl = ttl
+        self._time_provider = time_provider
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @staticmethod
+    def fingerprint(key: Hashable) -> str:
+        """Returns the stable fingerprint of a key, which is also the name of the result's file (without the suffix)."""
+        return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[KustoResponseDataSet]:
+        path = self._path(key)
+        try:
+            with path.open("rb") as f:
+                entry = json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self._misses += 1
+            return None
+
+        expires_at = entry.get("ExpiresAt")
+        if expires_at is not None and expires_at <= self._time_provider():
+            self._unlink(path)
+            with self._lock:
+                self._expirations += 1
+                self._misses += 1
+            return None
+
+        self._touch(path)
+        with self._lock:
+            self._hits += 1
+        return _result_from_json(entry["Result"])
+
+    def put(self, key: Hashable, result: KustoResponseDataSet, ttl: Optional[timedelta] = None):
+        """
+        Stores a result under the key, replacing any previous result.
+        Results that carry query errors are not cached.
+        """
+        if result.errors_count > 0:
+            return
+        ttl = ttl if ttl is not None else self.ttl
+        entry = {
+            "Key": key,
+            "ExpiresAt": self._time_provider() + ttl.total_seconds() if ttl is not None else None,
+            "Result": _result_to_json(result),
+        }
+        data = json.dumps(entry, default=str).encode("utf-8")
+        if len(data) > self.max_size_bytes:
+            return
+
+        # Write to a temporary file first, so that readers never observe a partially written result
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            self._unlink(Path(temp_path))
+            raise
+
+        self._touch(self._path(key))
+        self._evict()
+
+    def invalidate(self, key: Hashable):
+        self._unlink(self._path(key))
+
+    def clear(self):
+        for path, _, _ in self._list_entries():
+            self._unlink(path)
+
+    @property
+    def statistics(self) -> QueryCacheStatistics:
+        entries = self._list_entries()
+        with self._lock:
+            return QueryCacheStatistics(self._hits, self._misses, self._evictions, self._expirations, len(entries), sum(size for _, size, _ in entries))
+
+    def __len__(self) -> int:
+        return len(self._list_entries())
+
+    def _path(self, key: Hashable) -> Path:
+        return self.directory / (self.fingerprint(key) + _FILE_SUFFIX)
+
+    def _list_entries(self) -> List[Tuple[Path, int, float]]:
+        entries = []
+        for path in self.directory.glob("*" + _FILE_SUFFIX):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Removed concurrently
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        entries = self._list_entries()
+        total_size = sum(size for _, size, _ in entries)
+        if total_size <= self.max_size_bytes:
+            return
+
+        evictions = 0
+        for path, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total_size <= self.max_size_bytes:
+                break
+            self._unlink(path)
+            evictions += 1
+            total_size -= size
+        with self._lock:
+            self._evictions += evictions
+
+    def _touch(self, path: Path):
+        # The file's modification time is the last use time, which drives the eviction order
+        now = self._time_provider()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _unlink(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
@@ -1,6 +1,8 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
+import email.utils
 import json
+from datetime import datetime, timezone
 from dataclasses import dataclass
 from typing import List, Union, TYPE_CHECKING, Optional, Dict, Any
 
@@ -164,6 +166,20 @@ class KustoUnsupportedApiError(KustoError):
         return KustoUnsupportedApiError("Progressive API is unsupported - to resolve, set results_progressive_enabled=false")
 
 
+class KustoUnsupportedLocalQueryError(KustoClientError):
+    """Raised when a query can't be evaluated locally by `azure.kusto.data.local_query`, and must be sent to the service."""
+
+
+class KustoOperationError(KustoServiceError):
+    """Raised when an asynchronous operation, tracked by `azure.kusto.data.operations.OperationHandle`, ends in a state other than Completed."""
+
+    def __init__(self, operation_id: str, state: str, status: Optional[str]):
+        super().__init__("Operation {} ended in state {}: {}".format(operation_id, state, status))
+        self.operation_id = operation_id
+        self.state = state
+        self.status = status
+
+
 class KustoAuthenticationError(KustoClientError):
     """Raised when authentication fails."""
 
@@ -201,7 +217,28 @@ class KustoAsyncUsageError(Exception):
 class KustoThrottlingError(KustoError):
     """Raised when API call gets throttled by the server."""
 
-    ...
+    def __init__(self, message: str, http_response: "Union[requests.Response, ClientResponse, None]" = None):
+        super().__init__(message)
+        self.http_response = http_response
+
+    def get_raw_http_response(self) -> "Union[requests.Response, ClientResponse, None]":
+        """Gets the http response."""
+        return self.http_response
+
+    def get_retry_after(self) -> Optional[float]:
+        """Gets the amount of seconds the server asked to wait before retrying, from the response's Retry-After header, if it has one."""
+        value = self.http_response.headers.get("Retry-After") if self.http_response is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
 
 
 class KustoClientInvalidConnectionStringException(KustoError):
@@ -215,3 +252,11 @@ class KustoClosedError(KustoError):
 
     def __init__(self):
         super().__init__("The client cannot be used because it was closed in the past.")
+
+
+class KustoCircuitOpenError(KustoError):
+    """Raised when a request is rejected without being sent, because the admission controller's circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("The request was rejected because of repeated throttling or network errors, retry in {:.1f} seconds.".format(retry_after))
+        self.retry_after = retry_after
@@ -0,0 +1,237 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import contextvars
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Awaitable, Callable, Deque, Optional, Set, Tuple, TypeVar
+
+from .client_request_properties import ClientRequestProperties, _copy_properties
+
+T = TypeVar("T")
+
+_CLIENT_REQUEST_ID_PREFIX = "KPC.execute;"
+
+# Server-side cancellations of the losing requests of the aio client, referenced until they are done
+_background_cancels: Set["asyncio.Task[None]"] = set()
+
+
+class HedgingPolicy:
+    """
+    Reduces the tail latency of `execute_query` by hedging: when a query didn't return within a delay, a duplicate request is sent (the same query,
+    with a new client request id), and the first response wins. The losing request is abandoned, and cancelled on the service with `.cancel query`.
+    The aio client also closes the losing request's connection. The sync client sends both requests on worker threads and returns as soon as one
+    of them succeeds, leaving the other one to complete (or fail) in the background.
+
+    The delay is a percentile of the latencies of recent queries, so only the slowest queries (e.g. the slowest 5% for the 95th percentile) are
+    hedged, which bounds the extra load. Until there are enough samples, `initial_delay` is used.
+    Only queries are hedged, never management commands. Enable it with `set_hedging_policy` on the sync or aio client, and `close` it once it isn't
+    used anymore, to stop the threads of the sync client's hedged queries.
+    """
+
+    DEFAULT_PERCENTILE = 95.0
+    DEFAULT_INITIAL_DELAY = timedelta(seconds=1)
+    DEFAULT_MIN_DELAY = timedelta(milliseconds=50)
+    DEFAULT_MAX_DELAY = timedelta(seconds=10)
+
+    def __init__(
+        self,
+        percentile: float = DEFAULT_PERCENTILE,
+        initial_delay: timedelta = DEFAULT_INITIAL_DELAY,
+        min_delay: timedelta = DEFAULT_MIN_DELAY,
+        max_delay: timedelta = DEFAULT_MAX_DELAY,
+        window_size: int = 1000,
+        min_samples: int = 20,
+        max_workers: int = 64,
+    ):
+        """
+        :param float percentile: The percentile of recent latencies a query is hedged after, between 0 and 100.
+        :param timedelta initial_delay: The delay used until there are `min_samples` latencies.
+        :param timedelta min_delay: The minimum delay.
+        :param timedelta max_delay: The maximum delay.
+        :param int window_size: The amount of recent latencies the percentile is calculated over.
+        :param int min_samples: The amount of latencies needed before the percentile is used.
+        :param int max_workers: The maximum amount of concurrent requests of the sync client's hedged queries.
+        """
+        if not 0 <= percentile <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        self.percentile = percentile
+        self.initial_delay = initial_delay.total_seconds()
+        self.min_delay = min_delay.total_seconds()
+        self.max_delay = max_delay.total_seconds()
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self.hedged_count = 0
+        self.hedge_wins = 0
+        self._latencies: Deque[float] = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def get_delay(self) -> float:
+        """The current hedging delay, in seconds."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < self.min_samples:
+            delay = self.initial_delay
+        else:
+            delay = latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))]
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def _record_result(self, seconds: float, hedged: bool, hedge_won: bool):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.hedged_count += hedged
+            self.hedge_wins += hedge_won
+
+    def close(self):
+        """Stops the threads of the sync client's hedged queries. They are started again if the policy is used afterwards."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="KustoHedging")
+            return self._executor
+
+
+def _hedged_properties(properties: Optional[ClientRequestProperties]) -> Tuple[ClientRequestProperties, ClientRequestProperties]:
+    """Returns the properties of the original request and of the hedged request, each with its own client request id."""
+    primary = _copy_properties(properties)
+    hedge = _copy_properties(properties)
+    if properties is not None and properties.client_request_id:
+        primary.client_request_id = properties.client_request_id
+        hedge.client_request_id = properties.client_request_id + ";hedge"
+    else:
+        primary.client_request_id = _CLIENT_REQUEST_ID_PREFIX + str(uuid.uuid4())
+        hedge.client_request_id = _CLIENT_REQUEST_ID_PREFIX + str(uuid.uuid4())
+    return primary, hedge
+
+
+def _cancel_quietly(cancel: Callable[[str], object], client_request_id: str):
+    try:
+        cancel(client_request_id)
+    except Exception:
+        # Best effort - the query may have completed already
+        pass
+
+
+def _submit(executor: ThreadPoolExecutor, fn: Callable[..., T], *args) -> Optional["Future[T]"]:
+    """Submits a call to the policy's executor, or returns None if the policy was closed meanwhile."""
+    try:
+        return executor.submit(fn, *args)
+    except RuntimeError:
+        return None
+
+
+def _send_timed(send: Callable[[ClientRequestProperties], T], properties: ClientRequestProperties) -> Tuple[T, float]:
+    # Returns when the request was actually sent as well, so that queueing for a worker doesn't skew the latencies
+    start = time.monotonic()
+    return send(properties), start
+
+
+def _execute_hedged(
+    policy: HedgingPolicy,
+    properties: Optional[ClientRequestProperties],
+    send: Callable[[ClientRequestProperties], T],
+    cancel: Callable[[str], object],
+) -> T:
+    """
+    Sends a request, and a hedged duplicate of it if it didn't complete within the policy's delay. Returns the first successful response, without
+    waiting for the other request, which is cancelled on the service in the background.
+    """
+    primary_properties, hedge_properties = _hedged_properties(properties)
+    executor = policy._get_executor()
+
+    def submit(request_properties: ClientRequestProperties) -> Optional[Future]:
+        # The requests run in the caller's context, e.g. in its request lane
+        return _submit(executor, contextvars.copy_context().run, _send_timed, send, request_properties)
+
+    primary = submit(primary_properties)
+    if primary is None:
+        # The policy was closed meanwhile, so the request isn't hedged
+        return send(primary_properties)
+    requests = {primary: primary_properties}
+    try:
+        if not wait([primary], timeout=policy.get_delay()).done:
+            hedge = submit(hedge_properties)
+            if hedge is not None:
+                requests[hedge] = hedge_properties
+
+        pending = set(requests)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    continue
+                for loser, loser_properties in requests.items():
+                    if loser is not future and not loser.done() and not loser.cancel():
+                        _submit(executor, _cancel_quietly, cancel, loser_properties.client_request_id)
+                result, start = future.result()
+                policy._record_result(time.monotonic() - start, len(requests) > 1, future is not primary)
+                return result
+        # Both failed, or the original failed before the delay - retrying is up to the caller
+        raise primary.exception()
+    except BaseException:
+        # E.g. a KeyboardInterrupt - the requests that didn't start yet are dropped
+        for future in requests:
+            future.cancel()
+        raise
+
+
+async def _execute_hedged_async(
+    policy: HedgingPolicy,
+    properties: Optional[ClientRequestProperties],
+    send: Callable[[ClientRequestProperties], Awaitable[T]],
+    cancel: Callable[[str], Awaitable[object]],
+) -> T:
+    """The aio equivalent of `_execute_hedged`. The losing request's task is cancelled, which closes its connection."""
+    primary_properties, hedge_properties = _hedged_properties(properties)
+    start = time.monotonic()
+    primary = asyncio.ensure_future(send(primary_properties))
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=policy.get_delay())
+        if done:
+            result = primary.result()
+            policy._record_result(time.monotonic() - start, False, False)
+            return result
+
+        hedge_start = time.monotonic()
+        hedge = asyncio.ensure_future(send(hedge_properties))
+        tasks.append(hedge)
+        requests = {primary: (hedge, hedge_properties, start), hedge: (primary, primary_properties, hedge_start)}
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    continue
+                loser, loser_properties, task_start = requests[task]
+                if not loser.done():
+                    loser.cancel()
+                    cancellation = asyncio.ensure_future(_cancel_quietly_async(cancel, loser_properties.client_request_id))
+                    _background_cancels.add(cancellation)
+                    cancellation.add_done_callback(_background_cancels.discard)
+                policy._record_result(time.monotonic() - task_start, True, task is hedge)
+                return task.result()
+        raise primary.exception()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            # Retrieve the exceptions of the abandoned requests, so they aren't reported as never retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def _cancel_quietly_async(cancel: Callable[[str], Awaitable[object]], client_request_id: str):
+    try:
+        await cancel(client_request_id)
+    except Exception:
+        pass
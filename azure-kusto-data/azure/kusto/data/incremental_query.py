@@ -0,0 +1,199 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from ._models import KustoResultRow, KustoResultTable, WellKnownDataSet
+from .bulk import _execute_with_retries, _kql_datetime_literal
+from .client_request_properties import ClientRequestProperties, _copy_properties
+from .exceptions import KustoClientError
+from .helpers import dataframe_from_result_table
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .client import KustoClient
+
+INGESTION_TIME_COLUMN = "_IngestionTime"
+WATERMARK_PARAMETER = "_watermark"
+
+# The types of the columns rows can be tracked by, whose values can be compared and written as a query parameter
+_WATERMARK_TYPES = frozenset(["datetime", "int", "long", "real", "decimal"])
+
+
+def _validate_watermark_type(watermark_column: str, watermark_type: str, lookback: Optional[timedelta]):
+    if watermark_type not in _WATERMARK_TYPES:
+        raise KustoClientError("The watermark column '{}' must be a datetime or a number, it is {}".format(watermark_column, watermark_type))
+    if lookback is not None and watermark_type != "datetime":
+        raise KustoClientError("A lookback requires a datetime watermark column, '{}' is {}".format(watermark_column, watermark_type))
+
+
+def _watermark_literal(watermark_type: str, watermark: Any, lookback: Optional[timedelta]) -> str:
+    """The value of the watermark parameter: the watermark, or the start of the lookback window before it."""
+    if lookback is not None:
+        return _kql_datetime_literal(KustoResultRow.get_typed_value("datetime", watermark) - lookback)
+    return "{}({})".format(watermark_type, watermark)
+
+
+class IncrementalQuery:
+    """
+    Keeps a local copy of a query's result up to date, by fetching only the rows added since the previous refresh.
+    The rows are tracked by a watermark: the largest value of a column seen so far. By default the column is the ingestion time of the rows,
+    added to the result as `_IngestionTime`. A column of the query's result can be used instead, it must be a datetime or a number that only
+    grows for new rows.
+    Each `refresh` runs the query with a `where <column> > <watermark>` filter, appends the new rows and advances the watermark.
+    Rows that become visible after rows with a later watermark, e.g. the rows of extents that were committed late, with an earlier ingestion time,
+    are missed by this filter. A `lookback` fetches the rows of a window before the watermark again, and skips the ones that were already fetched,
+    so such rows are found as long as they are late by less than the lookback. Identical rows within the window are kept once.
+    With a `retention`, rows whose (datetime) watermark column is older than the retention are evicted locally, and the first refresh only fetches
+    rows within the retention.
+
+    The query must return rows, not aggregates over them, since the new rows are appended to the previous ones:
+        events = IncrementalQuery(client, "db", "Events | where Level == 'Error'", retention=timedelta(hours=1))
+        while True:
+            events.refresh()
+            process(events.to_dataframe())
+    """
+
+    def __init__(
+        self,
+        client: "KustoClient",
+        database: Optional[str],
+        query: str,
+        watermark_column: Optional[str] = None,
+        retention: Optional[timedelta] = None,
+        retries: int = 3,
+        properties: Optional[ClientRequestProperties] = None,
+        time_provider: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+        lookback: Optional[timedelta] = None,
+    ):
+        """
+        :param KustoClient client: The client to run the query with.
+        :param Optional[str] database: Database against query will be executed. If not provided, will default to the "Initial Catalog" of the client
+        :param str query: The query.
+        :param Optional[str] watermark_column: The column the new rows are found by. If not provided, the ingestion time of the rows is used.
+        :param Optional[timedelta] retention: How long rows are kept, by their watermark column. None keeps all of the rows.
+        :param int retries: The maximum amount of retries for each refresh, when it fails with a transient error.
+        :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties, applied to every refresh.
+        :param time_provider: Returns the current time as an aware datetime. Used by tests.
+        :param Optional[timedelta] lookback: How far before the watermark rows are fetched again, to find late rows. Requires a datetime watermark.
+        """
+        self.client = client
+        self.database = database
+        self.query = query.strip()
+        self.watermark_column = watermark_column or INGESTION_TIME_COLUMN
+        self.retention = retention
+        self.retries = retries
+        self.properties = properties
+        self.lookback = lookback
+        self.watermark: Optional[Any] = None
+        self._add_ingestion_time = watermark_column is None
+        self._time_provider = time_provider
+        self._table_name = None
+        self._columns: Optional[List[Dict[str, Any]]] = None
+        self._watermark_index: Optional[int] = None
+        self._watermark_type: Optional[str] = None
+        self._rows: List[list] = []
+        # The rows within the lookback window, by their json, with their watermark
+        self._recent_rows: Dict[str, datetime] = {}
+
+    def refresh(self) -> int:
+        """
+        Fetches the rows added since the previous refresh, and evicts the rows past the retention.
+        :return: The amount of new rows.
+        """
+        query, properties = self._build_query()
+        response = _execute_with_retries(lambda: self.client.execute_query(self.database, query, properties), self.retries)
+        table = response.primary_results[0]
+        self._set_columns(table)
+
+        rows = self._skip_fetched_rows(table.raw_rows)
+        watermarks = [row[self._watermark_index] for row in rows if row[self._watermark_index] is not None]
+        if self.watermark is not None:
+            watermarks.append(self.watermark)
+        if watermarks:
+            self.watermark = max(watermarks, key=self._watermark_sort_key)
+        self._rows.extend(rows)
+        self._evict()
+        return len(rows)
+
+    @property
+    def result(self) -> KustoResultTable:
+        """The rows fetched so far, within the retention."""
+        if self._columns is None:
+            raise KustoClientError("The query wasn't refreshed yet")
+        return KustoResultTable(
+            {"TableName": self._table_name, "TableId": 0, "TableKind": WellKnownDataSet.PrimaryResult.value, "Columns": self._columns, "Rows": self._rows}
+        )
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        return dataframe_from_result_table(self.result)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _build_query(self) -> Tuple[str, ClientRequestProperties]:
+        properties = _copy_properties(self.properties)
+        query = self.query
+        if self._add_ingestion_time:
+            query += "\n| extend {} = ingestion_time()".format(INGESTION_TIME_COLUMN)
+
+        if self.watermark is not None:
+            parameter_type = self._watermark_type
+            parameter_value = _watermark_literal(self._watermark_type, self.watermark, self.lookback)
+        elif self.retention is not None:
+            parameter_type = "datetime"
+            parameter_value = _kql_datetime_literal(self._time_provider() - self.retention)
+        else:
+            return query, properties
+
+        properties.set_parameter(WATERMARK_PARAMETER, parameter_value)
+        query = "declare query_parameters({}:{});\n{}\n| where {} > {}".format(
+            WATERMARK_PARAMETER, parameter_type, query, self.watermark_column, WATERMARK_PARAMETER
+        )
+        return query, properties
+
+    def _set_columns(self, table: KustoResultTable):
+        if self._columns is None:
+            names = [c.column_name for c in table.columns]
+            if self.watermark_column not in names:
+                raise KustoClientError("The result of the query has no '{}' column".format(self.watermark_column))
+            self._table_name = table.table_name
+            self._columns = table.raw_columns
+            self._watermark_index = names.index(self.watermark_column)
+            self._watermark_type = table.columns[self._watermark_index].column_type.lower()
+            _validate_watermark_type(self.watermark_column, self._watermark_type, self.lookback)
+            if self.retention is not None and self._watermark_type != "datetime":
+                raise KustoClientError("A retention requires a datetime watermark column, '{}' is {}".format(self.watermark_column, self._watermark_type))
+        elif [c.column_name for c in table.columns] != [c.get("ColumnName") for c in self._columns]:
+            raise KustoClientError("The columns of the query's result changed between refreshes")
+
+    def _skip_fetched_rows(self, rows: List[list]) -> List[list]:
+        """Returns the rows that weren't fetched before, and remembers the rows within the lookback window."""
+        if self.lookback is None:
+            return rows
+        index = self._watermark_index
+        new_rows = []
+        for row in rows:
+            # Rows without a watermark don't pass the filter, so they are never fetched again
+            key = json.dumps(row) if row[index] is not None else None
+            if key is None or key not in self._recent_rows:
+                if key is not None:
+                    self._recent_rows[key] = KustoResultRow.get_typed_value("datetime", row[index])
+                new_rows.append(row)
+        # Forget the rows that fell out of the window, they won't be fetched again
+        if self._recent_rows:
+            start = max(self._recent_rows.values()) - self.lookback
+            self._recent_rows = {key: watermark for key, watermark in self._recent_rows.items() if watermark >= start}
+        return new_rows
+
+    def _watermark_sort_key(self, value: Any) -> Tuple[Any, Any]:
+        # The raw value breaks ties between datetimes that differ only in the 7th fractional digit, which Python's datetime doesn't hold
+        return KustoResultRow.get_typed_value(self._watermark_type, value), value
+
+    def _evict(self):
+        if self.retention is None:
+            return
+        cutoff = self._time_provider() - self.retention
+        index = self._watermark_index
+        self._rows = [row for row in self._rows if row[index] is None or KustoResultRow.get_typed_value("datetime", row[index]) >= cutoff]
@@ -141,6 +141,24 @@ class KustoConnectionStringBuilder:
 
     application_public_certificate: Optional[str] = None
 
+    # The attributes that aren't part of the connection string, but still determine how the builder's clients authenticate
+    _IDENTITY_ATTRIBUTES: ClassVar[Tuple[str, ...]] = (
+        "interactive_login",
+        "az_cli_login",
+        "device_login",
+        "token_credential_login",
+        "device_callback",
+        "msi_authentication",
+        "msi_parameters",
+        "token_provider",
+        "async_token_provider",
+        "azure_credential",
+        "azure_credential_from_login_endpoint",
+        "application_public_certificate",
+        "application_for_tracing",
+        "user_name_for_tracing",
+    )
+
     def __init__(self, connection_string: str):
         """
         Creates new KustoConnectionStringBuilder.
@@ -637,6 +655,11 @@ class KustoConnectionStringBuilder:
     def __repr__(self) -> str:
         return self._build_connection_string(self._internal_dict)
 
+    def _identity_settings(self) -> List[Tuple[str, Any]]:
+        """Returns the settings that determine the cluster and the authentication identity of the builder's clients: all but the default database."""
+        connection_string = sorted((str(keyword), value) for keyword, value in self._internal_dict.items() if keyword != SupportedKeywords.INITIAL_CATALOG)
+        return connection_string + [(name, getattr(self, name)) for name in self._IDENTITY_ATTRIBUTES]
+
     def _build_connection_string(self, kcsb_as_dict: dict) -> str:
         return ";".join(["{0}={1}".format(word.value, kcsb_as_dict[word]) for word in SupportedKeywords if word in kcsb_as_dict])
 
@@ -0,0 +1,454 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+"""
+Local evaluation of a small subset of KQL over results that are already held by the client.
+
+Supported operators: `where`, `project`, `take`/`limit`, `top N by <column> [asc|desc] [nulls first|last]`, `count`,
+and `summarize [Name =] count() [by <columns>]`. `where` predicates may combine comparisons of columns and literals (`==`, `!=`, `<`, `<=`, `>`,
+`>=`, `=~`, `!~`, `contains`, `!contains`, `startswith`, `endswith`, `in`, `!in`, `isnull()`, `isnotnull()`, `isempty()`, `isnotempty()`)
+with `and`, `or`, `not()` and parentheses. Literals are strings, numbers, `true`, `false`, `null` and `datetime(...)`.
+Anything else raises `KustoUnsupportedLocalQueryError`, and should be sent to the service.
+"""
+
+import re
+from datetime import timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dateutil import parser
+
+from ._models import KustoResultRow, KustoResultTable
+from .exceptions import KustoUnsupportedLocalQueryError
+from .response import KustoResponseDataSet
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<verbatim>@'[^']*'|@"[^"]*")
+    | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+    | (?P<datetime>datetime\s*\([^)]*\))
+    | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    | (?P<operator>==|!=|<=|>=|=~|!~|!(?:contains|in|startswith|endswith)\b|[<>()=,|-])
+    | (?P<identifier>[A-Za-z_][A-Za-z0-9_]*|\['[^']*'\]|\["[^"]*"\])
+    """,
+    re.VERBOSE,
+)
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
+_COMPARISONS = {"==", "!=", "<", "<=", ">", ">=", "=~", "!~", "contains", "!contains", "startswith", "endswith"}
+_NULL_CHECKS = {
+    "isnull": lambda v: v is None,
+    "isnotnull": lambda v: v is not None,
+    "isempty": lambda v: v is None or v == "",
+    "isnotempty": lambda v: v is not None and v != "",
+}
+
+Columns = List[Dict[str, Any]]
+Rows = List[list]
+
+
+class _Token:
+    def __init__(self, kind: str, text: str):
+        self.kind = kind
+        self.text = text
+
+    def is_(self, text: str) -> bool:
+        return self.kind in ("operator", "identifier") and self.text == text
+
+
+def _tokenize(text: str) -> List[_Token]:
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if match is None:
+            raise KustoUnsupportedLocalQueryError("Unsupported syntax at: " + text[position : position + 20])
+        if match.lastgroup != "space":
+            tokens.append(_Token(match.lastgroup, match.group()))
+        position = match.end()
+    return tokens
+
+
+def split_pipes(query: str) -> List[str]:
+    """Splits a query at its top level `|` characters, ignoring those in string literals, comments and brackets."""
+    parts = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(query):
+        c = query[i]
+        if c == "/" and query.startswith("//", i):
+            end = query.find("\n", i)
+            i = len(query) if end == -1 else end
+            continue
+        if c in "'\"":
+            verbatim = i > 0 and query[i - 1] == "@"
+            i += 1
+            while i < len(query) and query[i] != c:
+                i += 2 if query[i] == "\\" and not verbatim else 1
+        elif c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            parts.append(query[start:i])
+            start = i + 1
+        i += 1
+    parts.append(query[start:])
+    return parts
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self) -> Optional[_Token]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self) -> _Token:
+        token = self.peek()
+        if token is None:
+            raise KustoUnsupportedLocalQueryError("Unexpected end of operator")
+        self.position += 1
+        return token
+
+    def accept(self, text: str) -> bool:
+        token = self.peek()
+        if token is not None and token.is_(text):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, text: str):
+        if not self.accept(text):
+            raise KustoUnsupportedLocalQueryError("Expected '{}'".format(text))
+
+    def at_end(self) -> bool:
+        return self.peek() is None
+
+    def column_name(self) -> str:
+        token = self.next()
+        if token.kind != "identifier":
+            raise KustoUnsupportedLocalQueryError("Expected a column name, got '{}'".format(token.text))
+        return token.text[2:-2] if token.text.startswith("[") else token.text
+
+    def integer(self) -> int:
+        token = self.next()
+        if token.kind != "number" or not token.text.isdigit():
+            raise KustoUnsupportedLocalQueryError("Expected an integer, got '{}'".format(token.text))
+        return int(token.text)
+
+    def literal(self) -> Any:
+        negative = self.accept("-")
+        token = self.next()
+        if token.kind == "number":
+            value = float(token.text) if any(c in token.text for c in ".eE") else int(token.text)
+            return -value if negative else value
+        if negative:
+            raise KustoUnsupportedLocalQueryError("Expected a number after '-'")
+        if token.kind == "verbatim":
+            return token.text[2:-1]
+        if token.kind == "string":
+            return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), token.text[1:-1])
+        if token.kind == "datetime":
+            try:
+                value = parser.isoparse(token.text[token.text.index("(") + 1 : -1].strip())
+            except ValueError:
+                raise KustoUnsupportedLocalQueryError("Unsupported datetime literal: " + token.text)
+            return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+        if token.is_("true") or token.is_("false"):
+            return token.text == "true"
+        if token.is_("null"):
+            return None
+        raise KustoUnsupportedLocalQueryError("Expected a literal, got '{}'".format(token.text))
+
+
+class _Table:
+    def __init__(self, columns: Columns, rows: Rows):
+        self.columns = columns
+        self.rows = rows
+
+    def index(self, name: str) -> int:
+        for i, column in enumerate(self.columns):
+            if column["ColumnName"] == name:
+                return i
+        raise KustoUnsupportedLocalQueryError("Unknown column '{}'".format(name))
+
+    def typed_getter(self, name: str) -> Callable[[list], Any]:
+        index = self.index(name)
+        column_type = (self.columns[index].get("ColumnType") or self.columns[index]["DataType"]).lower()
+        return lambda row: KustoResultRow.get_typed_value(column_type, row[index])
+
+    def new_column(self, name: str, column_type: str) -> Dict[str, Any]:
+        column = {"ColumnName": name, "ColumnType": column_type}
+        if self.columns and "DataType" in self.columns[0]:
+            column["DataType"] = {"long": "Int64"}[column_type]
+        return column
+
+
+def _and(values: List[Optional[bool]]) -> Optional[bool]:
+    if any(v is False for v in values):
+        return False
+    return None if any(v is None for v in values) else True
+
+
+def _or(values: List[Optional[bool]]) -> Optional[bool]:
+    if any(v is True for v in values):
+        return True
+    return None if any(v is None for v in values) else False
+
+
+def _kind(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float, Decimal)):
+        return "number"
+    return type(value).__name__
+
+
+def _compare(operator: str, left: Any, right: Any) -> Optional[bool]:
+    if left is None or right is None:
+        return None
+    if _kind(left) != _kind(right):
+        # KQL either converts the values or fails the query, so leave it to the service
+        raise KustoUnsupportedLocalQueryError("Can't compare {} with {}".format(_kind(left), _kind(right)))
+    if operator in ("=~", "!~", "contains", "!contains", "startswith", "endswith"):
+        if not isinstance(left, str) or not isinstance(right, str):
+            raise KustoUnsupportedLocalQueryError("'{}' is only supported between strings".format(operator))
+        left, right = left.lower(), right.lower()
+    if operator in ("==", "=~"):
+        return left == right
+    if operator in ("!=", "!~"):
+        return left != right
+    if operator == "<":
+        return left < right
+    if operator == "<=":
+        return left <= right
+    if operator == ">":
+        return left > right
+    if operator == ">=":
+        return left >= right
+    if operator == "contains":
+        return right in left
+    if operator == "!contains":
+        return right not in left
+    if operator == "startswith":
+        return left.startswith(right)
+    return left.endswith(right)
+
+
+class _PredicateParser:
+    """Parses a `where` predicate into a function of a raw row, following KQL's null semantics (a comparison with null is neither true nor false)."""
+
+    def __init__(self, parser: _Parser, table: _Table):
+        self.parser = parser
+        self.table = table
+
+    def parse_or(self) -> Callable[[list], Optional[bool]]:
+        terms = [self.parse_and()]
+        while self.parser.accept("or"):
+            terms.append(self.parse_and())
+        return terms[0] if len(terms) == 1 else lambda row: _or([t(row) for t in terms])
+
+    def parse_and(self) -> Callable[[list], Optional[bool]]:
+        terms = [self.parse_unary()]
+        while self.parser.accept("and"):
+            terms.append(self.parse_unary())
+        return terms[0] if len(terms) == 1 else lambda row: _and([t(row) for t in terms])
+
+    def parse_unary(self) -> Callable[[list], Optional[bool]]:
+        if self.parser.accept("("):
+            predicate = self.parse_or()
+            self.parser.expect(")")
+            return predicate
+        token = self.parser.peek()
+        if token is not None and token.kind == "identifier" and (token.text == "not" or token.text in _NULL_CHECKS):
+            self.parser.next()
+            self.parser.expect("(")
+            if token.text == "not":
+                inner = self.parse_or()
+                self.parser.expect(")")
+                return lambda row: None if inner(row) is None else not inner(row)
+            value = self.table.typed_getter(self.parser.column_name())
+            self.parser.expect(")")
+            check = _NULL_CHECKS[token.text]
+            return lambda row: check(value(row))
+        return self.parse_comparison()
+
+    def parse_operand(self) -> Callable[[list], Any]:
+        token = self.parser.peek()
+        if token is not None and token.kind == "identifier" and token.text not in ("true", "false", "null"):
+            return self.table.typed_getter(self.parser.column_name())
+        value = self.parser.literal()
+        return lambda row: value
+
+    def parse_comparison(self) -> Callable[[list], Optional[bool]]:
+        left = self.parse_operand()
+        operator = self.parser.next().text
+        if operator in ("in", "!in"):
+            self.parser.expect("(")
+            values = [self.parser.literal()]
+            while self.parser.accept(","):
+                values.append(self.parser.literal())
+            self.parser.expect(")")
+            negate = operator == "!in"
+            return lambda row: None if left(row) is None else any(_compare("==", left(row), v) for v in values) != negate
+        if operator not in _COMPARISONS:
+            raise KustoUnsupportedLocalQueryError("Unsupported operator '{}'".format(operator))
+        right = self.parse_operand()
+        return lambda row: _compare(operator, left(row), right(row))
+
+
+def _where(parser: _Parser, table: _Table) -> _Table:
+    predicate = _PredicateParser(parser, table).parse_or()
+    return _Table(table.columns, [row for row in table.rows if predicate(row) is True])
+
+
+def _project(parser: _Parser, table: _Table) -> _Table:
+    columns = []
+    indexes = []
+    while True:
+        name = parser.column_name()
+        source = name
+        if parser.accept("="):
+            source = parser.column_name()
+        index = table.index(source)
+        columns.append(dict(table.columns[index], ColumnName=name))
+        indexes.append(index)
+        if not parser.accept(","):
+            break
+    return _Table(columns, [[row[i] for i in indexes] for row in table.rows])
+
+
+def _take(parser: _Parser, table: _Table) -> _Table:
+    return _Table(table.columns, table.rows[: parser.integer()])
+
+
+def _top(parser: _Parser, table: _Table) -> _Table:
+    count = parser.integer()
+    parser.expect("by")
+    value = table.typed_getter(parser.column_name())
+    descending = not parser.accept("asc")
+    if descending:
+        parser.accept("desc")
+    # By default, nulls come last when sorting in descending order, and first in ascending order
+    nulls_first = not descending
+    if parser.accept("nulls"):
+        nulls_first = parser.accept("first")
+        if not nulls_first:
+            parser.expect("last")
+
+    nulls = [row for row in table.rows if value(row) is None]
+    values = sorted((row for row in table.rows if value(row) is not None), key=value, reverse=descending)
+    return _Table(table.columns, (nulls + values if nulls_first else values + nulls)[:count])
+
+
+def _count(table: _Table) -> _Table:
+    return _Table([table.new_column("Count", "long")], [[len(table.rows)]])
+
+
+def _summarize(parser: _Parser, table: _Table) -> _Table:
+    name = "count_"
+    token = parser.next()
+    if not token.is_("count"):
+        if token.kind != "identifier":
+            raise KustoUnsupportedLocalQueryError("Only count() aggregations are supported")
+        name = token.text[2:-2] if token.text.startswith("[") else token.text
+        parser.expect("=")
+        parser.expect("count")
+    parser.expect("(")
+    parser.expect(")")
+
+    indexes = []
+    if parser.accept("by"):
+        indexes.append(table.index(parser.column_name()))
+        while parser.accept(","):
+            indexes.append(table.index(parser.column_name()))
+
+    # Maps each group's key to the group's values and its rows count. Dynamic values aren't hashable, so they are keyed by their text.
+    groups: Dict[Tuple, list] = {}
+    for row in table.rows:
+        key = tuple(repr(row[i]) if isinstance(row[i], (list, dict)) else row[i] for i in indexes)
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [row[i] for i in indexes] + [1]
+        else:
+            group[-1] += 1
+    if not indexes and not groups:
+        groups[()] = [0]
+
+    return _Table([table.columns[i] for i in indexes] + [table.new_column(name, "long")], list(groups.values()))
+
+
+def _apply(table: _Table, operator: str) -> _Table:
+    parser = _Parser(operator)
+    name = parser.next().text
+    if name == "where" or name == "filter":
+        result = _where(parser, table)
+    elif name == "project":
+        result = _project(parser, table)
+    elif name in ("take", "limit"):
+        result = _take(parser, table)
+    elif name == "top":
+        result = _top(parser, table)
+    elif name == "count":
+        result = _count(table)
+    elif name == "summarize":
+        result = _summarize(parser, table)
+    else:
+        raise KustoUnsupportedLocalQueryError("Unsupported operator '{}'".format(name))
+    if not parser.at_end():
+        raise KustoUnsupportedLocalQueryError("Unsupported syntax in operator: " + operator)
+    return result
+
+
+def evaluate(table: KustoResultTable, operators: str) -> KustoResultTable:
+    """
+    Applies a pipeline of supported operators (e.g. "where Level == 'Error' | summarize count() by Source") to a result table.
+    :raises KustoUnsupportedLocalQueryError: If the pipeline uses anything outside of the supported subset of KQL.
+    """
+    result = _Table(table.raw_columns, table.raw_rows)
+    try:
+        for operator in split_pipes(operators.strip()):
+            result = _apply(result, operator.strip())
+    except TypeError as e:
+        # e.g. comparing a string column with a number, which KQL handles differently than Python
+        raise KustoUnsupportedLocalQueryError(str(e)) from e
+    json_table = {"TableName": table.table_name, "TableId": table.table_id, "Columns": result.columns, "Rows": result.rows}
+    if table.table_kind is not None:
+        json_table["TableKind"] = table.table_kind.value
+    return KustoResultTable(json_table)
+
+
+def evaluate_on_data_set(data_set: KustoResponseDataSet, operators: str) -> KustoResponseDataSet:
+    """Applies a pipeline of supported operators to the primary result of a data set, and returns a data set of the same type with the new result."""
+    primary_results = data_set.primary_results
+    if len(primary_results) != 1:
+        raise KustoUnsupportedLocalQueryError("Only data sets with a single primary result are supported")
+    tables = [evaluate(table, operators)._to_json_table() if table is primary_results[0] else table._to_json_table() for table in data_set.tables]
+    return type(data_set)._from_json_tables(tables, data_set.tables_names)
+
+
+def find_refinement(query: str, lookup: Callable[[str], Optional[KustoResponseDataSet]]) -> Optional[KustoResponseDataSet]:
+    """
+    Answers a query locally when it is a previously answered query followed by supported operators.
+    The query is split at its pipes; for each split whose trailing operators are all supported, starting from the longest prefix,
+    `lookup` is called with the prefix, and if it returns a result the operators are applied to it.
+    :return: The result, or None if the query can't be answered locally.
+    """
+    parts = split_pipes(query)
+    for split in range(len(parts) - 1, 0, -1):
+        operators = "|".join(parts[split:])
+        try:
+            for operator in parts[split:]:
+                _Parser(operator)  # Fails fast on syntax the tokenizer doesn't know
+        except KustoUnsupportedLocalQueryError:
+            return None
+        base = lookup("|".join(parts[:split]))
+        if base is None:
+            continue
+        try:
+            return evaluate_on_data_set(base, operators)
+        except KustoUnsupportedLocalQueryError:
+            return None
+    return None
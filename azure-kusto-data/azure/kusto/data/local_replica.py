@@ -0,0 +1,249 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+import os
+import sqlite3
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from ._models import KustoResultColumn, KustoResultRow
+from .client_request_properties import ClientRequestProperties, _copy_properties
+from .exceptions import KustoClientError, KustoServiceError
+from .incremental_query import INGESTION_TIME_COLUMN, WATERMARK_PARAMETER, _validate_watermark_type, _watermark_literal
+
+if TYPE_CHECKING:
+    from .client import KustoClient
+
+_WATERMARKS_TABLE = "_kusto_replica_watermarks"
+_INSERT_BATCH_SIZE = 10_000
+
+# Kusto types stored in a SQLite column type other than TEXT. datetime and timespan values are stored as their (sortable) ISO text.
+_SQLITE_TYPES = {"bool": "INTEGER", "int": "INTEGER", "long": "INTEGER", "real": "REAL"}
+
+
+def _quote_identifier(name: str) -> str:
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+class LocalReplica:
+    """
+    Mirrors the result of a query (a filtered table, or a function) into a table of a local SQLite database, so it can be queried locally.
+    Each `sync` only fetches the rows added since the previous one, through the streaming query path, tracked by a watermark column
+    (the ingestion time of the rows by default, added as `_IngestionTime`).
+
+    The rows can be split into partitions by `hash(<partition key>, <partitions>)`. Every partition is fetched and committed on its own, with its
+    own watermark, so a failure only holds back the partition it happened in, and the next sync resumes each partition from where it stopped.
+
+    Rows are fetched by a `where <column> > <watermark>` filter, so rows that become visible after rows with a later watermark (e.g. the rows of
+    extents that were committed late, with an earlier ingestion time) are missed. A `lookback` fetches the rows of a window before the watermark
+    again, and only inserts the ones the local table doesn't have yet, so such rows are replicated as long as they are late by less than the
+    lookback. Identical rows within the window are stored once.
+
+    Query the replica with `execute_sql`, and use `replicated_until` to tell whether it holds the data a question needs, or the cluster must be queried:
+        replica = LocalReplica(client, "db", "Events | where Level == 'Error'", "replica.db", "Events", partition_key="DeviceId", partitions=8)
+        replica.sync()
+        replica.execute_sql('SELECT DeviceId, COUNT(*) FROM "Events" GROUP BY DeviceId')
+    """
+
+    def __init__(
+        self,
+        client: "KustoClient",
+        database: Optional[str],
+        query: str,
+        path: Union[str, os.PathLike],
+        table_name: str,
+        watermark_column: Optional[str] = None,
+        partition_key: Optional[str] = None,
+        partitions: int = 1,
+        properties: Optional[ClientRequestProperties] = None,
+        lookback: Optional[timedelta] = None,
+    ):
+        """
+        :param KustoClient client: The client to fetch the rows with.
+        :param Optional[str] database: Database against query will be executed. If not provided, will default to the "Initial Catalog" of the client
+        :param str query: The query whose rows are replicated. It must return rows, not aggregates over them.
+        :param path: The path of the SQLite database file. It is created if it doesn't exist.
+        :param str table_name: The name of the local table the rows are stored in.
+        :param Optional[str] watermark_column: The column the new rows are found by. If not provided, the ingestion time of the rows is used.
+        :param Optional[str] partition_key: The column (or expression) the rows are partitioned by. Required when partitions is more than 1.
+        :param int partitions: The amount of partitions.
+        :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties, applied to every query.
+        :param Optional[timedelta] lookback: How far before the watermark rows are fetched again, to find late rows. Requires a datetime watermark.
+        """
+        if partitions < 1:
+            raise ValueError("partitions must be at least 1")
+        if partitions > 1 and partition_key is None:
+            raise ValueError("partition_key is required when there is more than one partition")
+        self.client = client
+        self.database = database
+        self.query = query.strip()
+        self.table_name = table_name
+        self.watermark_column = watermark_column or INGESTION_TIME_COLUMN
+        self.partition_key = partition_key
+        self.partitions = partitions
+        self.properties = properties
+        self.lookback = lookback
+        self._add_ingestion_time = watermark_column is None
+        self._connection = sqlite3.connect(os.fspath(path))
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS {} (TableName TEXT, Partition INTEGER, Watermark TEXT, WatermarkType TEXT, "
+                "PRIMARY KEY (TableName, Partition))".format(_WATERMARKS_TABLE)
+            )
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self) -> "LocalReplica":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def sync(self) -> int:
+        """
+        Fetches the rows added since the previous sync, one partition at a time.
+        :return: The amount of new rows.
+        """
+        return sum(self.sync_partition(i) for i in range(self.partitions))
+
+    def sync_partition(self, index: int) -> int:
+        """
+        Fetches the rows of a single partition added since its previous sync, and commits them together with the partition's new watermark.
+        :return: The amount of new rows.
+        """
+        watermark = self._get_watermark(index)
+        properties = _copy_properties(self.properties)
+        query = self._partition_query(index, watermark, properties)
+
+        with self.client.execute_streaming_query(self.database, query, properties=properties) as response, self._connection:
+            table = next(response.iter_primary_results())
+            columns = table.columns
+            self._ensure_table(columns)
+            watermark_index = [c.column_name for c in columns].index(self.watermark_column)
+            watermark_type = columns[watermark_index].column_type.lower()
+            # Rows of the lookback window may already be in the local table
+            skip_existing = watermark is not None and self.lookback is not None
+
+            rows_count = 0
+            new_watermark = watermark[0] if watermark is not None else None
+            for batch in self._batches(table.raw_rows):
+                for row in batch:
+                    value = row[watermark_index]
+                    if value is not None and (new_watermark is None or self._sort_key(watermark_type, value) > self._sort_key(watermark_type, new_watermark)):
+                        new_watermark = value
+                rows_count += self._insert(columns, batch, skip_existing)
+
+            # Read the rest of the response, so its errors are known before committing
+            response.set_skip_incomplete_tables(True)
+            for _ in response:
+                pass
+            if response.errors_count > 0:
+                raise KustoServiceError(response.get_exceptions())
+
+            # A partition without rows is recorded too, with a null watermark, to tell it was synced
+            self._connection.execute(
+                "INSERT OR REPLACE INTO {} VALUES (?, ?, ?, ?)".format(_WATERMARKS_TABLE),
+                (self.table_name, index, json.dumps(new_watermark), watermark_type),
+            )
+        return rows_count
+
+    @property
+    def watermarks(self) -> Dict[int, Any]:
+        """The watermark of each partition that has rows."""
+        rows = self._connection.execute("SELECT Partition, Watermark FROM {} WHERE TableName = ?".format(_WATERMARKS_TABLE), (self.table_name,))
+        watermarks = {partition: json.loads(watermark) for partition, watermark in rows}
+        return {partition: watermark for partition, watermark in watermarks.items() if watermark is not None}
+
+    @property
+    def replicated_until(self) -> Optional[Any]:
+        """
+        The lowest partition watermark: every row whose watermark column is up to this value was replicated, as of the last sync.
+        None if some partition wasn't synced yet, or no partition has rows.
+        """
+        rows = list(self._connection.execute("SELECT Watermark, WatermarkType FROM {} WHERE TableName = ?".format(_WATERMARKS_TABLE), (self.table_name,)))
+        if len(rows) < self.partitions:
+            return None
+        watermarks = [(json.loads(watermark), watermark_type) for watermark, watermark_type in rows]
+        watermarks = [w for w in watermarks if w[0] is not None]
+        return min(watermarks, key=lambda w: self._sort_key(w[1], w[0]))[0] if watermarks else None
+
+    def execute_sql(self, sql: str, parameters: Sequence[Any] = ()) -> List[tuple]:
+        """Runs a SQL query over the local database, and returns its rows."""
+        return self._connection.execute(sql, parameters).fetchall()
+
+    def _get_watermark(self, index: int) -> Optional[tuple]:
+        row = self._connection.execute(
+            "SELECT Watermark, WatermarkType FROM {} WHERE TableName = ? AND Partition = ?".format(_WATERMARKS_TABLE), (self.table_name, index)
+        ).fetchone()
+        if row is None or json.loads(row[0]) is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _partition_query(self, index: int, watermark: Optional[tuple], properties: ClientRequestProperties) -> str:
+        query = self.query
+        if self._add_ingestion_time:
+            query += "\n| extend {} = ingestion_time()".format(INGESTION_TIME_COLUMN)
+        if self.partitions > 1:
+            query += "\n| where hash({}, {}) == {}".format(self.partition_key, self.partitions, index)
+        if watermark is not None:
+            value, watermark_type = watermark
+            _validate_watermark_type(self.watermark_column, watermark_type, self.lookback)
+            properties.set_parameter(WATERMARK_PARAMETER, _watermark_literal(watermark_type, value, self.lookback))
+            query = "declare query_parameters({}:{});\n{}\n| where {} > {}".format(
+                WATERMARK_PARAMETER, watermark_type, query, self.watermark_column, WATERMARK_PARAMETER
+            )
+        return query
+
+    def _ensure_table(self, columns: List[KustoResultColumn]):
+        names = [c.column_name for c in columns]
+        if self.watermark_column not in names:
+            raise KustoClientError("The result of the query has no '{}' column".format(self.watermark_column))
+        _validate_watermark_type(self.watermark_column, columns[names.index(self.watermark_column)].column_type.lower(), self.lookback)
+        existing = [row[1] for row in self._connection.execute("PRAGMA table_info({})".format(_quote_identifier(self.table_name)))]
+        if not existing:
+            definitions = ", ".join("{} {}".format(_quote_identifier(c.column_name), _SQLITE_TYPES.get(c.column_type.lower(), "TEXT")) for c in columns)
+            self._connection.execute("CREATE TABLE {} ({})".format(_quote_identifier(self.table_name), definitions))
+        elif existing != names:
+            raise KustoClientError("The columns of the query's result don't match the local table '{}'".format(self.table_name))
+        if self.lookback is not None:
+            # Finds the rows of the lookback window that are already stored
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+                    _quote_identifier(self.table_name + "_watermark"), _quote_identifier(self.table_name), _quote_identifier(self.watermark_column)
+                )
+            )
+
+    def _insert(self, columns: List[KustoResultColumn], rows: List[list], skip_existing: bool = False) -> int:
+        """Inserts the rows, skipping the ones the table already has if `skip_existing` is set, and returns the amount of inserted rows."""
+        dynamic_indexes = [i for i, c in enumerate(columns) if c.column_type.lower() == "dynamic"]
+        if dynamic_indexes:
+            rows = [list(row) for row in rows]
+            for row in rows:
+                for i in dynamic_indexes:
+                    if row[i] is not None:
+                        row[i] = json.dumps(row[i])
+        table_name = _quote_identifier(self.table_name)
+        placeholders = ", ".join("?" * len(columns))
+        if not skip_existing:
+            return self._connection.executemany("INSERT INTO {} VALUES ({})".format(table_name, placeholders), rows).rowcount
+        # IS compares nulls as equal
+        existing = " AND ".join("{} IS ?".format(_quote_identifier(c.column_name)) for c in columns)
+        statement = "INSERT INTO {0} SELECT {1} WHERE NOT EXISTS (SELECT 1 FROM {0} WHERE {2})".format(table_name, placeholders, existing)
+        return self._connection.executemany(statement, [list(row) + list(row) for row in rows]).rowcount
+
+    @staticmethod
+    def _batches(rows: Iterable[list]) -> Iterable[List[list]]:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == _INSERT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _sort_key(watermark_type: str, value: Any) -> tuple:
+        # The raw value breaks ties between datetimes that differ only in the 7th fractional digit, which Python's datetime doesn't hold
+        return KustoResultRow.get_typed_value(watermark_type, value), value
@@ -0,0 +1,142 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+import requests
+import urllib3
+
+from .bulk import _execute_with_retries
+from .client_request_properties import ClientRequestProperties, _copy_properties
+from .exceptions import KustoCircuitOpenError, KustoClientError, KustoNetworkError, KustoThrottlingError
+from .retry import _is_transient_error
+
+if TYPE_CHECKING:
+    from .client import KustoClient
+
+# A script separates its commands with blank lines
+_BLANK_LINES = re.compile(r"(?:\n[ \t\r]*)+\n")
+_MULTILINE_STRING_DELIMITER = "```"
+
+COMMAND_COMPLETED = "Completed"
+
+
+@dataclass
+class CommandOutcome:
+    """
+    The outcome of a single command of a script, as reported by `.execute database script`.
+    `result` is "Completed", "Failed" or "Skipped", and `reason` holds the error of a command that didn't complete.
+    """
+
+    index: int
+    command: str
+    result: str
+    reason: str = ""
+    operation_id: Optional[str] = None
+    attempts: int = 1
+
+    @property
+    def succeeded(self) -> bool:
+        return self.result == COMMAND_COMPLETED
+
+
+def build_script_command(commands: List[str]) -> str:
+    """Returns an `.execute database script` command that runs the commands in order, continuing past the ones that fail."""
+    if not commands:
+        raise KustoClientError("The script has no commands")
+    return ".execute database script with (ContinueOnErrors = true) <|\n" + "\n\n".join(_collapse_blank_lines(c) for c in commands)
+
+
+def _collapse_blank_lines(command: str) -> str:
+    """Removes the blank lines of a command (e.g. between the paragraphs of a function's body), so the script doesn't split it."""
+    parts = command.strip().split(_MULTILINE_STRING_DELIMITER)
+    for i in range(0, len(parts), 2):
+        parts[i] = _BLANK_LINES.sub("\n", parts[i])
+    # The odd parts are multi-line string literals, whose blank lines can't be removed without changing them
+    if any(_BLANK_LINES.search(part) for part in parts[1::2]):
+        raise KustoClientError("A command of a script can't have a multi-line string with blank lines: {}".format(command))
+    return _MULTILINE_STRING_DELIMITER.join(parts)
+
+
+def execute_mgmt_script(
+    client: "KustoClient",
+    database: Optional[str],
+    commands: Iterable[str],
+    batch_size: int = 50,
+    retries: int = 2,
+    properties: Optional[ClientRequestProperties] = None,
+    max_delay_seconds: float = 30,
+    idempotent: bool = False,
+) -> List[CommandOutcome]:
+    """
+    Runs many management commands (e.g. `.create-or-alter function`, `.alter table policy`) as `.execute database script` requests of up to
+    `batch_size` commands each, instead of a request per command.
+    The outcome of every command is read from the script's result. The commands that failed are retried, in a new script, up to `retries` times,
+    so a command that depends on one later in the list gets another chance once it ran.
+    A script whose request fails may have run partly or completely, so by default it is only sent again when it provably never reached the
+    service (it was throttled, or the connection couldn't be established). Set `idempotent` to retry it on any transient failure, when running
+    the commands twice is harmless, e.g. `.create-or-alter` commands as opposed to `.append` or `.set-or-append`.
+    :param KustoClient client: The client to run the scripts with.
+    :param Optional[str] database: Database against the commands will be executed. If not provided, will default to the "Initial Catalog" of the client
+    :param commands: The commands, in the order they should run.
+    :param int batch_size: The maximum amount of commands in a single script.
+    :param int retries: The maximum amount of retries for each failed command, and for each request that fails with a transient error.
+    :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties, applied to every script.
+    :param float max_delay_seconds: The maximum delay before retrying the failed commands.
+    :param bool idempotent: Whether the commands can safely run more than once, so scripts are retried on any transient request failure.
+    :return: The outcome of each command, in the order of the commands. A command that failed on every attempt is returned with its last failure.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    commands = [command.strip() for command in commands]
+    outcomes: List[Optional[CommandOutcome]] = [None] * len(commands)
+
+    pending = list(range(len(commands)))
+    attempt = 0
+    while pending:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start : start + batch_size]
+            for outcome in _execute_script(client, database, [commands[i] for i in batch], batch, retries, properties, idempotent):
+                outcome.attempts = attempt + 1
+                outcomes[outcome.index] = outcome
+
+        pending = [i for i in pending if not outcomes[i].succeeded]
+        if attempt >= retries:
+            break
+        if pending:
+            time.sleep(random.uniform(0, min(max_delay_seconds, 2**attempt)))
+        attempt += 1
+    return outcomes
+
+
+def _never_reached_service(error: Exception) -> bool:
+    """Whether a request provably failed before the service ran it, so sending it again can't run its commands twice."""
+    if isinstance(error, (KustoThrottlingError, KustoCircuitOpenError)):
+        # Throttled requests are rejected before they run, and the requests of an open circuit aren't sent at all
+        return True
+    cause = error.__cause__
+    if isinstance(error, KustoNetworkError) and isinstance(cause, requests.exceptions.ConnectionError) and cause.args:
+        # The connection couldn't be established (including name resolution failures and connect timeouts)
+        return isinstance(getattr(cause.args[0], "reason", None), urllib3.exceptions.ConnectTimeoutError)
+    return False
+
+
+def _execute_script(
+    client: "KustoClient",
+    database: Optional[str],
+    commands: List[str],
+    indexes: List[int],
+    retries: int,
+    properties: Optional[ClientRequestProperties],
+    idempotent: bool = False,
+) -> List[CommandOutcome]:
+    script = build_script_command(commands)
+    is_retryable = _is_transient_error if idempotent else _never_reached_service
+    response = _execute_with_retries(lambda: client.execute_mgmt(database, script, _copy_properties(properties)), retries, is_retryable=is_retryable)
+    rows = list(response.primary_results[0])
+    if len(rows) != len(commands):
+        raise KustoClientError("The script returned {} results for {} commands".format(len(rows), len(commands)))
+    return [CommandOutcome(index, command, row["Result"], row["Reason"] or "", row["OperationId"]) for index, command, row in zip(indexes, commands, rows)]
@@ -0,0 +1,195 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Optional, Union
+
+from ._models import KustoResultTable, WellKnownDataSet
+from .bulk import _execute_with_retries
+from .client import KustoClient
+from .client_request_properties import ClientRequestProperties, _copy_properties
+from .exceptions import KustoClientError
+from .helpers import dataframe_from_result_table
+from .kcsb import KustoConnectionStringBuilder
+from .response import KustoResponseDataSet
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+SOURCE_COLUMN = "SourceCluster"
+
+
+@dataclass
+class ClusterResult:
+    """
+    The outcome of a query on a single cluster of a `MultiClusterExecutor`.
+    Exactly one of `response` and `error` is set.
+    """
+
+    cluster: str
+    response: Optional[KustoResponseDataSet] = None
+    error: Optional[Exception] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    def result(self) -> KustoResponseDataSet:
+        """Returns the response, or raises the error the query failed with."""
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+@dataclass
+class MultiClusterResult:
+    """The outcome of a query on every cluster of a `MultiClusterExecutor`, in the order of the clusters."""
+
+    results: List[ClusterResult] = field(default_factory=list)
+    source_column: str = SOURCE_COLUMN
+
+    @property
+    def succeeded(self) -> List[ClusterResult]:
+        return [r for r in self.results if r.succeeded]
+
+    @property
+    def errors(self) -> Dict[str, Exception]:
+        """The error of each cluster the query failed on."""
+        return {r.cluster: r.error for r in self.results if not r.succeeded}
+
+    def raise_for_errors(self):
+        """Raises the error of the first cluster the query failed on, if any."""
+        for r in self.results:
+            r.result()
+
+    def to_table(self) -> KustoResultTable:
+        """
+        Unions the primary results of the clusters the query succeeded on into a single table, with a leading column holding each row's cluster.
+        The primary results must have the same columns on every cluster.
+        """
+        succeeded = self.succeeded
+        if not succeeded:
+            raise KustoClientError("The query didn't succeed on any cluster")
+        tables = [(r.cluster, r.response.primary_results[0]) for r in succeeded]
+        names = [c.column_name for c in tables[0][1].columns]
+        for cluster, table in tables[1:]:
+            if [c.column_name for c in table.columns] != names:
+                raise KustoClientError("The result of cluster '{}' has different columns than the result of '{}'".format(cluster, tables[0][0]))
+
+        first = tables[0][1]
+        return KustoResultTable(
+            {
+                "TableName": first.table_name,
+                "TableId": 0,
+                "TableKind": WellKnownDataSet.PrimaryResult.value,
+                "Columns": [{"ColumnName": self.source_column, "ColumnType": "string"}] + first.raw_columns,
+                "Rows": [[cluster] + list(row) for cluster, table in tables for row in table.raw_rows],
+            }
+        )
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        return dataframe_from_result_table(self.to_table())
+
+    def to_arrow(self) -> "pa.Table":
+        """Returns the merged table as an Arrow table. Requires pyarrow."""
+        import pyarrow as pa
+
+        return pa.Table.from_pandas(self.to_dataframe(), preserve_index=False)
+
+
+class MultiClusterExecutor:
+    """
+    Runs the same query against several clusters concurrently, and merges their results.
+    The executor keeps a client per cluster, so every query reuses the clusters' connection pools and cached tokens. A query that fails or times out
+    on some of the clusters still returns the results of the others:
+        with MultiClusterExecutor({"westeurope": kcsb_we, "eastus": kcsb_eus}) as executor:
+            result = executor.execute("db", "Events | summarize count() by Level", timeout=timedelta(seconds=30))
+            df = result.to_dataframe()
+            failed = result.errors
+    """
+
+    def __init__(
+        self,
+        clusters: Union[Mapping[str, Union[KustoClient, KustoConnectionStringBuilder, str]], Iterable[Union[KustoConnectionStringBuilder, str]]],
+        max_concurrency: Optional[int] = None,
+        source_column: str = SOURCE_COLUMN,
+    ):
+        """
+        :param clusters: The clusters, by the name their rows are marked with in the merged result. A client, a connection string builder or a
+            connection string can be given for each cluster. Given a list of connection strings, the clusters are named by their URLs.
+        :param Optional[int] max_concurrency: The maximum amount of clusters queried at once. If not provided, all of the clusters are queried at once.
+        :param str source_column: The name of the column holding each row's cluster in the merged result.
+        """
+        if not isinstance(clusters, Mapping):
+            clusters = {self._cluster_name(kcsb): kcsb for kcsb in clusters}
+        if not clusters:
+            raise ValueError("At least one cluster is required")
+        self.source_column = source_column
+        self.max_concurrency = max_concurrency or len(clusters)
+        self._clients: Dict[str, KustoClient] = {}
+        # Only the clients created by the executor are closed by it
+        self._owned_clients: List[KustoClient] = []
+        for name, cluster in clusters.items():
+            if isinstance(cluster, KustoClient):
+                self._clients[name] = cluster
+            else:
+                client = KustoClient(cluster)
+                self._clients[name] = client
+                self._owned_clients.append(client)
+
+    @property
+    def clusters(self) -> List[str]:
+        return list(self._clients)
+
+    def client(self, cluster: str) -> KustoClient:
+        return self._clients[cluster]
+
+    def execute(
+        self,
+        database: Optional[str],
+        query: str,
+        properties: Optional[ClientRequestProperties] = None,
+        timeout: Optional[timedelta] = None,
+        retries: int = 0,
+    ) -> MultiClusterResult:
+        """
+        Executes a query on every cluster concurrently.
+        :param Optional[str] database: Database against query will be executed. If not provided, will default to the "Initial Catalog" of each client
+        :param str query: The query.
+        :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties, applied to the query on every cluster.
+        :param Optional[timedelta] timeout: The timeout of the query on each cluster, on the service and on the client.
+        :param int retries: The maximum amount of retries on each cluster, when the query fails with a transient error.
+        :return: The response or the error of each cluster.
+        """
+
+        def run(cluster: str) -> ClusterResult:
+            cluster_properties = _copy_properties(properties)
+            if timeout is not None:
+                cluster_properties.set_option(ClientRequestProperties.request_timeout_option_name, timeout)
+            try:
+                response = _execute_with_retries(lambda: self._clients[cluster].execute_query(database, query, cluster_properties), retries)
+            except Exception as e:
+                return ClusterResult(cluster, error=e)
+            return ClusterResult(cluster, response=response)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(self._clients))) as executor:
+            results = list(executor.map(run, self._clients))
+        return MultiClusterResult(results, self.source_column)
+
+    def close(self):
+        for client in self._owned_clients:
+            client.close()
+
+    def __enter__(self) -> "MultiClusterExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def _cluster_name(cluster: Union[KustoConnectionStringBuilder, str]) -> str:
+        if not isinstance(cluster, KustoConnectionStringBuilder):
+            cluster = KustoConnectionStringBuilder(cluster)
+        return cluster.data_source
@@ -0,0 +1,272 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from ._models import KustoResultRow
+from .exceptions import KustoClientError, KustoClosedError, KustoOperationError
+from .response import KustoResponseDataSet
+from .retry import _is_transient_error
+
+if TYPE_CHECKING:
+    from .aio.client import KustoClient as AioKustoClient
+    from .client import KustoClient
+
+OPERATION_COMPLETED = "Completed"
+# The states of an operation that didn't end yet. Every other state is final.
+_RUNNING_STATES = frozenset(("InProgress", "Scheduled", "Throttled"))
+
+
+class OperationHandle:
+    """
+    A handle of an operation the service runs asynchronously, e.g. of an `.export async`, `.set-or-append async` or `.purge` command,
+    returned by `execute_mgmt_async_operation`.
+    The operation's state is polled in the background by its client, together with the other operations in flight, and the handle completes once the
+    operation ends: with its final `.show operations` row if it Completed, or with a `KustoOperationError` otherwise.
+
+    Wait for it with `wait`, through a `concurrent.futures.Future` with `as_future`, or by awaiting it in asyncio code:
+        handle = client.execute_mgmt_async_operation("db", ".export async to csv (h@'...') <| Events")
+        status = handle.wait()
+    """
+
+    def __init__(self, database: Optional[str], operation_id: str):
+        self.database = database
+        self.operation_id = operation_id
+        self.state: Optional[str] = None
+        self.status: Optional[KustoResultRow] = None
+        self._future: "Future[KustoResultRow]" = Future()
+        # Managed by the poller
+        self._interval = 0.0
+        self._next_poll = 0.0
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def wait(self, timeout: Optional[float] = None) -> KustoResultRow:
+        """
+        Blocks until the operation ends, and returns its final `.show operations` row. Don't call it from an event loop, await the handle instead.
+        :param Optional[float] timeout: The maximum amount of seconds to wait, or None to wait until the operation ends.
+        :raises KustoOperationError: If the operation ended in a state other than Completed.
+        """
+        return self._future.result(timeout)
+
+    def as_future(self) -> "Future[KustoResultRow]":
+        return self._future
+
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
+
+    def __repr__(self):
+        return "OperationHandle({}, state={})".format(self.operation_id, self.state)
+
+
+class _OperationPollerBase:
+    """
+    Polls the state of all of the operations in flight of a client with batched `.show operations (id1, id2, ...)` commands.
+    Each operation is polled with a backoff, from `min_interval` up to `max_interval` between polls. When a poll is due, the operations due within
+    the next `min_interval` are polled along with it, so the operations in flight share their requests.
+    """
+
+    DEFAULT_MIN_INTERVAL = timedelta(seconds=1)
+    DEFAULT_MAX_INTERVAL = timedelta(seconds=30)
+    DEFAULT_MAX_BATCH_SIZE = 100
+
+    def __init__(
+        self,
+        min_interval: timedelta = DEFAULT_MIN_INTERVAL,
+        max_interval: timedelta = DEFAULT_MAX_INTERVAL,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ):
+        self.min_interval = min_interval.total_seconds()
+        self.max_interval = max_interval.total_seconds()
+        self.max_batch_size = max_batch_size
+        self._handles: Dict[str, OperationHandle] = {}
+        self._closed = False
+
+    def in_flight_count(self) -> int:
+        return len(self._handles)
+
+    def _add(self, handle: OperationHandle, now: float):
+        if self._closed:
+            raise KustoClosedError()
+        handle._interval = self.min_interval
+        handle._next_poll = now + self.min_interval
+        self._handles[handle.operation_id] = handle
+
+    def _next_wakeup(self) -> Optional[float]:
+        return min((handle._next_poll for handle in self._handles.values()), default=None)
+
+    def _take_due(self, now: float) -> List[Tuple[Optional[str], List[OperationHandle]]]:
+        """Returns the batches of operations to poll now, by database."""
+        by_database: Dict[Optional[str], List[OperationHandle]] = {}
+        for handle in self._handles.values():
+            if handle._next_poll <= now + self.min_interval:
+                by_database.setdefault(handle.database, []).append(handle)
+        return [
+            (database, handles[i : i + self.max_batch_size]) for database, handles in by_database.items() for i in range(0, len(handles), self.max_batch_size)
+        ]
+
+    @staticmethod
+    def _poll_command(handles: List[OperationHandle]) -> str:
+        return ".show operations ({})".format(", ".join(handle.operation_id for handle in handles))
+
+    def _apply(self, handles: List[OperationHandle], response: KustoResponseDataSet, now: float):
+        # An operation may have several records, its state is the latest one
+        latest: Dict[str, KustoResultRow] = {}
+        for row in response.primary_results[0]:
+            operation_id = str(row["OperationId"])
+            previous = latest.get(operation_id)
+            if previous is None or (
+                row["LastUpdatedOn"] is not None and (previous["LastUpdatedOn"] is None or row["LastUpdatedOn"] >= previous["LastUpdatedOn"])
+            ):
+                latest[operation_id] = row
+
+        for handle in handles:
+            if self._handles.get(handle.operation_id) is not handle:
+                # Closed while it was polled
+                continue
+            row = latest.get(handle.operation_id)
+            if row is not None:
+                handle.status = row
+                handle.state = row["State"]
+                if handle.state not in _RUNNING_STATES:
+                    del self._handles[handle.operation_id]
+                    if handle.state == OPERATION_COMPLETED:
+                        handle._future.set_result(row)
+                    else:
+                        handle._future.set_exception(KustoOperationError(handle.operation_id, handle.state, row["Status"]))
+                    continue
+            # Operations that aren't listed yet are polled again as well
+            self._reschedule(handle, now)
+
+    def _fail(self, handles: List[OperationHandle], error: Exception, now: float):
+        for handle in handles:
+            if self._handles.get(handle.operation_id) is not handle:
+                continue
+            if _is_transient_error(error):
+                self._reschedule(handle, now)
+            else:
+                self._handles.pop(handle.operation_id, None)
+                handle._future.set_exception(error)
+
+    def _reschedule(self, handle: OperationHandle, now: float):
+        handle._interval = min(handle._interval * 2, self.max_interval)
+        handle._next_poll = now + handle._interval
+
+    def _close_handles(self):
+        self._closed = True
+        handles, self._handles = list(self._handles.values()), {}
+        for handle in handles:
+            handle._future.set_exception(KustoClosedError())
+
+
+class _OperationPoller(_OperationPollerBase):
+    """Polls the operations of a sync client in a background thread, which runs only while there are operations in flight."""
+
+    def __init__(self, client: "KustoClient", **kwargs: Any):
+        super().__init__(**kwargs)
+        self._client = client
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, database: Optional[str], operation_id: str) -> OperationHandle:
+        handle = OperationHandle(database, operation_id)
+        with self._condition:
+            self._add(handle, time.monotonic())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="KustoOperationPoller", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return handle
+
+    def close(self):
+        with self._condition:
+            self._close_handles()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed or not self._handles:
+                        self._thread = None
+                        return
+                    delay = self._next_wakeup() - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                batches = self._take_due(time.monotonic())
+
+            for database, handles in batches:
+                try:
+                    response = self._client.execute_mgmt(database, self._poll_command(handles))
+                except Exception as e:
+                    with self._condition:
+                        self._fail(handles, e, time.monotonic())
+                    continue
+                with self._condition:
+                    self._apply(handles, response, time.monotonic())
+
+
+class _AsyncOperationPoller(_OperationPollerBase):
+    """Polls the operations of an aio client in a task, which runs only while there are operations in flight."""
+
+    def __init__(self, client: "AioKustoClient", **kwargs: Any):
+        super().__init__(**kwargs)
+        self._client = client
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def add(self, database: Optional[str], operation_id: str) -> OperationHandle:
+        handle = OperationHandle(database, operation_id)
+        loop = asyncio.get_running_loop()
+        self._add(handle, loop.time())
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+        self._wakeup.set()
+        return handle
+
+    async def close(self):
+        self._close_handles()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while not self._closed and self._handles:
+                delay = self._next_wakeup() - loop.time()
+                if delay > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                for database, handles in self._take_due(loop.time()):
+                    try:
+                        response = await self._client.execute_mgmt(database, self._poll_command(handles))
+                    except Exception as e:
+                        self._fail(handles, e, loop.time())
+                        continue
+                    self._apply(handles, response, loop.time())
+        finally:
+            self._task = None
+
+
+def _get_operation_id(response: KustoResponseDataSet) -> str:
+    table = response.primary_results[0]
+    if "OperationId" not in [c.column_name for c in table.columns] or len(table.raw_rows) == 0:
+        raise KustoClientError("The command didn't return an OperationId, it may not run asynchronously")
+    return str(table[0]["OperationId"])
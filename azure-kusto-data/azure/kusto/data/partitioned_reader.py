@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+from typing import TYPE_CHECKING, Any, List, Optional, Union
+
+from .client_request_properties import ClientRequestProperties
+from .helpers import dataframe_from_result_table
+from .kcsb import KustoConnectionStringBuilder
+from .registry import get_shared_client
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class HashPartitionedReader:
+    """
+    Reads the result of a query as N partitions, each fetched by its own query filtered with `hash(<partition key>, N) == <partition index>`,
+    so the partitions can be read in parallel by the workers of a distributed framework such as Dask or Ray.
+    The reader is picklable: it only holds the connection string builder and the query. Every worker process reuses the client of the connection
+    string's cluster and identity from the process-wide client registry, which closes it once it is idle.
+    The connection string builder must therefore be picklable too, e.g. application key, certificate or managed identity authentication.
+
+    The partition filter is appended to the query, so the query should be a table, or a filter/projection of one.
+    Aggregations must be done on the resulting frames, since each partition only holds a share of the rows.
+    """
+
+    def __init__(
+        self,
+        kcsb: Union[KustoConnectionStringBuilder, str],
+        database: Optional[str],
+        query: str,
+        partition_key: str,
+        partitions: int,
+        properties: Optional[ClientRequestProperties] = None,
+    ):
+        """
+        :param kcsb: The connection string of the cluster.
+        :param Optional[str] database: Database to query. If not provided, will default to the "Initial Catalog" value in the connection string
+        :param str query: The query whose result is read.
+        :param str partition_key: The column (or expression) the rows are hashed by. A high-cardinality column spreads the rows evenly.
+        :param int partitions: The amount of partitions.
+        :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties, applied to every partition query.
+        """
+        if partitions < 1:
+            raise ValueError("partitions must be at least 1")
+        self.kcsb = kcsb if isinstance(kcsb, KustoConnectionStringBuilder) else KustoConnectionStringBuilder(kcsb)
+        self.database = database
+        self.query = query.strip()
+        self.partition_key = partition_key
+        self.partitions = partitions
+        self.properties = properties
+
+    def partition_query(self, index: int) -> str:
+        """Returns the query that fetches the partition with the given index."""
+        if not 0 <= index < self.partitions:
+            raise IndexError("Partition index {} is out of range [0, {})".format(index, self.partitions))
+        return "{}\n| where hash({}, {}) == {}".format(self.query, self.partition_key, self.partitions, index)
+
+    def partition_queries(self) -> List[str]:
+        return [self.partition_query(i) for i in range(self.partitions)]
+
+    def read_partition(self, index: int) -> "pd.DataFrame":
+        """Executes the query of a single partition, and returns its primary result as a pandas DataFrame."""
+        with get_shared_client(self.kcsb) as client:
+            response = client.execute_query(self.database, self.partition_query(index), self.properties)
+        return dataframe_from_result_table(response.primary_results[0])
+
+    def to_dask(self, meta: Any = None):
+        """
+        Returns a lazy `dask.dataframe.DataFrame`, with a partition per query partition. The partitions are fetched by the Dask workers when computed.
+        :param meta: Optional empty DataFrame describing the columns and their types. If not given, Dask reads the first partition to infer it.
+        """
+        import dask
+        import dask.dataframe as dd
+
+        parts = [dask.delayed(self.read_partition)(i) for i in range(self.partitions)]
+        return dd.from_delayed(parts, meta=meta)
+
+    def to_ray(self):
+        """Returns a `ray.data.Dataset`, with a block per query partition. Each partition is fetched by a Ray task running on the cluster's workers."""
+        import ray
+
+        read_partition = ray.remote(_read_partition)
+        return ray.data.from_pandas_refs([read_partition.remote(self, i) for i in range(self.partitions)])
+
+
+def _read_partition(reader: HashPartitionedReader, index: int) -> "pd.DataFrame":
+    return reader.read_partition(index)
@@ -0,0 +1,164 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import functools
+import json
+import math
+import re
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional, Tuple
+
+from .bulk import _kql_datetime_literal
+from .client_request_properties import ClientRequestProperties, _copy_properties
+from .response import KustoResponseDataSet
+
+if TYPE_CHECKING:
+    from .aio.client import KustoClient as AioKustoClient
+    from .client import KustoClient
+
+_PARAMETER_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def kql_type_of(value: Any) -> str:
+    """Returns the Kusto type a Python value is sent as when it is bound to a query parameter."""
+    # bool before int, since bool is a subclass of int
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "long"
+    if isinstance(value, float):
+        return "real"
+    if isinstance(value, Decimal):
+        return "decimal"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (datetime, date)):
+        return "datetime"
+    if isinstance(value, timedelta):
+        return "timespan"
+    if isinstance(value, uuid.UUID):
+        return "guid"
+    if isinstance(value, (dict, list, tuple)):
+        return "dynamic"
+    raise TypeError("Can't infer the Kusto type of a {} value, set its type explicitly".format(type(value).__name__))
+
+
+def kql_parameter_value(value: Any, kql_type: str) -> str:
+    """Formats a value as the parameter value of a query parameter of the given type. String values are sent as is, the rest as literals."""
+    if value is None:
+        return "" if kql_type == "string" else "{}(null)".format(kql_type)
+    if kql_type == "string":
+        return str(value)
+    if kql_type == "bool":
+        return "true" if value else "false"
+    if kql_type == "real":
+        value = float(value)
+        if math.isnan(value):
+            return "real(nan)"
+        if math.isinf(value):
+            return "real(+inf)" if value > 0 else "real(-inf)"
+        return "real({!r})".format(value)
+    if kql_type == "datetime":
+        if not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+        return _kql_datetime_literal(value)
+    if kql_type == "timespan":
+        return "timespan({})".format(_format_timespan(value))
+    if kql_type == "dynamic":
+        return "dynamic({})".format(json.dumps(value))
+    return "{}({})".format(kql_type, value)
+
+
+def _format_timespan(value: timedelta) -> str:
+    sign = "-" if value < timedelta(0) else ""
+    value = abs(value)
+    hours, remainder = divmod(value.seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return "{}{}.{:02}:{:02}:{:02}.{:06}".format(sign, value.days, hours, minutes, seconds, value.microseconds)
+
+
+def normalize_template(template: str) -> str:
+    """Normalizes the layout of a query's text: line endings, trailing whitespace and semicolons, so equivalent templates have the same text."""
+    lines = [line.rstrip() for line in template.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).strip().rstrip(";").rstrip()
+
+
+class PreparedQuery:
+    """
+    A query template whose values are sent as query parameters, instead of being formatted into the query's text.
+    Every execution of the same query shape then has the same text, so it can reuse the service's query plans and hit its query results cache.
+    The `declare query_parameters(...)` statement is generated from the types of the bound values (see `kql_type_of`), and cached per set of types.
+    Use `prepare` to get the process-wide cached instance of a template:
+        query = prepare("Events | where Level == level and Timestamp > since | count")
+        query.execute(client, "db", {"level": "Error", "since": datetime(2024, 1, 1)})
+    """
+
+    def __init__(self, template: str, types: Optional[Mapping[str, str]] = None):
+        """
+        :param str template: The query, referring to the parameters by name.
+        :param types: The Kusto types of parameters, overriding the types inferred from their values. Required for parameters bound to None.
+        """
+        self.template = normalize_template(template)
+        self.types: Dict[str, str] = dict(types or {})
+        self._texts: Dict[Tuple[Tuple[str, str], ...], str] = {}
+
+    def query_text(self, parameters: Mapping[str, Any]) -> str:
+        """Returns the query's text for the parameters' names and types, with its `declare query_parameters` statement."""
+        return self._query_text(self._signature(parameters))
+
+    def bind(self, parameters: Mapping[str, Any], properties: Optional[ClientRequestProperties] = None) -> Tuple[str, ClientRequestProperties]:
+        """
+        Returns the query's text, and a copy of the properties with the parameters set.
+        :param parameters: The values of the parameters, by name.
+        :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties.
+        """
+        signature = self._signature(parameters)
+        bound_properties = _copy_properties(properties)
+        for name, kql_type in signature:
+            bound_properties.set_parameter(name, kql_parameter_value(parameters[name], kql_type))
+        return self._query_text(signature), bound_properties
+
+    def execute(
+        self, client: "KustoClient", database: Optional[str], parameters: Mapping[str, Any], properties: Optional[ClientRequestProperties] = None
+    ) -> KustoResponseDataSet:
+        """Executes the query with the parameters bound to the values."""
+        query, bound_properties = self.bind(parameters, properties)
+        return client.execute_query(database, query, bound_properties)
+
+    async def execute_async(
+        self, client: "AioKustoClient", database: Optional[str], parameters: Mapping[str, Any], properties: Optional[ClientRequestProperties] = None
+    ) -> KustoResponseDataSet:
+        """The aio equivalent of `execute`."""
+        query, bound_properties = self.bind(parameters, properties)
+        return await client.execute_query(database, query, bound_properties)
+
+    def _signature(self, parameters: Mapping[str, Any]) -> Tuple[Tuple[str, str], ...]:
+        signature = []
+        # Sorted, so the text doesn't depend on the order the parameters were given in
+        for name in sorted(parameters):
+            if not _PARAMETER_NAME.fullmatch(name):
+                raise ValueError("'{}' isn't a valid parameter name".format(name))
+            kql_type = self.types.get(name)
+            if kql_type is None:
+                if parameters[name] is None:
+                    raise TypeError("Parameter '{}' is None, set its type explicitly".format(name))
+                kql_type = kql_type_of(parameters[name])
+            signature.append((name, kql_type))
+        return tuple(signature)
+
+    def _query_text(self, signature: Tuple[Tuple[str, str], ...]) -> str:
+        text = self._texts.get(signature)
+        if text is None:
+            if signature:
+                declaration = "declare query_parameters({});\n".format(", ".join("{}:{}".format(name, kql_type) for name, kql_type in signature))
+            else:
+                declaration = ""
+            text = self._texts[signature] = declaration + self.template
+        return text
+
+
+@functools.lru_cache(maxsize=1024)
+def prepare(template: str) -> PreparedQuery:
+    """Returns the prepared query of a template, cached per process. Use `PreparedQuery` directly to set the types of parameters explicitly."""
+    return PreparedQuery(template)
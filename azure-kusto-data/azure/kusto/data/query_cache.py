@@ -0,0 +1,280 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import hashlib
+import json
+import socket
+import threading
+import time
+import uuid
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Callable, Hashable, Optional, Tuple
+
+from .client_details import default_user
+from .client_request_properties import ClientRequestProperties
+from .kcsb import KustoConnectionStringBuilder
+from .response import KustoResponseDataSet
+
+# Options that only affect how long the request may run, and not its results
+_IGNORED_OPTIONS = frozenset([ClientRequestProperties.request_timeout_option_name, ClientRequestProperties.no_request_timeout_option_name])
+
+# Tells the objects of this process apart from those of other processes sharing a cache, since object ids are only unique within a process
+_PROCESS_ID = uuid.uuid4().hex
+
+# The managed identity parameters that name a user-assigned identity
+_MSI_IDENTITY_PARAMETERS = ("client_id", "object_id", "msi_res_id")
+
+
+class QueryCacheStatistics:
+    """A snapshot of the counters of a `QueryResultCache`."""
+
+    def __init__(self, hits: int = 0, misses: int = 0, evictions: int = 0, expirations: int = 0, entries_count: int = 0, size_bytes: int = 0):
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self.expirations = expirations
+        self.entries_count = entries_count
+        self.size_bytes = size_bytes
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self) -> str:
+        return "QueryCacheStatistics(hits={}, misses={}, evictions={}, expirations={}, entries_count={}, size_bytes={})".format(
+            self.hits, self.misses, self.evictions, self.expirations, self.entries_count, self.size_bytes
+        )
+
+
+class _CacheEntry:
+    def __init__(self, result: KustoResponseDataSet, size: int, expires_at: float):
+        self.result = result
+        self.size = size
+        self.expires_at = expires_at
+
+
+class BaseQueryResultCache(metaclass=ABCMeta):
+    """The interface a query result cache implements to be used by a client's `set_query_cache`."""
+
+    # Whether `get` and `put` block on I/O. The aio client runs the lookups and stores of such caches in an executor, off the event loop.
+    blocking_io = False
+
+    @staticmethod
+    def make_key(
+        cluster: str, database: Optional[str], query: str, properties: Optional[ClientRequestProperties] = None, identity: str = ""
+    ) -> Tuple[str, str, str, str, str]:
+        """
+        Creates the key under which the result of a query is cached.
+        :param str identity: The authentication identity of the client that ran the query, see `cache_identity`.
+        """
+        return cluster, database or "", normalize_query(query), _properties_key(properties), identity
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[KustoResponseDataSet]:
+        """Returns the cached result for the key, or None if it is not cached or has expired."""
+
+    @abstractmethod
+    def put(self, key: Hashable, result: KustoResponseDataSet, ttl: Optional[timedelta] = None):
+        """Caches a result under the key."""
+
+    @abstractmethod
+    def invalidate(self, key: Hashable):
+        """Removes the result cached under the key, if any."""
+
+    @abstractmethod
+    def clear(self):
+        """Removes all of the cached results."""
+
+    @property
+    @abstractmethod
+    def statistics(self) -> QueryCacheStatistics:
+        pass
+
+
+class QueryResultCache(BaseQueryResultCache):
+    """
+    An in-memory cache of query results, with a time to live per entry and least-recently-used eviction bounded by the cached results' size.
+    Results are keyed by the cluster, the database, the query text (with insignificant whitespace removed), the request's options and parameters,
+    and the authentication identity of the client, so clients only share results when they authenticate as the same principal.
+    Cached results are shared between all callers that hit the same entry, and must not be modified.
+    The cache is thread-safe, and the same instance can be used by several clients, both sync and aio.
+
+    To use it, call `set_query_cache` on a client. Only `execute_query` calls are cached.
+    """
+
+    DEFAULT_TTL = timedelta(minutes=5)
+    DEFAULT_MAX_SIZE_BYTES = 256 * 1024 * 1024
+
+    def __init__(
+        self,
+        ttl: timedelta = DEFAULT_TTL,
+        max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+        time_provider: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param timedelta ttl: Default time to live of the cached results.
+        :param int max_size_bytes: Approximate upper bound on the total size of the cached results. Least recently used results are evicted first.
+        :param time_provider: Returns the current time in seconds. Used by tests.
+        """
+        if max_size_bytes <= 0:
+            raise ValueError("max_size_bytes must be positive")
+        self.ttl = ttl
+        self.max_size_bytes = max_size_bytes
+        self._time_provider = time_provider
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable) -> Optional[KustoResponseDataSet]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= self._time_provider():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.result
+
+    def put(self, key: Hashable, result: KustoResponseDataSet, ttl: Optional[timedelta] = None):
+        """
+        Caches a result under the key.
+        Results that carry query errors, and results larger than the whole cache, are not cached.
+        """
+        if result.errors_count > 0:
+            return
+        size = _estimate_size(result)
+        if size > self.max_size_bytes:
+            return
+        expires_at = self._time_provider() + (ttl if ttl is not None else self.ttl).total_seconds()
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(result, size, expires_at)
+            self._size_bytes += size
+            while self._size_bytes > self.max_size_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Removes all of the cached results. The statistics are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    @property
+    def statistics(self) -> QueryCacheStatistics:
+        with self._lock:
+            return QueryCacheStatistics(self._hits, self._misses, self._evictions, self._expirations, len(self._entries), self._size_bytes)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._size_bytes -= entry.size
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes the text of a query, so that queries that only differ by insignificant whitespace are equal.
+    Runs of whitespace outside of string literals and comments are collapsed to a single space, and leading and trailing whitespace is removed.
+    A comment runs until the end of its line, so it keeps the line break that ends it.
+    """
+    normalized = []
+    quote = None
+    verbatim = False
+    pending_space = ""
+    i = 0
+    while i < len(query):
+        char = query[i]
+        if quote is not None:
+            normalized.append(char)
+            if char == "\\" and not verbatim and i + 1 < len(query):
+                normalized.append(query[i + 1])
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char.isspace():
+            pending_space = pending_space or " "
+        elif query.startswith("```", i):
+            # Multi-line string literals keep all of their whitespace
+            end = query.find("```", i + 3)
+            end = len(query) if end < 0 else end + 3
+            if pending_space and normalized:
+                normalized.append(pending_space)
+            pending_space = ""
+            normalized.append(query[i:end])
+            i = end
+            continue
+        elif query.startswith("//", i):
+            end = query.find("\n", i)
+            end = len(query) if end < 0 else end
+            if pending_space and normalized:
+                normalized.append(pending_space)
+            normalized.append(query[i:end].rstrip())
+            pending_space = "\n"
+            i = end
+            continue
+        else:
+            if pending_space and normalized:
+                normalized.append(pending_space)
+            pending_space = ""
+            if char in "'\"":
+                quote = char
+                # Verbatim strings (@"...") don't support escaping with backslashes
+                verbatim = bool(normalized) and normalized[-1] == "@"
+            normalized.append(char)
+        i += 1
+    return "".join(normalized)
+
+
+def cache_identity(kcsb: KustoConnectionStringBuilder) -> str:
+    """
+    Returns the fingerprint of the authentication identity of a connection string builder's clients, which scopes their cached results.
+    Connection strings that name the same principal, e.g. the same application and tenant or the same user-assigned managed identity, share
+    their results across clients and processes. Credentials, token providers and callbacks are compared by the object, so their results are only
+    shared within a process. Logins whose principal isn't known upfront (interactive, device code, Azure CLI and system-assigned managed
+    identity logins) are also scoped to the machine and the OS user.
+    """
+    settings = []
+    for name, value in kcsb._identity_settings():
+        if isinstance(value, dict):
+            value = sorted((str(k), str(v)) for k, v in value.items())
+        elif value is not None and not isinstance(value, (str, bool, int, float)):
+            value = "{}:{}:{}".format(_PROCESS_ID, type(value).__name__, id(value))
+        settings.append((name, value))
+
+    msi_parameters = kcsb.msi_parameters or {}
+    user_assigned = any(msi_parameters.get(name) for name in _MSI_IDENTITY_PARAMETERS)
+    if kcsb.interactive_login or kcsb.device_login or kcsb.az_cli_login or (kcsb.msi_authentication and not user_assigned):
+        settings.append(("local_principal", [socket.gethostname(), default_user()]))
+    return hashlib.sha256(json.dumps(settings).encode("utf-8")).hexdigest()
+
+
+def _properties_key(properties: Optional[ClientRequestProperties]) -> str:
+    if properties is None:
+        return ""
+    options = {name: value for name, value in properties._options.items() if name not in _IGNORED_OPTIONS}
+    return json.dumps({"Options": options, "Parameters": properties._parameters}, sort_keys=True, default=str)
+
+
+def _estimate_size(result: KustoResponseDataSet) -> int:
+    # The size of the rows' json is a good enough estimate of the memory the result holds, and is much cheaper than walking the parsed objects
+    return sum(len(json.dumps(table.raw_rows, default=str)) + len(json.dumps(table.raw_columns, default=str)) for table in result.tables)
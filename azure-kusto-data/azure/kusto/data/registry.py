@@ -0,0 +1,268 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import functools
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+from .client import KustoClient
+from .exceptions import KustoClientError, KustoClosedError
+from .kcsb import KustoConnectionStringBuilder
+
+# The client methods whose first parameter is the database, which default to the handle's database rather than the shared client's
+_DATABASE_METHODS = frozenset(
+    [
+        "execute",
+        "execute_query",
+        "execute_mgmt",
+        "execute_mgmt_async_operation",
+        "execute_streaming_query",
+        "execute_streaming_ingest",
+        "cancel_query",
+    ]
+)
+
+
+def _identity_value(value: Any) -> Hashable:
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return repr(sorted(value.items(), key=repr))
+    # Credentials and callbacks are compared by identity. The registry holds them while their client is alive, so their ids aren't reused.
+    return "id", id(value)
+
+
+def client_key(kcsb: KustoConnectionStringBuilder) -> Hashable:
+    """
+    Returns the key clients are shared by: the cluster and the authentication identity of the connection string builder.
+    Builders that only differ by their default database have the same key.
+    """
+    return tuple((name, _identity_value(value)) for name, value in kcsb._identity_settings())
+
+
+class _Entry:
+    def __init__(self, key: Hashable, client: Any):
+        self.key = key
+        self.client = client
+        self.references = 0
+        self.idle_since: Optional[float] = None
+
+
+class _ClientRegistryBase:
+    DEFAULT_IDLE_TIMEOUT = timedelta(minutes=5)
+
+    def __init__(self, client_factory: Callable[[KustoConnectionStringBuilder], Any], idle_timeout: Optional[timedelta], time_provider: Callable[[], float]):
+        self._client_factory = client_factory
+        self.idle_timeout = idle_timeout.total_seconds() if idle_timeout is not None else None
+        self._time_provider = time_provider
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, _Entry] = {}
+
+    def __len__(self) -> int:
+        """The amount of clients the registry holds."""
+        return len(self._entries)
+
+    def _key(self, kcsb: KustoConnectionStringBuilder) -> Hashable:
+        return client_key(kcsb)
+
+    def _acquire_entry(self, kcsb: Union[KustoConnectionStringBuilder, str]) -> Tuple[_Entry, KustoConnectionStringBuilder, List[Any]]:
+        """Returns the entry of the connection string builder's client, with a new reference to it, and the idle clients to close."""
+        if not isinstance(kcsb, KustoConnectionStringBuilder):
+            kcsb = KustoConnectionStringBuilder(kcsb)
+        key = self._key(kcsb)
+        with self._lock:
+            evicted = self._evict_idle()
+            entry = self._entries.get(key)
+            if entry is None or entry.client._is_closed:
+                entry = self._entries[key] = _Entry(key, self._client_factory(kcsb))
+            entry.references += 1
+            entry.idle_since = None
+            return entry, kcsb, evicted
+
+    def _release_entry(self, entry: _Entry) -> List[Any]:
+        """Drops a reference to an entry's client. Returns the clients to close."""
+        with self._lock:
+            entry.references -= 1
+            if entry.references == 0:
+                entry.idle_since = self._time_provider()
+            evicted = self._evict_idle()
+        if entry.references == 0:
+            self._schedule_sweep()
+        return evicted
+
+    def _owns(self, key: Hashable) -> bool:
+        """Whether the caller may close the client of the key."""
+        return True
+
+    def _schedule_sweep(self):
+        """Makes sure idle clients are closed once they expire, even if the registry isn't used anymore."""
+
+    def _next_sweep_delay(self) -> Optional[float]:
+        """Returns the time until the next idle client the caller owns expires, if any. Called with the lock held."""
+        if self.idle_timeout is None:
+            return None
+        now = self._time_provider()
+        delays = [entry.idle_since + self.idle_timeout - now for key, entry in self._entries.items() if entry.references == 0 and self._owns(key)]
+        return max(0.0, min(delays)) if delays else None
+
+    def _evict_idle(self) -> List[Any]:
+        now = self._time_provider()
+        evicted = []
+        for key, entry in list(self._entries.items()):
+            if entry.references > 0 or not self._owns(key):
+                continue
+            if entry.client._is_closed or (self.idle_timeout is not None and now - entry.idle_since >= self.idle_timeout):
+                del self._entries[key]
+                evicted.append(entry.client)
+        return evicted
+
+    def _clear(self) -> List[Any]:
+        with self._lock:
+            clients = [entry.client for entry in self._entries.values()]
+            self._entries.clear()
+            return clients
+
+
+class _ClientHandleBase:
+    def __init__(self, registry: _ClientRegistryBase, entry: _Entry, default_database: Optional[str]):
+        self._registry = registry
+        self._entry = entry
+        self._is_closed = False
+        self.default_database = default_database
+
+    @property
+    def client(self) -> Any:
+        """The shared client."""
+        if self._is_closed:
+            raise KustoClosedError()
+        return self._entry.client
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self.client, name)
+        if name not in _DATABASE_METHODS:
+            return attribute
+
+        @functools.wraps(attribute)
+        def with_default_database(*args, **kwargs):
+            if args:
+                args = (args[0] or self.default_database,) + args[1:]
+            else:
+                kwargs["database"] = kwargs.get("database") or self.default_database
+            return attribute(*args, **kwargs)
+
+        return with_default_database
+
+    def set_proxy(self, proxy_url: str):
+        """Not supported, since the proxy would apply to every handle of the shared client. Set it in the registry's `client_factory` instead."""
+        raise KustoClientError("The proxy of a shared client can't be set through a handle, set it in the client factory of the registry instead")
+
+    def _release(self) -> List[Any]:
+        if self._is_closed:
+            return []
+        self._is_closed = True
+        return self._registry._release_entry(self._entry)
+
+
+class KustoClientHandle(_ClientHandleBase):
+    """
+    A reference to a client shared through a `KustoClientRegistry`. It is used like a `KustoClient`, and its requests default to the database of
+    the connection string it was acquired with. Closing it releases the reference, not the shared client.
+    Settings such as `set_retry_policy` apply to the shared client, and so to every handle of it. `set_proxy` raises, since a proxy that only some
+    of the handles expect would reroute the requests of the others; set it in the registry's `client_factory` instead.
+    """
+
+    def close(self):
+        for client in self._release():
+            client.close()
+
+    def __enter__(self) -> "KustoClientHandle":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class KustoClientRegistry(_ClientRegistryBase):
+    """
+    Shares clients between the parts of a process that connect to the same clusters. Each `(cluster, authentication identity)` gets a single
+    thread-safe client, with a single connection pool, token cache and cloud info lookup, no matter how many handles to it are acquired:
+        with registry.acquire(kcsb) as client:
+            client.execute("db", "Events | count")
+    Clients are reference counted. When the last handle of a client is closed, the client stays open for `idle_timeout`, so code that creates a
+    client per request keeps reusing warm connections and tokens, and is then closed, by a background timer if the registry isn't used meanwhile.
+    Use `get_shared_client` for the process-wide registry.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: Optional[timedelta] = _ClientRegistryBase.DEFAULT_IDLE_TIMEOUT,
+        client_factory: Callable[[KustoConnectionStringBuilder], KustoClient] = KustoClient,
+        time_provider: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param Optional[timedelta] idle_timeout: How long a client without handles stays open. If None, clients stay open until the registry is closed.
+        :param client_factory: Creates the client of a connection string builder.
+        :param time_provider: Returns the current time in seconds. Used by tests.
+        """
+        super().__init__(client_factory, idle_timeout, time_provider)
+        self._sweep_timer: Optional[threading.Timer] = None
+
+    def _schedule_sweep(self):
+        with self._lock:
+            if self._sweep_timer is not None:
+                return
+            delay = self._next_sweep_delay()
+            if delay is None:
+                return
+            self._sweep_timer = threading.Timer(delay, self._sweep)
+            self._sweep_timer.daemon = True
+            self._sweep_timer.start()
+
+    def _sweep(self):
+        with self._lock:
+            self._sweep_timer = None
+            evicted = self._evict_idle()
+        for client in evicted:
+            client.close()
+        self._schedule_sweep()
+
+    def acquire(self, kcsb: Union[KustoConnectionStringBuilder, str]) -> KustoClientHandle:
+        """Returns a handle to the shared client of the connection string's cluster and identity, creating the client if needed."""
+        entry, kcsb, evicted = self._acquire_entry(kcsb)
+        for client in evicted:
+            client.close()
+        return KustoClientHandle(self, entry, kcsb.initial_catalog)
+
+    def close(self):
+        """Closes all of the clients, including the ones with open handles."""
+        with self._lock:
+            if self._sweep_timer is not None:
+                self._sweep_timer.cancel()
+                self._sweep_timer = None
+        for client in self._clear():
+            client.close()
+
+    def __enter__(self) -> "KustoClientRegistry":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_default_registry: Optional[KustoClientRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_registry() -> KustoClientRegistry:
+    """Returns the process-wide registry."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = KustoClientRegistry()
+        return _default_registry
+
+
+def get_shared_client(kcsb: Union[KustoConnectionStringBuilder, str]) -> KustoClientHandle:
+    """Returns a handle to the process-wide shared client of the connection string's cluster and identity."""
+    return get_default_registry().acquire(kcsb)
@@ -1,7 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
 from abc import ABCMeta, abstractmethod
-from typing import List, Iterator, Union, Dict, Any
+from typing import List, Iterator, Union, Dict, Any, Optional
 
 from ._models import KustoResultTable, WellKnownDataSet, KustoStreamingResultTable, BaseKustoResultTable
 from .exceptions import KustoStreamingQueryError
@@ -83,11 +83,33 @@ class KustoResponseDataSet(BaseKustoResponseDataSet, metaclass=ABCMeta):
         It can contain more than one table when [`fork`](https://docs.microsoft.com/en-us/azure/kusto/query/forkoperator) is used.
     """
 
+    # Set while the data set is placed in shared memory by `azure.kusto.data.shared_result.SharedResult`
+    _shared_handle = None
+
     def __init__(self, json_response: List[Dict[str, Any]]):
         self.tables = [KustoResultTable(t) for t in json_response]
         self.tables_count = len(self.tables)
         self.tables_names = [t.table_name for t in self.tables]
 
+    @classmethod
+    def _from_json_tables(cls, json_tables: List[Dict[str, Any]], tables_names: Optional[List[str]] = None) -> "KustoResponseDataSet":
+        """Rebuilds a data set of this type from tables returned by `KustoResultTable._to_json_table`, without re-parsing the original response."""
+        return cls._from_tables([KustoResultTable(t) for t in json_tables], tables_names)
+
+    @classmethod
+    def _from_tables(cls, tables: List[KustoResultTable], tables_names: Optional[List[str]] = None) -> "KustoResponseDataSet":
+        """Creates a data set of this type from already built tables."""
+        data_set = cls.__new__(cls)
+        data_set.tables = tables
+        data_set.tables_count = len(tables)
+        data_set.tables_names = list(tables_names) if tables_names is not None else [t.table_name for t in tables]
+        return data_set
+
+    def __reduce__(self):
+        if self._shared_handle is not None:
+            return self._shared_handle.open, ()
+        return _restore_data_set, (type(self), [t._to_json_table() for t in self.tables], self.tables_names)
+
     @property
     def primary_results(self) -> List[KustoResultTable]:
         """Returns primary results. If there is more than one returns a list."""
@@ -101,6 +123,10 @@ class KustoResponseDataSet(BaseKustoResponseDataSet, metaclass=ABCMeta):
         return iter(self.tables)
 
 
+def _restore_data_set(data_set_type: type, json_tables: List[Dict[str, Any]], tables_names: List[str]) -> KustoResponseDataSet:
+    return data_set_type._from_json_tables(json_tables, tables_names)
+
+
 class KustoResponseDataSetV1(KustoResponseDataSet):
     """
     KustoResponseDataSetV1 is a wrapper for a V1 Kusto response.
@@ -151,6 +177,22 @@ class KustoResponseDataSetV2(KustoResponseDataSet):
         super(KustoResponseDataSetV2, self).__init__([t for t in json_response if t["FrameType"] == "DataTable"])
 
 
+def _result_to_json(result: Union[KustoResultTable, KustoResponseDataSet]) -> Dict[str, Any]:
+    """Converts a result table or data set to a json-serializable dict, from which `_result_from_json` rebuilds it."""
+    if isinstance(result, KustoResultTable):
+        return {"Table": result._to_json_table()}
+    return {"DataSetType": type(result).__name__, "Tables": [t._to_json_table() for t in result.tables], "TablesNames": result.tables_names}
+
+
+_DATA_SET_TYPES = {t.__name__: t for t in (KustoResponseDataSetV1, KustoResponseDataSetV2)}
+
+
+def _result_from_json(result_json: Dict[str, Any]) -> Union[KustoResultTable, KustoResponseDataSet]:
+    if "Table" in result_json:
+        return KustoResultTable(result_json["Table"])
+    return _DATA_SET_TYPES[result_json["DataSetType"]]._from_json_tables(result_json["Tables"], result_json["TablesNames"])
+
+
 class KustoStreamingResponseDataSet(BaseKustoResponseDataSet):
     _status_column = "Payload"
     _error_column = "Level"
@@ -198,6 +240,20 @@ class KustoStreamingResponseDataSet(BaseKustoResponseDataSet):
     def set_skip_incomplete_tables(self, value: bool):
         self._skip_incomplete_tables = value
 
+    def close(self):
+        """
+        Releases the connection of the response.
+        If the results weren't read to their end, the query is also cancelled on the service, so it stops computing results no one reads.
+        Use the data set as a context manager to close it when leaving the block, including on `break`, exceptions and `KeyboardInterrupt`.
+        """
+        self.streamed_data.close()
+
+    def __enter__(self) -> "KustoStreamingResponseDataSet":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     @property
     def errors_count(self) -> int:
         if not self.finished:
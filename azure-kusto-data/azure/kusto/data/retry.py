@@ -0,0 +1,127 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import random
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .exceptions import KustoApiError, KustoNetworkError, KustoThrottlingError
+
+T = TypeVar("T")
+
+# An attempt isn't started with less time than this left before the deadline
+_MIN_ATTEMPT_SECONDS = 1.0
+
+
+def _is_transient_error(error: Exception, is_idempotent: bool = True) -> bool:
+    """
+    Whether a request that failed with the error may succeed if it is sent again. Network errors are only transient for idempotent requests (e.g.
+    queries), since a request that reached the service may have been executed.
+    """
+    if isinstance(error, KustoThrottlingError):
+        return True
+    if isinstance(error, KustoApiError):
+        return error.get_api_error().permanent is False
+    if isinstance(error, KustoNetworkError):
+        return is_idempotent
+    return False
+
+
+class RetryPolicy:
+    """
+    Retries the requests of `execute_query` and `execute_mgmt` that failed with a transient error:
+    - Throttling (429) errors, after the delay the service asked for in their Retry-After header, if they have one.
+    - Service errors that aren't permanent, according to the `permanent` flag of their OneApi error.
+    - Network errors, for queries only, since a management command that reached the service may have been executed.
+    Without a Retry-After header, retries are delayed with exponential backoff and full jitter.
+    All of the attempts of a request share a single deadline - the request's timeout, unless `deadline` is set - so retrying never exceeds the
+    caller's timeout budget: each attempt's timeout (and the service's timeout of queries and commands) is cut to the time left, and a retry that can't
+    start before the deadline isn't made. Each retry is sent with a new client request id, derived from the caller's one if it was set.
+    Enable it with `set_retry_policy` on the sync or aio client. Streaming ingestion requests aren't retried, since their payload is consumed.
+    """
+
+    DEFAULT_MAX_RETRIES = 3
+    DEFAULT_BASE_DELAY = timedelta(seconds=1)
+    DEFAULT_MAX_DELAY = timedelta(seconds=30)
+
+    def __init__(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: timedelta = DEFAULT_BASE_DELAY,
+        max_delay: timedelta = DEFAULT_MAX_DELAY,
+        deadline: Optional[timedelta] = None,
+    ):
+        """
+        :param int max_retries: The maximum amount of retries of a request.
+        :param timedelta base_delay: The delay of the first retry's backoff, doubled on every retry.
+        :param timedelta max_delay: The maximum backoff delay. Retry-After delays aren't capped, only bound by the deadline.
+        :param Optional[timedelta] deadline: The time budget of all of a request's attempts. If not provided, the request's timeout is used.
+        """
+        if max_retries < 0:
+            raise ValueError("max_retries can't be negative")
+        self.max_retries = max_retries
+        self.base_delay = base_delay.total_seconds()
+        self.max_delay = max_delay.total_seconds()
+        self.deadline = deadline
+
+    def is_retryable(self, error: Exception, is_query: bool) -> bool:
+        """Whether a request that failed with the error may be retried."""
+        return _is_transient_error(error, is_idempotent=is_query)
+
+    def get_delay(self, retry: int, error: Exception) -> float:
+        """The delay before the given retry (counting from 0) of a request that failed with the error, in seconds."""
+        retry_after = error.get_retry_after() if isinstance(error, KustoThrottlingError) else None
+        if retry_after is not None:
+            # Jittered, so the clients throttled together don't all come back at once
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+
+class _RetryState:
+    def __init__(self, policy: RetryPolicy, timeout: timedelta, is_query: bool):
+        self.policy = policy
+        self.timeout = timeout
+        self.is_query = is_query
+        self.retries = 0
+        self.deadline = time.monotonic() + (policy.deadline or timeout).total_seconds()
+
+    def attempt_timeout(self) -> timedelta:
+        """The timeout of the next attempt: the request's timeout, cut to the time left before the deadline."""
+        return min(self.timeout, timedelta(seconds=max(_MIN_ATTEMPT_SECONDS, self.deadline - time.monotonic())))
+
+    def next_delay(self, error: Exception) -> Optional[float]:
+        """The delay before retrying the request that failed with the error, or None if it shouldn't be retried."""
+        if self.retries >= self.policy.max_retries or not self.policy.is_retryable(error, self.is_query):
+            return None
+        delay = self.policy.get_delay(self.retries, error)
+        if time.monotonic() + delay + _MIN_ATTEMPT_SECONDS > self.deadline:
+            return None
+        self.retries += 1
+        return delay
+
+
+def _execute_with_retry_policy(policy: RetryPolicy, timeout: timedelta, is_query: bool, send: Callable[[timedelta, int], T]) -> T:
+    """Sends a request with the timeout and the retry number (0 for the first attempt) of each attempt, retrying it according to the policy."""
+    state = _RetryState(policy, timeout, is_query)
+    while True:
+        try:
+            return send(state.attempt_timeout(), state.retries)
+        except Exception as e:
+            delay = state.next_delay(e)
+            if delay is None:
+                raise
+        time.sleep(delay)
+
+
+async def _execute_with_retry_policy_async(policy: RetryPolicy, timeout: timedelta, is_query: bool, send: Callable[[timedelta, int], Awaitable[T]]) -> T:
+    """The aio equivalent of `_execute_with_retry_policy`."""
+    state = _RetryState(policy, timeout, is_query)
+    while True:
+        try:
+            return await send(state.attempt_timeout(), state.retries)
+        except Exception as e:
+            delay = state.next_delay(e)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
@@ -0,0 +1,239 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import threading
+import time
+from datetime import timedelta
+from typing import IO, AnyStr, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .client import KustoClient
+from .client_request_properties import ClientRequestProperties
+from .data_format import DataFormat
+from .response import KustoResponseDataSet, KustoStreamingResponseDataSet
+from .retry import _is_transient_error
+
+
+class _ReplicaStats:
+    def __init__(self):
+        self.success_count = 0
+        self.total_count = 0
+        self.latency_sum = 0.0
+
+    def log_result(self, success: bool, latency: float):
+        self.total_count += 1
+        if success:
+            self.success_count += 1
+            self.latency_sum += latency
+
+    def reset(self):
+        self.success_count = 0
+        self.total_count = 0
+        self.latency_sum = 0.0
+
+
+class _RankedReplica:
+    """
+    A replica with a moving average of its success rate and of its latency, over the last `number_of_buckets` buckets of `bucket_duration` seconds.
+    Newer buckets weigh more, as in the ingest package's `_RankedStorageAccount`.
+    """
+
+    def __init__(self, name: str, client: KustoClient, number_of_buckets: int, bucket_duration: float, time_provider: Callable[[], float]):
+        self.name = name
+        self.client = client
+        self.number_of_buckets = number_of_buckets
+        self.bucket_duration = bucket_duration
+        self.time_provider = time_provider
+        self.buckets = [_ReplicaStats() for _ in range(number_of_buckets)]
+        self.last_update_time = self.time_provider()
+        self.current_bucket_index = 0
+
+    def log_result(self, success: bool, latency: float):
+        self.advance()
+        self.buckets[self.current_bucket_index].log_result(success, latency)
+
+    def advance(self):
+        """Moves to the current bucket, resetting the buckets that aged out, so a replica without new requests recovers its rank."""
+        self.current_bucket_index = self._adjust_for_time_passed()
+
+    def get_rank(self) -> float:
+        """The weighted success rate, 1 if there were no requests recently."""
+        rank = 0.0
+        total_weight = 0
+        for weight, bucket in self._weighted_buckets():
+            if bucket.total_count == 0:
+                continue
+            rank += bucket.success_count / bucket.total_count * weight
+            total_weight += weight
+        return rank / total_weight if total_weight else 1
+
+    def get_latency(self) -> Optional[float]:
+        """The weighted average latency of the recent successful requests, None if there were none."""
+        latency = 0.0
+        total_weight = 0
+        for weight, bucket in self._weighted_buckets():
+            if bucket.success_count == 0:
+                continue
+            latency += bucket.latency_sum / bucket.success_count * weight
+            total_weight += weight
+        return latency / total_weight if total_weight else None
+
+    def _weighted_buckets(self) -> Iterable[Tuple[int, _ReplicaStats]]:
+        # The oldest bucket has a weight of 1, the newest one a weight of number_of_buckets
+        for i in range(1, self.number_of_buckets + 1):
+            yield i, self.buckets[(self.current_bucket_index + i) % self.number_of_buckets]
+
+    def _adjust_for_time_passed(self) -> int:
+        current_time = self.time_provider()
+        time_delta = current_time - self.last_update_time
+        window_size = 0
+
+        if time_delta >= self.bucket_duration:
+            self.last_update_time = current_time
+            window_size = min(int(time_delta / self.bucket_duration), self.number_of_buckets)
+            for i in range(1, window_size + 1):
+                self.buckets[(self.current_bucket_index + i) % self.number_of_buckets].reset()
+
+        return (self.current_bucket_index + window_size) % self.number_of_buckets
+
+
+class RoutingKustoClient:
+    """
+    Routes queries across the replicas of the same databases: a leader cluster and follower clusters attached to its databases.
+    Read queries go to the healthiest, fastest replica. The replicas are ranked into tiers by their recent success rate (as the ingest client ranks
+    its storage accounts), and within a tier by their recent latency. A query that fails with a transient error is retried on the next replica.
+    Management commands and streaming ingestion always go to the leader, since the followers are read-only.
+        with RoutingKustoClient(KustoClient(leader_kcsb), [KustoClient(follower1_kcsb), KustoClient(follower2_kcsb)]) as client:
+            client.execute_query("db", "Events | count")
+    The client owns the given clients, and closes them when it is closed.
+    """
+
+    DEFAULT_NUMBER_OF_BUCKETS: int = 6
+    DEFAULT_BUCKET_DURATION_IN_SECONDS: int = 10
+    DEFAULT_TIERS: Tuple[int, int, int, int] = (90, 70, 30, 0)
+
+    def __init__(
+        self,
+        leader: KustoClient,
+        followers: Iterable[KustoClient],
+        read_from_leader: bool = True,
+        number_of_buckets: int = DEFAULT_NUMBER_OF_BUCKETS,
+        bucket_duration: float = DEFAULT_BUCKET_DURATION_IN_SECONDS,
+        tiers: Tuple[int, ...] = DEFAULT_TIERS,
+        time_provider: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param KustoClient leader: The client of the leader cluster.
+        :param followers: The clients of the follower clusters.
+        :param bool read_from_leader: Whether read queries may be routed to the leader as well.
+        :param int number_of_buckets: The amount of buckets the moving averages are calculated over.
+        :param float bucket_duration: The duration of each bucket, in seconds.
+        :param tiers: The lower bounds of the success rate tiers, in percent, in descending order.
+        :param time_provider: Returns the current time in seconds. Used by tests.
+        """
+        self.leader = leader
+        self.followers = list(followers)
+        self.tiers = tiers
+        self._time_provider = time_provider
+        self._lock = threading.Lock()
+        replica_clients = ([leader] if read_from_leader else []) + self.followers
+        if not replica_clients:
+            raise ValueError("At least one replica is required for read queries")
+        self._replicas: Dict[str, _RankedReplica] = {}
+        for client in replica_clients:
+            name = client._kusto_cluster
+            self._replicas[name] = _RankedReplica(name, client, number_of_buckets, bucket_duration, time_provider)
+
+    def close(self):
+        for client in [self.leader] + self.followers:
+            client.close()
+
+    def __enter__(self) -> "RoutingKustoClient":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_ranked_replicas(self) -> List[str]:
+        """Returns the clusters read queries are routed to, best first."""
+        return [replica.name for replica in self._ranked_replicas()]
+
+    def execute(self, database: Optional[str], query: str, properties: Optional[ClientRequestProperties] = None) -> KustoResponseDataSet:
+        """Executes a management command on the leader, or a query on the best replica."""
+        query = query.strip()
+        if query.startswith("."):
+            return self.execute_mgmt(database, query, properties)
+        return self.execute_query(database, query, properties)
+
+    def execute_query(self, database: Optional[str], query: str, properties: Optional[ClientRequestProperties] = None) -> KustoResponseDataSet:
+        """
+        Executes a query on the best replica, retrying it on the next ones while it fails with transient errors.
+        :return: Kusto response data set.
+        """
+        return self._route(lambda client: client.execute_query(database, query, properties))
+
+    def execute_streaming_query(
+        self,
+        database: Optional[str],
+        query: str,
+        timeout: timedelta = KustoClient._query_default_timeout,
+        properties: Optional[ClientRequestProperties] = None,
+    ) -> KustoStreamingResponseDataSet:
+        """
+        Executes a streaming query on the best replica, retrying it on the next ones while it fails to start with transient errors.
+        Failures while reading the results aren't retried.
+        """
+        return self._route(lambda client: client.execute_streaming_query(database, query, timeout, properties))
+
+    def execute_mgmt(self, database: Optional[str], query: str, properties: Optional[ClientRequestProperties] = None) -> KustoResponseDataSet:
+        """Executes a management command on the leader."""
+        return self.leader.execute_mgmt(database, query, properties)
+
+    def execute_streaming_ingest(
+        self,
+        database: Optional[str],
+        table: str,
+        stream: Optional[IO[AnyStr]],
+        blob_url: Optional[str],
+        stream_format: Union[DataFormat, str],
+        properties: Optional[ClientRequestProperties] = None,
+        mapping_name: Optional[str] = None,
+    ):
+        """Ingests into the leader."""
+        self.leader.execute_streaming_ingest(database, table, stream, blob_url, stream_format, properties, mapping_name)
+
+    def _route(self, func: Callable[[KustoClient], KustoResponseDataSet]):
+        last_error = None
+        for replica in self._ranked_replicas():
+            start = self._time_provider()
+            try:
+                response = func(replica.client)
+            except Exception as e:
+                if not _is_transient_error(e):
+                    # The error is the query's, not the replica's
+                    self._log_result(replica, True, self._time_provider() - start)
+                    raise
+                self._log_result(replica, False, 0)
+                last_error = e
+                continue
+            self._log_result(replica, True, self._time_provider() - start)
+            return response
+        raise last_error
+
+    def _log_result(self, replica: _RankedReplica, success: bool, latency: float):
+        with self._lock:
+            replica.log_result(success, latency)
+
+    def _ranked_replicas(self) -> List[_RankedReplica]:
+        with self._lock:
+            for replica in self._replicas.values():
+                replica.advance()
+            ranked = [(replica, replica.get_rank() * 100.0, replica.get_latency()) for replica in self._replicas.values()]
+
+        replicas_by_tier: List[List[Tuple[_RankedReplica, Optional[float]]]] = [[] for _ in self.tiers]
+        for replica, rank_percentage, latency in ranked:
+            for i, tier in enumerate(self.tiers):
+                if rank_percentage >= tier:
+                    replicas_by_tier[i].append((replica, latency))
+                    break
+
+        # Within a tier, the fastest replica first. Replicas without recent successes are tried first, to measure them.
+        return [replica for tier in replicas_by_tier for replica, _ in sorted(tier, key=lambda r: -1 if r[1] is None else r[1])]
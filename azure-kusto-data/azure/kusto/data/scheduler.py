@@ -0,0 +1,248 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, Iterator, List, Mapping, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+INTERACTIVE_LANE = "interactive"
+BATCH_LANE = "batch"
+
+_current_lane: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("kusto_request_lane", default=None)
+
+
+@contextlib.contextmanager
+def request_lane(lane: str) -> Iterator[None]:
+    """
+    Runs the requests made within the block in the given lane of the clients' request schedulers. Applies to the current thread or asyncio task,
+    and to the tasks it creates:
+        with request_lane(BATCH_LANE):
+            client.execute_query("db", "Events | summarize count() by bin(Timestamp, 1h)")
+    """
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def get_request_lane() -> Optional[str]:
+    """Returns the lane set by the innermost `request_lane` block, if any."""
+    return _current_lane.get()
+
+
+@dataclass
+class LaneStats:
+    """The metrics of a lane of a `RequestScheduler`. Queue times are in seconds."""
+
+    name: str
+    max_concurrency: Optional[int]
+    in_flight: int = 0
+    queued: int = 0
+    started: int = 0
+    total_queue_time: float = 0.0
+    max_queue_time: float = 0.0
+
+    @property
+    def average_queue_time(self) -> float:
+        return self.total_queue_time / self.started if self.started else 0.0
+
+
+class _Lane:
+    def __init__(self, name: str, max_concurrency: Optional[int]):
+        self.stats = LaneStats(name, max_concurrency)
+        # Wakes a queued request, handing it a slot, and the time it was queued at. The waker returns False if the request can't take the slot.
+        self.waiters: Deque[Tuple[Callable[[], bool], float]] = deque()
+
+
+class RequestScheduler:
+    """
+    Schedules the requests of clients that serve several workloads, so a background workload can't starve an interactive one.
+    Each request runs in a named lane, set with `request_lane` (requests outside of one run in `default_lane`). The lanes are given in priority
+    order, highest first, each with an optional concurrency cap, and all of them share `max_concurrency`.
+    When a slot frees up, it goes to the oldest queued request of the highest priority lane that is under its cap, so a higher priority request
+    never waits behind queued requests of lower priority lanes. Capping the lower priority lanes below `max_concurrency` keeps slots free for the
+    higher ones, so they don't wait for in-flight requests either.
+        scheduler = RequestScheduler({INTERACTIVE_LANE: None, BATCH_LANE: 40})
+        client.set_request_scheduler(scheduler)
+        with request_lane(BATCH_LANE):
+            refresh_reports(client)
+    Enable it with `set_request_scheduler` on the sync or aio client. A scheduler can be shared by several clients, sync and aio alike.
+    """
+
+    def __init__(
+        self,
+        lanes: Optional[Mapping[str, Optional[int]]] = None,
+        max_concurrency: Optional[int] = None,
+        default_lane: Optional[str] = None,
+        time_provider: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param lanes: The concurrency cap of each lane (None for no cap other than `max_concurrency`), by name, in priority order.
+            Defaults to an uncapped interactive lane, and a batch lane capped to half of `max_concurrency`.
+        :param Optional[int] max_concurrency: The maximum amount of requests in flight across all lanes. Defaults to the clients' connection pool size.
+        :param Optional[str] default_lane: The lane of requests made outside of a `request_lane` block. Defaults to the highest priority lane.
+        :param time_provider: Returns the current time in seconds. Used by tests.
+        """
+        if max_concurrency is None:
+            # Imported here, since the client base imports the scheduler
+            from .client_base import _KustoClientBase
+
+            max_concurrency = _KustoClientBase._max_pool_size
+        if lanes is None:
+            lanes = OrderedDict([(INTERACTIVE_LANE, None), (BATCH_LANE, max(1, max_concurrency // 2))])
+        if not lanes:
+            raise ValueError("At least one lane is required")
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive")
+        self.max_concurrency = max_concurrency
+        self._lanes: Dict[str, _Lane] = {name: _Lane(name, cap) for name, cap in lanes.items()}
+        self.default_lane = default_lane or next(iter(self._lanes))
+        if self.default_lane not in self._lanes:
+            raise ValueError("Unknown default lane '{}'".format(self.default_lane))
+        self._time_provider = time_provider
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def lanes(self) -> List[str]:
+        """The names of the lanes, in priority order."""
+        return list(self._lanes)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def get_stats(self) -> Dict[str, LaneStats]:
+        """Returns a snapshot of the metrics of each lane."""
+        with self._lock:
+            return {name: LaneStats(**vars(lane.stats)) for name, lane in self._lanes.items()}
+
+    def _get_lane(self) -> _Lane:
+        name = _current_lane.get() or self.default_lane
+        lane = self._lanes.get(name)
+        if lane is None:
+            raise ValueError("Unknown request lane '{}', the scheduler's lanes are: {}".format(name, ", ".join(self._lanes)))
+        return lane
+
+    def _has_slot(self, lane: _Lane) -> bool:
+        cap = lane.stats.max_concurrency
+        return self._in_flight < self.max_concurrency and (cap is None or lane.stats.in_flight < cap)
+
+    def _start(self, lane: _Lane, queue_time: float):
+        stats = lane.stats
+        self._in_flight += 1
+        stats.in_flight += 1
+        stats.started += 1
+        stats.total_queue_time += queue_time
+        stats.max_queue_time = max(stats.max_queue_time, queue_time)
+
+    def _take_slot(self, lane: _Lane, waker: Callable[[], bool]) -> bool:
+        """Takes a slot if the lane has one and no queued requests. Otherwise, queues the waker and returns False."""
+        with self._lock:
+            # Requests that can start are never left queued, so a lane with queued requests has no slot
+            if not lane.waiters and self._has_slot(lane):
+                self._start(lane, 0.0)
+                return True
+            lane.waiters.append((waker, self._time_provider()))
+            lane.stats.queued += 1
+            return False
+
+    def _release_slot(self, lane: _Lane):
+        with self._lock:
+            self._in_flight -= 1
+            lane.stats.in_flight -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        # Hands the free slots to the queued requests, highest priority lane first
+        now = self._time_provider()
+        for lane in self._lanes.values():
+            while lane.waiters and self._has_slot(lane):
+                waker, queued_at = lane.waiters.popleft()
+                lane.stats.queued -= 1
+                if waker():
+                    self._start(lane, now - queued_at)
+
+    def _remove_waiter(self, lane: _Lane, waker: Callable[[], bool]) -> bool:
+        with self._lock:
+            for i, (queued_waker, _) in enumerate(lane.waiters):
+                if queued_waker is waker:
+                    del lane.waiters[i]
+                    lane.stats.queued -= 1
+                    return True
+            return False
+
+    def _acquire(self) -> _Lane:
+        lane = self._get_lane()
+        event = threading.Event()
+
+        def waker() -> bool:
+            event.set()
+            return True
+
+        if self._take_slot(lane, waker):
+            return lane
+        try:
+            event.wait()
+        except BaseException:
+            # Interrupted, e.g. by a KeyboardInterrupt. If the slot was handed over meanwhile it is released, otherwise the request is dequeued.
+            if not self._remove_waiter(lane, waker):
+                self._release_slot(lane)
+            raise
+        return lane
+
+    async def _acquire_async(self) -> _Lane:
+        lane = self._get_lane()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def hand_over():
+            # Runs on the waiter's loop. A waiter that was cancelled meanwhile passes the slot on.
+            if future.done():
+                self._release_slot(lane)
+            else:
+                future.set_result(None)
+
+        def waker() -> bool:
+            try:
+                loop.call_soon_threadsafe(hand_over)
+            except RuntimeError:
+                # The waiter's loop was closed
+                return False
+            return True
+
+        if self._take_slot(lane, waker):
+            return lane
+        try:
+            await future
+        except asyncio.CancelledError:
+            # If the slot was handed over before the cancellation, it is released here, otherwise by hand_over
+            if not self._remove_waiter(lane, waker) and future.done() and not future.cancelled():
+                self._release_slot(lane)
+            raise
+        return lane
+
+
+def _execute_scheduled(scheduler: RequestScheduler, send: Callable[[], T]) -> T:
+    """Sends a request once the scheduler gives its lane a slot."""
+    lane = scheduler._acquire()
+    try:
+        return send()
+    finally:
+        scheduler._release_slot(lane)
+
+
+async def _execute_scheduled_async(scheduler: RequestScheduler, send: Callable[[], Awaitable[T]]) -> T:
+    """The aio equivalent of `_execute_scheduled`."""
+    lane = await scheduler._acquire_async()
+    try:
+        return await send()
+    finally:
+        scheduler._release_slot(lane)
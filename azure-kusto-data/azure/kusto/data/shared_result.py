@@ -0,0 +1,292 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import array
+import json
+import struct
+import sys
+from collections.abc import Sequence
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from ._models import BaseKustoResultTable, KustoResultTable, _restore_table
+from .response import _DATA_SET_TYPES, KustoResponseDataSet, _result_to_json
+
+SharedResultType = Union[KustoResultTable, KustoResponseDataSet]
+
+# The segment starts with the length of a json header describing the result, followed by the buffers of the columns
+_HEADER_LENGTH = struct.Struct("<Q")
+_ALIGNMENT = 8
+
+# The memoryview formats of the fixed-width encodings. Other columns are stored as the offsets of their encoded values in a blob.
+_FIXED_WIDTH_FORMATS = {"int64": "q", "float64": "d", "bool": "?"}
+_INT64_RANGE = range(-(2**63), 2**63)
+
+
+class SharedColumn(Sequence):
+    """
+    A read-only column of a table opened from shared memory, backed by the segment without copying.
+    `values` is a memoryview of the column's data. For the `int64`, `float64` and `bool` encodings it holds the values themselves (0 in place of nulls),
+    e.g. for `numpy.frombuffer`. For the `utf8` and `json` encodings it holds the encoded values back to back, and `offsets` holds where each of them
+    starts, followed by the end of the last one. `validity` holds 1 for each row whose value isn't null.
+    Indexing the column returns the raw value of a row, as found in the table's `raw_rows`.
+    The views are only valid while the table they were read from is alive.
+    """
+
+    def __init__(self, name: str, column_type: str, encoding: str, values: memoryview, validity: memoryview, offsets: Optional[memoryview] = None):
+        self.name = name
+        self.column_type = column_type
+        self.encoding = encoding
+        self.values = values
+        self.validity = validity
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.validity)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("column index out of range")
+        if not self.validity[index]:
+            return None
+        if self.offsets is None:
+            return self.values[index]
+        value = self.values[self.offsets[index] : self.offsets[index + 1]]
+        return str(value, "utf-8") if self.encoding == "utf8" else json.loads(bytes(value))
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self) -> str:
+        return "SharedColumn({!r}, {!r}, {!r})".format(self.name, self.column_type, self.encoding)
+
+
+class _SharedRows(Sequence):
+    """The raw rows of a shared table, read from its columns on access."""
+
+    def __init__(self, columns: List[SharedColumn], count: int):
+        self._columns = columns
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]) -> list:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("row index out of range")
+        return [column[index] for column in self._columns]
+
+    def __iter__(self) -> Iterator[list]:
+        for index in range(self._count):
+            yield [column[index] for column in self._columns]
+
+
+class SharedResultTable(KustoResultTable):
+    """
+    A result table opened from shared memory by `SharedResultHandle.open`. It is used like any `KustoResultTable`, but its rows are read from the
+    segment when they are accessed rather than copied into the process, and `column` exposes the columns themselves.
+    """
+
+    def __init__(self, json_table: Dict[str, Any], columns: List[SharedColumn], rows_count: int, segment: shared_memory.SharedMemory):
+        BaseKustoResultTable.__init__(self, dict(json_table, Rows=_SharedRows(columns, rows_count)))
+        self._shared_columns = columns
+        # Declared last, so the columns' views are released before the segment is closed
+        self._segment = segment
+
+    def column(self, key: Union[int, str]) -> SharedColumn:
+        """Returns a column by its index or name."""
+        if isinstance(key, int):
+            return self._shared_columns[key]
+        for column in self._shared_columns:
+            if column.name == key:
+                return column
+        raise LookupError(key)
+
+    def _to_json_table(self) -> Dict[str, Any]:
+        json_table = super()._to_json_table()
+        json_table["Rows"] = list(self.raw_rows)
+        return json_table
+
+    def __reduce__(self):
+        # The segment may be gone by the time the table is unpickled, so its rows are pickled, as a plain table
+        return _restore_table, (KustoResultTable, self._to_json_table())
+
+
+class SharedResultHandle:
+    """
+    A small, picklable reference to a Kusto result placed in shared memory by `SharedResult`.
+    Pickling a handle (or a shared result, which pickles as its handle) costs the same regardless of the amount of rows.
+    """
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+
+    def open(self) -> SharedResultType:
+        """
+        Maps the shared memory segment read-only and returns the result, with `SharedResultTable` tables that read their rows from the segment.
+        The segment must still be owned by a live `SharedResult` in the process that created it. The result stays valid once the owner closes it.
+        Pickling the opened result pickles its rows, since it can't rely on the owner keeping the segment alive.
+        """
+        segment = _attach(self.name)
+        buffer = segment.buf[: self.size].toreadonly()
+        (header_length,) = _HEADER_LENGTH.unpack_from(buffer)
+        header = json.loads(bytes(buffer[_HEADER_LENGTH.size : _HEADER_LENGTH.size + header_length]))
+        data = buffer[_align(_HEADER_LENGTH.size + header_length) :]
+
+        if "Table" in header:
+            result = _open_table(header["Table"], data, segment)
+        else:
+            tables = [_open_table(t, data, segment) for t in header["Tables"]]
+            result = _DATA_SET_TYPES[header["DataSetType"]]._from_tables(tables, header["TablesNames"])
+        return result
+
+    def __repr__(self) -> str:
+        return "SharedResultHandle({!r}, {})".format(self.name, self.size)
+
+
+class SharedResult:
+    """
+    Places a `KustoResultTable` or a `KustoResponseDataSet` in a shared memory segment, so it can be handed to other processes
+    (e.g. multiprocessing pools) without pickling every row.
+    The result is stored column by column: numbers and booleans as fixed-width arrays, other values as blobs of encoded values. Other processes
+    map the columns without copying them, see `SharedResultTable` and `SharedColumn`.
+    While the `SharedResult` is open, pickling the result only pickles a `SharedResultHandle`, and unpickling it maps the segment in the receiving process.
+    The creating process owns the segment and must close the `SharedResult` (or use it as a context manager) once the other processes are done with it.
+
+    Example:
+        with SharedResult(response) as shared:
+            pool.map(process_response, [response] * 8)
+    """
+
+    def __init__(self, result: SharedResultType):
+        if not isinstance(result, (KustoResultTable, KustoResponseDataSet)):
+            raise TypeError("Expected KustoResultTable or KustoResponseDataSet got {}".format(type(result).__name__))
+
+        buffers: List[bytes] = []
+        header = _result_to_json(result)
+        for json_table in [header["Table"]] if "Table" in header else header["Tables"]:
+            rows = json_table.pop("Rows")
+            json_table["RowsCount"] = len(rows)
+            json_table["Encodings"] = [_encode_column([row[i] for row in rows], buffers) for i in range(len(json_table["Columns"]))]
+
+        header_bytes = json.dumps(header).encode("utf-8")
+        data_start = _align(_HEADER_LENGTH.size + len(header_bytes))
+        size = data_start + sum(_align(len(b)) for b in buffers)
+        self._segment = shared_memory.SharedMemory(create=True, size=size)
+        segment_buffer = self._segment.buf
+        _HEADER_LENGTH.pack_into(segment_buffer, 0, len(header_bytes))
+        segment_buffer[_HEADER_LENGTH.size : _HEADER_LENGTH.size + len(header_bytes)] = header_bytes
+        position = data_start
+        for buffer in buffers:
+            segment_buffer[position : position + len(buffer)] = buffer
+            position += _align(len(buffer))
+
+        self.result = result
+        self.handle = SharedResultHandle(self._segment.name, size)
+        self._is_closed = False
+        result._shared_handle = self.handle
+
+    def close(self):
+        """Releases the shared memory segment. Results that were already opened in other processes remain valid."""
+        if not self._is_closed:
+            self._is_closed = True
+            self.result._shared_handle = None
+            self._segment.close()
+            self._segment.unlink()
+
+    def __enter__(self) -> "SharedResult":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _align(size: int) -> int:
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _column_encoding(values: List[Any]) -> str:
+    # Chosen by the values rather than the column type, so every value reads back exactly as it was parsed
+    present = [value for value in values if value is not None]
+    if present and all(type(value) is bool for value in present):
+        return "bool"
+    if present and all(type(value) is int and value in _INT64_RANGE for value in present):
+        return "int64"
+    if present and all(type(value) is float for value in present):
+        return "float64"
+    if all(type(value) is str for value in present):
+        return "utf8"
+    return "json"
+
+
+def _encode_column(values: List[Any], buffers: List[bytes]) -> Dict[str, Any]:
+    """
+    Appends the buffers of a column to `buffers`, and returns its encoding with the positions of its buffers, as `[start, length]`.
+    The buffers are laid out back to back in the order they are appended, each aligned, starting at the beginning of the data.
+    """
+    encoding = _column_encoding(values)
+
+    def add(buffer: Any) -> List[int]:
+        buffer = bytes(buffer)
+        start = sum(_align(len(b)) for b in buffers)
+        buffers.append(buffer)
+        return [start, len(buffer)]
+
+    encoded: Dict[str, Any] = {"Encoding": encoding, "Validity": add(bytes(value is not None for value in values))}
+    if encoding == "bool":
+        encoded["Values"] = add(bytes(value is True for value in values))
+    elif encoding in _FIXED_WIDTH_FORMATS:
+        encoded["Values"] = add(array.array(_FIXED_WIDTH_FORMATS[encoding], (0 if value is None else value for value in values)))
+    else:
+        blobs = [b"" if value is None else value.encode("utf-8") if encoding == "utf8" else json.dumps(value).encode("utf-8") for value in values]
+        offsets = array.array("q", [0])
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        encoded["Offsets"] = add(offsets)
+        encoded["Values"] = add(b"".join(blobs))
+    return encoded
+
+
+def _open_table(json_table: Dict[str, Any], data: memoryview, segment: shared_memory.SharedMemory) -> SharedResultTable:
+    rows_count = json_table.pop("RowsCount")
+    encodings = json_table.pop("Encodings")
+    columns = []
+    for column, encoding in zip(json_table["Columns"], encodings):
+        name = column["ColumnName"]
+        column_type = column.get("ColumnType") or column.get("DataType")
+
+        def view(buffer: str, view_format: str = "B") -> memoryview:
+            start, length = encoding[buffer]
+            return data[start : start + length].cast(view_format)
+
+        kind = encoding["Encoding"]
+        if kind in _FIXED_WIDTH_FORMATS:
+            columns.append(SharedColumn(name, column_type, kind, view("Values", _FIXED_WIDTH_FORMATS[kind]), view("Validity")))
+        else:
+            columns.append(SharedColumn(name, column_type, kind, view("Values"), view("Validity"), view("Offsets", "q")))
+    return SharedResultTable(json_table, columns, rows_count, segment)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        # Attaching processes must not unlink the segment when they exit, only its owner may
+        return _AttachedSegment(name=name, track=False)
+    return _AttachedSegment(name=name)
+
+
+class _AttachedSegment(shared_memory.SharedMemory):
+    def __del__(self):
+        # Columns that outlive their table keep the segment mapped, so it can't be closed yet. It is unmapped along with the last of them.
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
@@ -0,0 +1,115 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import os
+import posixpath
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple, Union
+from urllib.parse import unquote, urlparse
+
+from .bulk import _execute_with_retries
+from .client_request_properties import ClientRequestProperties
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow.dataset as pa_dataset
+    from .client import KustoClient
+
+
+@dataclass
+class ExportedFiles:
+    """The parquet files of an export, downloaded to a local directory by `export_to_directory`."""
+
+    operation_id: str
+    directory: str
+    files: List[str] = field(default_factory=list)
+    records: int = 0
+
+    def to_arrow_dataset(self) -> "pa_dataset.Dataset":
+        """Returns a lazily loaded Arrow dataset over the files. Requires pyarrow."""
+        import pyarrow.dataset as pa_dataset
+
+        return pa_dataset.dataset(self.files, format="parquet")
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        """Reads all of the files into a single pandas DataFrame. Requires pandas and pyarrow."""
+        import pandas as pd
+
+        frames = [pd.read_parquet(path) for path in self.files]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def build_export_command(query: str, storage_uri: str, name_prefix: str) -> str:
+    """Returns an `.export async` command that writes the query's result as compressed parquet files under the storage connection string."""
+    return '.export async compressed to parquet (h@"{}") with (namePrefix = @"{}") <| {}'.format(
+        storage_uri.replace('"', '""'), name_prefix.replace('"', '""'), query.strip()
+    )
+
+
+def export_to_directory(
+    client: "KustoClient",
+    database: Optional[str],
+    query: str,
+    storage_uri: str,
+    directory: Union[str, os.PathLike],
+    credential: Any = None,
+    name_prefix: Optional[str] = None,
+    max_concurrency: int = 8,
+    timeout: Optional[timedelta] = None,
+    retries: int = 3,
+    properties: Optional[ClientRequestProperties] = None,
+) -> ExportedFiles:
+    """
+    Pulls a large query result by letting the cluster export it to blob storage, instead of reading it through a single connection.
+    The query is exported with `.export async to parquet`, which the cluster's nodes write in parallel. Once the operation completes, the blobs it
+    wrote are downloaded concurrently with the storage SDK.
+    Requires azure-storage-blob (installed with azure-kusto-ingest).
+        exported = export_to_directory(client, "db", "Events | where Timestamp > ago(30d)", "https://account.blob.core.windows.net/exports;impersonate",
+                                       "events", credential=DefaultAzureCredential())
+        dataset = exported.to_arrow_dataset()
+    :param KustoClient client: The client to run the export with.
+    :param Optional[str] database: Database against query will be executed. If not provided, will default to the "Initial Catalog" of the client
+    :param str query: The query to export.
+    :param str storage_uri: The storage connection string of the container to export to, as the `.export` command takes it: the container's URL,
+        followed by a SAS token (`?sv=...`), `;impersonate` or `;<account key>`.
+    :param directory: The local directory the files are downloaded to. It is created if it doesn't exist.
+    :param credential: The credential to download the blobs with, when storage_uri has no SAS token, e.g. an azure-identity credential.
+    :param Optional[str] name_prefix: The prefix of the exported blobs' names. If not provided, a unique prefix is generated.
+    :param int max_concurrency: The maximum amount of blobs downloaded concurrently.
+    :param Optional[timedelta] timeout: How long to wait for the export operation, or None to wait until it ends.
+    :param int retries: The maximum amount of retries for reading the export's details, when it fails with a transient error.
+    :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties for the export command.
+    :return: The downloaded files.
+    """
+    from azure.storage.blob import BlobClient
+
+    name_prefix = name_prefix or "export_" + uuid.uuid4().hex
+    handle = client.execute_mgmt_async_operation(database, build_export_command(query, storage_uri, name_prefix), properties)
+    handle.wait(timeout.total_seconds() if timeout is not None else None)
+
+    details = _execute_with_retries(lambda: client.execute_mgmt(database, ".show operation {} details".format(handle.operation_id)), retries)
+    blobs: List[Tuple[str, int]] = [(row["Path"], row["NumRecords"] or 0) for row in details.primary_results[0]]
+
+    os.makedirs(directory, exist_ok=True)
+    directory = os.fspath(directory)
+    sas = _get_sas(storage_uri)
+
+    def download(path: str) -> str:
+        local_path = os.path.join(directory, posixpath.basename(unquote(urlparse(path).path)))
+        # The storage SDK retries transient download errors on its own
+        blob = BlobClient.from_blob_url(path + sas if sas else path, credential=None if sas else credential)
+        with open(local_path, "wb") as file:
+            blob.download_blob().readinto(file)
+        return local_path
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        files = list(executor.map(download, [path for path, _ in blobs]))
+    return ExportedFiles(handle.operation_id, directory, files, sum(records for _, records in blobs))
+
+
+def _get_sas(storage_uri: str) -> Optional[str]:
+    """Returns the SAS token of a storage connection string (including its `?`), if it has one."""
+    url = storage_uri.split(";", 1)[0]
+    return url[url.index("?") :] if "?" in url else None
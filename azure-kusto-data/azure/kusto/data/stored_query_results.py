@@ -0,0 +1,174 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import re
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from typing import TYPE_CHECKING, Deque, Iterator, Optional
+
+from ._models import KustoResultRow, KustoResultTable
+from .bulk import _execute_with_retries
+from .client_request_properties import ClientRequestProperties, _copy_properties
+from .helpers import dataframe_from_result_table
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .client import KustoClient
+
+ROW_NUMBER_COLUMN = "Num"
+
+# The names are put in commands and queries as they are, so they are restricted to plain identifiers
+_NAME_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]{0,1023}")
+
+
+def _validate_name(name: str):
+    if not _NAME_PATTERN.fullmatch(name):
+        raise ValueError("The name of a stored query result must be an identifier of letters, digits and underscores, got {!r}".format(name))
+
+
+class PagedQueryResult:
+    """
+    Reads a large query result page by page, through a stored query result.
+    The query is run once by `create`, which stores its result on the service under a name, numbered by a `Num` column.
+    The pages are then read with `stored_query_result("<name>") | where Num between (...)` queries, a few of them prefetched concurrently.
+
+    `next_page` is the index of the first page that wasn't handed to the caller yet. If the read is interrupted, resume it by creating a new
+    `PagedQueryResult` with the same name and `next_page`, instead of running the query again:
+        pages = PagedQueryResult.create(client, "db", "Events | where Timestamp > ago(30d)")
+        for table in pages.iter_pages():
+            process(table)
+        ...
+        pages = PagedQueryResult(client, "db", saved_name, next_page=saved_next_page)
+
+    Stored query results expire (after `expires_after`), or can be dropped explicitly with `drop`.
+    """
+
+    DEFAULT_PAGE_SIZE = 100_000
+    DEFAULT_EXPIRES_AFTER = timedelta(days=1)
+
+    def __init__(
+        self,
+        client: "KustoClient",
+        database: Optional[str],
+        name: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        prefetch: int = 2,
+        next_page: int = 0,
+        retries: int = 3,
+        properties: Optional[ClientRequestProperties] = None,
+    ):
+        """
+        :param KustoClient client: The client to read the pages with.
+        :param Optional[str] database: The database the stored query result was created in.
+        :param str name: The name of an existing stored query result, created by `create`. It must be an identifier (letters, digits and underscores).
+        :param int page_size: The amount of rows in each page.
+        :param int prefetch: The amount of pages fetched concurrently, ahead of the page being read.
+        :param int next_page: The index of the page to start reading from.
+        :param int retries: The maximum amount of retries for each page, when it fails with a transient error.
+        :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties, applied to every page query.
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        if prefetch < 1:
+            raise ValueError("prefetch must be at least 1")
+        self.client = client
+        self.database = database
+        _validate_name(name)
+        self.name = name
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.next_page = next_page
+        self.retries = retries
+        self.properties = properties
+        self._row_count: Optional[int] = None
+
+    @classmethod
+    def create(
+        cls,
+        client: "KustoClient",
+        database: Optional[str],
+        query: str,
+        name: Optional[str] = None,
+        expires_after: timedelta = DEFAULT_EXPIRES_AFTER,
+        properties: Optional[ClientRequestProperties] = None,
+        **kwargs,
+    ) -> "PagedQueryResult":
+        """
+        Runs the query once, storing its result on the service, and returns a paged reader over it.
+        :param KustoClient client: The client to run the query and read the pages with.
+        :param Optional[str] database: Database against query will be executed. If not provided, will default to the "Initial Catalog" of the client
+        :param str query: The query. Its result is numbered in the order it is returned in, so it should be sorted if the order matters.
+        :param Optional[str] name: The name of the stored query result, an identifier (letters, digits and underscores). If not provided, a unique name
+            is generated.
+        :param timedelta expires_after: How long the service keeps the stored query result.
+        :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties, for the command and for every page query.
+        :param kwargs: Passed to the constructor (page_size, prefetch, retries).
+        """
+        name = name or "paged_" + uuid.uuid4().hex
+        _validate_name(name)
+        command = ".set stored_query_result {} with (previewCount = 0, expiresAfter = {}s) <| {}\n| serialize {} = row_number()".format(
+            name, int(expires_after.total_seconds()), query.strip(), ROW_NUMBER_COLUMN
+        )
+        client.execute_mgmt(database, command, properties)
+        return cls(client, database, name, properties=properties, **kwargs)
+
+    @property
+    def row_count(self) -> int:
+        """The total amount of rows in the stored query result."""
+        if self._row_count is None:
+            query = 'stored_query_result("{}") | count'.format(self.name)
+            response = _execute_with_retries(lambda: self.client.execute_query(self.database, query, _copy_properties(self.properties)), self.retries)
+            self._row_count = response.primary_results[0].raw_rows[0][0]
+        return self._row_count
+
+    @property
+    def page_count(self) -> int:
+        return (self.row_count + self.page_size - 1) // self.page_size
+
+    def page_query(self, index: int) -> str:
+        first = index * self.page_size + 1
+        return 'stored_query_result("{}")\n| where {} between ({} .. {})\n| order by {} asc\n| project-away {}'.format(
+            self.name, ROW_NUMBER_COLUMN, first, first + self.page_size - 1, ROW_NUMBER_COLUMN, ROW_NUMBER_COLUMN
+        )
+
+    def read_page(self, index: int) -> KustoResultTable:
+        """Reads a single page, retrying it on transient errors."""
+        query = self.page_query(index)
+        response = _execute_with_retries(lambda: self.client.execute_query(self.database, query, _copy_properties(self.properties)), self.retries)
+        return response.primary_results[0]
+
+    def iter_pages(self) -> Iterator[KustoResultTable]:
+        """
+        Yields the pages from `next_page` to the last one, in order, while prefetching the following pages concurrently.
+        `next_page` is advanced as each page is yielded.
+        """
+        page_count = self.page_count
+        executor = ThreadPoolExecutor(max_workers=self.prefetch)
+        pending: Deque[Future] = deque()
+        try:
+            scheduled = self.next_page
+            while self.next_page < page_count:
+                while scheduled < page_count and len(pending) < self.prefetch:
+                    pending.append(executor.submit(self.read_page, scheduled))
+                    scheduled += 1
+                page = pending.popleft().result()
+                self.next_page += 1
+                yield page
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def __iter__(self) -> Iterator[KustoResultRow]:
+        for page in self.iter_pages():
+            yield from page
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        """Reads the remaining pages into a single pandas DataFrame."""
+        import pandas as pd
+
+        frames = [dataframe_from_result_table(page) for page in self.iter_pages()]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def drop(self):
+        """Drops the stored query result from the service."""
+        self.client.execute_mgmt(self.database, ".drop stored_query_result {}".format(self.name), _copy_properties(self.properties))
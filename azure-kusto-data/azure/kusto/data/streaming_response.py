@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, Any, Tuple, Dict, AnyStr, IO, List, Iterator
+from typing import Optional, Any, Tuple, Dict, AnyStr, IO, List, Iterator, Callable
 
 import ijson
 from ijson import IncompleteJSONError
@@ -134,17 +134,45 @@ class JsonTokenReader:
 
 
 class StreamingDataSetEnumerator:
-    def __init__(self, reader: JsonTokenReader):
+    def __init__(self, reader: JsonTokenReader, on_close: Optional[Callable[[bool], None]] = None):
+        """
+        :param JsonTokenReader reader: The reader of the response's content.
+        :param on_close: Called once when the enumerator is closed, with whether the data set was abandoned before its completion frame was read.
+            When it is closed by a KeyboardInterrupt, `interrupted` is set first, so that on_close doesn't block the interrupted caller.
+        """
         self.reader = reader
         self.done = False
+        self.interrupted = False
         self.started = False
         self.started_primary_results = False
         self.finished_primary_results = False
+        self.completed = False
+        self.closed = False
+        self._on_close = on_close
 
     def __iter__(self) -> "StreamingDataSetEnumerator":
         return self
 
+    def close(self):
+        """Releases the response. If the data set wasn't read to its completion, the query is abandoned, and on_close cancels it on the service."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._on_close is not None:
+            self._on_close(not self.completed)
+
     def __next__(self) -> Dict[str, Any]:
+        try:
+            return self._read_next_frame()
+        except KeyboardInterrupt:
+            self._close_interrupted()
+            raise
+
+    def _close_interrupted(self):
+        self.interrupted = True
+        self.close()
+
+    def _read_next_frame(self) -> Dict[str, Any]:
         if self.done:
             raise StopIteration()
 
@@ -164,6 +192,8 @@ class StreamingDataSetEnumerator:
             self.started_primary_results = True
         elif self.started_primary_results:
             self.finished_primary_results = True
+        if parsed_frame["FrameType"] == FrameType.DataSetCompletion:
+            self.completed = True
 
         return parsed_frame
 
@@ -196,16 +226,20 @@ class StreamingDataSetEnumerator:
             return res
 
     def row_iterator(self) -> Iterator[list]:
-        self.reader.read_token_of_type(JsonTokenType.START_ARRAY)
-        while True:
-            token = self.reader.read_token_of_type(JsonTokenType.START_ARRAY, JsonTokenType.END_ARRAY, JsonTokenType.START_MAP)
-            if token.token_type == JsonTokenType.START_MAP:
-                # Todo - this method of error handling may be problematic, since after raising an error the iteration stops.
-                #  This means that if there are more data or even more errors, we can't read them
-                raise KustoMultiApiError([self.parse_object(skip_start=True)])
-            if token.token_type == JsonTokenType.END_ARRAY:
-                return
-            yield self.parse_array(skip_start=True)
+        try:
+            self.reader.read_token_of_type(JsonTokenType.START_ARRAY)
+            while True:
+                token = self.reader.read_token_of_type(JsonTokenType.START_ARRAY, JsonTokenType.END_ARRAY, JsonTokenType.START_MAP)
+                if token.token_type == JsonTokenType.START_MAP:
+                    # Todo - this method of error handling may be problematic, since after raising an error the iteration stops.
+                    #  This means that if there are more data or even more errors, we can't read them
+                    raise KustoMultiApiError([self.parse_object(skip_start=True)])
+                if token.token_type == JsonTokenType.END_ARRAY:
+                    return
+                yield self.parse_array(skip_start=True)
+        except KeyboardInterrupt:
+            self._close_interrupted()
+            raise
 
     def parse_array(self, skip_start: bool) -> list:
         if not skip_start:
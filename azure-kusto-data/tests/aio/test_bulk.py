@@ -0,0 +1,52 @@
+import asyncio
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data.aio.client import KustoClient
+from azure.kusto.data.bulk import QueryRequest
+from azure.kusto.data.exceptions import KustoNetworkError
+from azure.kusto.data.response import KustoResponseDataSetV2
+from ..kusto_client_common import KustoClientTestsMixin
+
+
+def _load_response() -> KustoResponseDataSetV2:
+    with open(os.path.join(os.path.dirname(__file__), "..", "input", "deft.json"), "r") as f:
+        return KustoResponseDataSetV2(json.loads(f.read()))
+
+
+class TestExecuteMany(KustoClientTestsMixin):
+    @pytest.mark.asyncio
+    async def test_bounded_concurrency_and_errors(self):
+        response = _load_response()
+        in_flight = [0]
+        max_in_flight = [0]
+
+        async def execute(self, database, query, properties=None):
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            if query == "raiseNetwork":
+                raise KustoNetworkError("endpoint")
+            return response
+
+        requests = [QueryRequest("Deft")] * 5 + [QueryRequest("raiseNetwork")] + [QueryRequest("Deft")] * 4
+        with patch.object(KustoClient, "execute", execute):
+            async with KustoClient(self.HOST) as client:
+                results = [r async for r in client.execute_many(requests, max_concurrency=3, ordered=True)]
+
+        assert [r.index for r in results] == list(range(10))
+        assert [r.succeeded for r in results].count(False) == 1
+        assert isinstance(results[5].error, KustoNetworkError)
+        assert results[0].response is response
+        assert max_in_flight[0] <= 3
+
+    @pytest.mark.asyncio
+    async def test_invalid_concurrency_fails_at_the_call(self):
+        async with KustoClient(self.HOST) as client:
+            assert [r async for r in client.execute_many([])] == []
+            with pytest.raises(ValueError):
+                client.execute_many(["Deft"], max_concurrency=0)
@@ -0,0 +1,32 @@
+import json
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from azure.kusto.data.aio.client import KustoClient
+from azure.kusto.data.query_cache import QueryResultCache
+from azure.kusto.data.response import KustoResponseDataSetV2
+from ..kusto_client_common import KustoClientTestsMixin
+
+
+def _load_response() -> KustoResponseDataSetV2:
+    with open(os.path.join(os.path.dirname(__file__), "..", "input", "deft.json"), "r") as f:
+        return KustoResponseDataSetV2(json.loads(f.read()))
+
+
+class TestKustoClientQueryCache(KustoClientTestsMixin):
+    @pytest.mark.asyncio
+    async def test_repeated_query_is_served_from_cache(self):
+        cache = QueryResultCache()
+        response = _load_response()
+        with patch.object(KustoClient, "_execute", new_callable=AsyncMock, return_value=response) as mock_execute:
+            async with KustoClient(self.HOST) as client:
+                client.set_query_cache(cache)
+                first = await client.execute_query("PythonTest", "Deft")
+                second = await client.execute_query("PythonTest", "Deft")
+
+        assert first is second is response
+        assert mock_execute.await_count == 1
+        assert cache.statistics.hits == 1
+        assert cache.statistics.misses == 1
@@ -11,7 +11,7 @@ from dateutil.tz import UTC
 from requests import HTTPError
 
 from azure.kusto.data._models import KustoResultRow, KustoResultTable, KustoStreamingResultTable
-from azure.kusto.data.response import WellKnownDataSet, KustoStreamingResponseDataSet, KustoResponseDataSet
+from azure.kusto.data.response import WellKnownDataSet, KustoStreamingResponseDataSet, KustoResponseDataSet, KustoResponseDataSetV2
 
 from pandas import DataFrame, Series, to_datetime
 from pandas.testing import assert_frame_equal
@@ -128,6 +128,37 @@ def mocked_requests_post(*args, **kwargs):
     return MockResponse(None, 404, url)
 
 
+def make_v2_response(columns: Dict[str, str], rows: list, table_name: str = "PrimaryResult") -> KustoResponseDataSetV2:
+    """Creates a V2 response with a single primary result. columns maps the column names to their types."""
+    return KustoResponseDataSetV2(
+        [
+            {"FrameType": "DataSetHeader", "IsProgressive": False, "Version": "v2.0"},
+            {
+                "FrameType": "DataTable",
+                "TableId": 0,
+                "TableName": table_name,
+                "TableKind": "PrimaryResult",
+                "Columns": [{"ColumnName": name, "ColumnType": column_type} for name, column_type in columns.items()],
+                "Rows": rows,
+            },
+            {"FrameType": "DataSetCompletion", "HasErrors": False, "Cancelled": False},
+        ]
+    )
+
+
+class FakeClock:
+    """A time provider that only moves when a test advances it, with `now` or `sleep`."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
 DIGIT_WORDS = [str("Zero"), str("One"), str("Two"), str("Three"), str("Four"), str("Five"), str("Six"), str("Seven"), str("Eight"), str("Nine"), str("ten")]
 
 SyncResponseSet = Union[KustoStreamingResponseDataSet, KustoResponseDataSet]
@@ -0,0 +1,232 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import threading
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from azure.kusto.data import KustoClient
+from azure.kusto.data.admission import AdmissionController, _execute_admitted, _execute_admitted_async
+from azure.kusto.data.aio.client import KustoClient as AsyncKustoClient
+from azure.kusto.data.exceptions import KustoCircuitOpenError, KustoNetworkError, KustoServiceError, KustoThrottlingError
+from tests.kusto_client_common import FakeClock, KustoClientTestsMixin, make_v2_response
+
+
+def fail(error: Exception):
+    def send():
+        raise error
+
+    return send
+
+
+def test_token_bucket_limits_the_rate():
+    clock = FakeClock()
+    controller = AdmissionController(requests_per_second=10, burst=2, time_provider=clock)
+    with patch("time.sleep", clock.sleep):
+        for _ in range(2):
+            _execute_admitted(controller, lambda: None)
+        # The burst is used up
+        assert clock.now == 1000
+        for _ in range(5):
+            _execute_admitted(controller, lambda: None)
+    assert clock.now == pytest.approx(1000.5)
+
+
+def test_arguments_are_validated():
+    for arguments in [{"requests_per_second": 0}, {"burst": 0}, {"max_in_flight": 0}, {"failure_threshold": 0}]:
+        with pytest.raises(ValueError):
+            AdmissionController(**arguments)
+
+
+def test_interrupted_wait_refunds_the_token():
+    clock = FakeClock()
+    controller = AdmissionController(requests_per_second=1, burst=1, time_provider=clock)
+    _execute_admitted(controller, lambda: None)
+    with patch("time.sleep", side_effect=KeyboardInterrupt), pytest.raises(KeyboardInterrupt):
+        _execute_admitted(controller, lambda: None)
+
+    # Only the request that was sent used a token
+    clock.now += 1
+    with patch("time.sleep") as sleep:
+        _execute_admitted(controller, lambda: None)
+    sleep.assert_not_called()
+
+
+@pytest.mark.parametrize("handed_over", [False, True])
+def test_interrupted_wait_frees_the_slot(handed_over: bool):
+    controller = AdmissionController(max_in_flight=1)
+    controller._acquire()
+
+    def interrupt(event, timeout=None):
+        if handed_over:
+            controller._release_slot()
+        raise KeyboardInterrupt()
+
+    with patch.object(threading.Event, "wait", interrupt), pytest.raises(KeyboardInterrupt):
+        controller._acquire()
+
+    if not handed_over:
+        controller._release_slot()
+    assert controller.in_flight == 0
+    assert _execute_admitted(controller, lambda: "free") == "free"
+
+
+def test_in_flight_limit_queues_requests():
+    controller = AdmissionController(max_in_flight=2)
+    release = threading.Event()
+    started = []
+    lock = threading.Lock()
+    max_seen = [0]
+
+    def send():
+        with lock:
+            started.append(1)
+            max_seen[0] = max(max_seen[0], controller.in_flight)
+        release.wait(5)
+
+    threads = [threading.Thread(target=_execute_admitted, args=(controller, send)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for _ in range(100):
+        if len(started) == 2:
+            break
+        threading.Event().wait(0.01)
+    assert len(started) == 2
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(started) == 5
+    assert max_seen[0] == 2
+    assert controller.in_flight == 0
+
+
+def test_circuit_breaker_opens_and_probes():
+    clock = FakeClock()
+    controller = AdmissionController(failure_threshold=3, failure_window=timedelta(seconds=10), cool_down=timedelta(seconds=30), time_provider=clock)
+
+    # Errors of the queries themselves don't count
+    with pytest.raises(KustoServiceError):
+        _execute_admitted(controller, fail(KustoServiceError("Syntax error")))
+    for _ in range(3):
+        with pytest.raises(KustoThrottlingError):
+            _execute_admitted(controller, fail(KustoThrottlingError("throttled")))
+
+    assert controller.is_open
+    with pytest.raises(KustoCircuitOpenError) as e:
+        _execute_admitted(controller, lambda: None)
+    assert e.value.retry_after == 30
+
+    # A failed probe opens the breaker again
+    clock.now += 30
+    with pytest.raises(KustoNetworkError):
+        _execute_admitted(controller, fail(KustoNetworkError("endpoint")))
+    with pytest.raises(KustoCircuitOpenError):
+        _execute_admitted(controller, lambda: None)
+
+    clock.now += 30
+    assert _execute_admitted(controller, lambda: "probe") == "probe"
+    assert not controller.is_open
+    assert _execute_admitted(controller, lambda: "closed") == "closed"
+
+
+def test_circuit_breaker_honours_retry_after_and_the_window():
+    clock = FakeClock()
+    controller = AdmissionController(failure_threshold=2, failure_window=timedelta(seconds=10), cool_down=timedelta(seconds=5), time_provider=clock)
+    response = MagicMock()
+    response.headers = {"Retry-After": "60"}
+
+    with pytest.raises(KustoThrottlingError):
+        _execute_admitted(controller, fail(KustoThrottlingError("throttled", response)))
+    # Out of the window of the first error
+    clock.now += 11
+    with pytest.raises(KustoThrottlingError):
+        _execute_admitted(controller, fail(KustoThrottlingError("throttled", response)))
+    assert not controller.is_open
+
+    with pytest.raises(KustoThrottlingError):
+        _execute_admitted(controller, fail(KustoThrottlingError("throttled", response)))
+    with pytest.raises(KustoCircuitOpenError) as e:
+        _execute_admitted(controller, lambda: None)
+    assert e.value.retry_after == 60
+
+
+@pytest.mark.asyncio
+async def test_aio_in_flight_limit_and_cancellation():
+    controller = AdmissionController(max_in_flight=1)
+    release = asyncio.Event()
+
+    async def send():
+        await release.wait()
+        return "done"
+
+    first = asyncio.ensure_future(_execute_admitted_async(controller, send))
+    cancelled = asyncio.ensure_future(_execute_admitted_async(controller, send))
+    last = asyncio.ensure_future(_execute_admitted_async(controller, send))
+    await asyncio.sleep(0.01)
+    assert controller.in_flight == 1
+
+    cancelled.cancel()
+    release.set()
+    assert await first == "done"
+    assert await last == "done"
+    assert cancelled.cancelled()
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_aio_cancellation_after_the_hand_over_frees_the_slot():
+    controller = AdmissionController(max_in_flight=1)
+    await controller._acquire_async()
+    waiter = asyncio.ensure_future(controller._acquire_async())
+    await asyncio.sleep(0)
+
+    # The slot is handed over, but the waiter is cancelled before it resumes
+    controller._release_slot()
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(waiter, 5)
+
+    assert controller.in_flight == 0
+    assert await asyncio.wait_for(_execute_admitted_async(controller, lambda: asyncio.sleep(0, "free")), 5) == "free"
+
+
+class TestAdmissionController(KustoClientTestsMixin):
+    def test_client_requests_are_admitted(self):
+        controller = AdmissionController(failure_threshold=1)
+        calls = []
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            calls.append(endpoint)
+            if len(calls) == 1:
+                return make_v2_response({"x": "int"}, [[1]])
+            raise KustoThrottlingError("throttled")
+
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_execute_once", execute_once):
+            client.set_admission_controller(controller)
+            client.execute_query("db", "T")
+            with pytest.raises(KustoThrottlingError):
+                client.execute_mgmt("db", ".show tables")
+            with pytest.raises(KustoCircuitOpenError):
+                client.execute_query("db", "T")
+
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_aio_client_requests_are_admitted(self):
+        controller = AdmissionController(failure_threshold=1)
+
+        async def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            raise KustoNetworkError(endpoint)
+
+        async with AsyncKustoClient(self.HOST) as client:
+            with patch.object(AsyncKustoClient, "_execute_once", execute_once):
+                client.set_admission_controller(controller)
+                with pytest.raises(KustoNetworkError):
+                    await client.execute_query("db", "T")
+                with pytest.raises(KustoCircuitOpenError):
+                    await client.execute_query("db", "T")
+        assert controller.in_flight == 0
@@ -0,0 +1,95 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import threading
+from datetime import timedelta
+
+import pytest
+
+from azure.kusto.data.batching import QueryBatch, QueryBatcher
+from azure.kusto.data.exceptions import KustoClientError, KustoServiceError
+from azure.kusto.data.response import KustoResponseDataSetV2
+
+
+def _batch_response(query: str) -> KustoResponseDataSetV2:
+    """Returns a result per statement of a batch, holding the statement's index."""
+    statements = query.split(";\n")
+    tables = [
+        {
+            "FrameType": "DataTable",
+            "TableId": i,
+            "TableName": "batch_result_{}".format(i),
+            "TableKind": "PrimaryResult",
+            "Columns": [{"ColumnName": "Index", "ColumnType": "int"}],
+            "Rows": [[i]],
+        }
+        for i in range(len(statements))
+    ]
+    return KustoResponseDataSetV2(
+        [{"FrameType": "DataSetHeader", "IsProgressive": False, "Version": "v2.0"}]
+        + tables
+        + [{"FrameType": "DataSetCompletion", "HasErrors": False, "Cancelled": False}]
+    )
+
+
+class FakeClient:
+    def __init__(self, error: Exception = None):
+        self.queries = []
+        self.error = error
+        self.lock = threading.Lock()
+
+    def execute_query(self, database, query, properties=None):
+        with self.lock:
+            self.queries.append(query)
+        if self.error is not None:
+            raise self.error
+        return _batch_response(query)
+
+
+def test_query_batch():
+    batch = QueryBatch()
+    assert batch.add("Events | count;") == 0
+    assert batch.add(" Events | distinct Source ") == 1
+
+    assert batch.query == "Events | count\n| as ['batch_result_0'];\nEvents | distinct Source\n| as ['batch_result_1']"
+    client = FakeClient()
+    results = batch.execute(client, "db")
+    assert [table.raw_rows for table in results] == [[[0]], [[1]]]
+    assert client.queries == [batch.query]
+
+
+def test_missing_result():
+    batch = QueryBatch()
+    batch.add("A")
+    batch.add("B")
+    with pytest.raises(KustoClientError):
+        batch.split_results(_batch_response("A"))
+
+
+def test_batcher_sends_full_batches_and_flushes_on_close():
+    client = FakeClient()
+    with QueryBatcher(client, "db", window=timedelta(hours=1), max_batch_size=2) as batcher:
+        futures = [batcher.submit("Q{}".format(i)) for i in range(3)]
+        assert futures[1].result(timeout=5).raw_rows == [[1]]
+        assert not futures[2].done()
+
+    assert [future.result().raw_rows for future in futures] == [[[0]], [[1]], [[0]]]
+    assert len(client.queries) == 2
+    with pytest.raises(KustoClientError):
+        batcher.submit("Q")
+
+
+def test_batcher_window():
+    client = FakeClient()
+    batcher = QueryBatcher(client, "db", window=timedelta(milliseconds=10))
+    futures = [batcher.submit("Q{}".format(i)) for i in range(3)]
+
+    assert [future.result(timeout=5).raw_rows for future in futures] == [[[0]], [[1]], [[2]]]
+    assert len(client.queries) == 1
+
+
+def test_batcher_failure_fails_every_query():
+    error = KustoServiceError("boom")
+    with QueryBatcher(FakeClient(error), "db", window=timedelta(hours=1)) as batcher:
+        futures = [batcher.submit("Q{}".format(i)) for i in range(2)]
+
+    assert all(future.exception() is error for future in futures)
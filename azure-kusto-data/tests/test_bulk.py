@@ -0,0 +1,66 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient
+from azure.kusto.data.bulk import QueryRequest
+from azure.kusto.data.exceptions import KustoNetworkError
+from tests.kusto_client_common import KustoClientTestsMixin, mocked_requests_post
+
+
+class TestExecuteMany(KustoClientTestsMixin):
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_collects_errors_without_aborting(self, mock_post):
+        requests = [QueryRequest("Deft", "PythonTest"), QueryRequest("raiseNetwork", "PythonTest"), ".show version", QueryRequest("Deft", "PythonTest")]
+        with KustoClient(self.HOST) as client:
+            results = list(client.execute_many(requests, max_concurrency=2, ordered=True))
+
+        assert [r.index for r in results] == [0, 1, 2, 3]
+        assert [r.succeeded for r in results] == [True, False, True, True]
+        assert isinstance(results[1].error, KustoNetworkError)
+        with pytest.raises(KustoNetworkError):
+            results[1].result()
+        self._assert_sanity_query_response(results[0].result())
+        self._assert_sanity_control_command_response(results[2].result())
+        assert results[2].request.query == ".show version"
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_unordered_returns_all_results(self, mock_post):
+        with KustoClient(self.HOST) as client:
+            results = list(client.execute_many([QueryRequest("Deft", "PythonTest")] * 10, max_concurrency=4))
+
+        assert sorted(r.index for r in results) == list(range(10))
+        assert all(r.succeeded for r in results)
+        assert mock_post.call_count == 10
+
+    def test_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        in_flight = [0]
+        max_in_flight = [0]
+
+        def slow_post(*args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return mocked_requests_post(*args, **kwargs)
+
+        with patch("requests.Session.post", side_effect=slow_post):
+            with KustoClient(self.HOST) as client:
+                results = list(client.execute_many([QueryRequest("Deft", "PythonTest")] * 12, max_concurrency=3))
+
+        assert len(results) == 12
+        assert max_in_flight[0] <= 3
+
+    def test_empty_and_invalid_requests(self):
+        with KustoClient(self.HOST) as client:
+            assert list(client.execute_many([])) == []
+            # Invalid arguments fail at the call, not on the first iteration
+            with pytest.raises(ValueError):
+                client.execute_many(["Deft"], max_concurrency=0)
@@ -0,0 +1,77 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient
+from azure.kusto.data.bulk import execute_chunked_in_query, split_keys
+from azure.kusto.data.exceptions import KustoThrottlingError
+from tests.kusto_client_common import KustoClientTestsMixin, make_v2_response
+
+
+def _keys_of(properties):
+    value = properties.get_parameter("_keys", None)
+    assert value.startswith("dynamic(") and value.endswith(")")
+    return json.loads(value[len("dynamic(") : -1])
+
+
+def test_split_keys():
+    assert split_keys(range(5), 2, 1000) == [[0, 1], [2, 3], [4]]
+    assert split_keys(["a", "b", "a", "c"], 10, 1000) == [["a", "b", "c"]]
+    # '"aaaa"' and a separator are 7 bytes
+    assert split_keys(["aaaa", "bbbb", "cccc"], 10, 14) == [["aaaa", "bbbb"], ["cccc"]]
+    assert split_keys(["a" * 100, "b"], 10, 10) == [["a" * 100], ["b"]]
+    assert split_keys([], 10, 10) == []
+    with pytest.raises(ValueError):
+        split_keys([1], 0, 10)
+
+
+class TestChunkedInQuery(KustoClientTestsMixin):
+    def test_chunks_are_merged_in_order(self):
+        queries = []
+
+        def execute_query(self, database, query, properties=None):
+            queries.append(query)
+            return make_v2_response({"Id": "long"}, [[key] for key in _keys_of(properties)])
+
+        with patch.object(KustoClient, "execute_query", execute_query):
+            with KustoClient(self.HOST) as client:
+                response = execute_chunked_in_query(client, "db", "T | where Id in (_keys)", range(10), max_chunk_size=3)
+
+        assert len(queries) == 4
+        assert all(q == "declare query_parameters(_keys:dynamic);\nT | where Id in (_keys)" for q in queries)
+        assert [row["Id"] for row in response.primary_results[0]] == list(range(10))
+
+    def test_no_keys(self):
+        chunks = []
+
+        def execute_query(self, database, query, properties=None):
+            chunks.append(_keys_of(properties))
+            return make_v2_response({"Id": "string"}, [])
+
+        with patch.object(KustoClient, "execute_query", execute_query):
+            with KustoClient(self.HOST) as client:
+                response = execute_chunked_in_query(client, "db", "T | where Id in (_keys)", [])
+
+        assert chunks == [[]]
+        assert response.primary_results[0].columns[0].column_name == "Id"
+
+    @patch("azure.kusto.data.bulk.time.sleep")
+    def test_transient_failures_are_retried_per_chunk(self, mock_sleep):
+        failures = {"b": 1}
+
+        def execute_query(self, database, query, properties=None):
+            keys = _keys_of(properties)
+            if failures.get(keys[0], 0) > 0:
+                failures[keys[0]] -= 1
+                raise KustoThrottlingError("throttled")
+            return make_v2_response({"Id": "string"}, [[key] for key in keys])
+
+        with patch.object(KustoClient, "execute_query", execute_query):
+            with KustoClient(self.HOST) as client:
+                response = execute_chunked_in_query(client, "db", "T", ["a", "b", "c"], max_chunk_size=1)
+
+        assert [row["Id"] for row in response.primary_results[0]] == ["a", "b", "c"]
+        assert mock_sleep.call_count == 1
@@ -0,0 +1,159 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+import os
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient, KustoConnectionStringBuilder
+from azure.kusto.data.aio.client import KustoClient as AsyncKustoClient
+from azure.kusto.data.disk_query_cache import DiskQueryResultCache
+from azure.kusto.data.response import KustoResponseDataSetV1, KustoResponseDataSetV2
+from tests.kusto_client_common import FakeClock, KustoClientTestsMixin, make_v2_response, mocked_requests_post
+
+
+def _load_response(file_name: str = "deft.json"):
+    with open(os.path.join(os.path.dirname(__file__), "input", file_name), "r") as f:
+        return json.loads(f.read())
+
+
+def test_round_trip(tmp_path):
+    cache = DiskQueryResultCache(tmp_path)
+    response = KustoResponseDataSetV2(_load_response())
+    key = DiskQueryResultCache.make_key("cluster", "db", "Deft")
+
+    assert cache.get(key) is None
+    cache.put(key, response)
+
+    # A new instance over the same directory sees the result
+    restored = DiskQueryResultCache(tmp_path).get(key)
+    assert type(restored) is KustoResponseDataSetV2
+    assert restored.tables_names == response.tables_names
+    assert [r.to_list() for r in restored.primary_results[0]] == [r.to_list() for r in response.primary_results[0]]
+
+    statistics = cache.statistics
+    assert (statistics.hits, statistics.misses, statistics.entries_count) == (0, 1, 1)
+
+
+def test_v1_round_trip(tmp_path):
+    cache = DiskQueryResultCache(tmp_path)
+    response = KustoResponseDataSetV1(_load_response("adminthenquery.json"))
+    cache.put("key", response)
+
+    restored = cache.get("key")
+    assert type(restored) is KustoResponseDataSetV1
+    assert [t.table_kind for t in restored] == [t.table_kind for t in response]
+
+
+def test_invalidate_and_clear(tmp_path):
+    cache = DiskQueryResultCache(tmp_path)
+    response = KustoResponseDataSetV2(_load_response())
+    cache.put("a", response)
+    cache.put("b", response)
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_ttl(tmp_path):
+    clock = FakeClock()
+    cache = DiskQueryResultCache(tmp_path, ttl=timedelta(seconds=10), time_provider=clock)
+    response = KustoResponseDataSetV2(_load_response())
+    cache.put("a", response)
+    cache.put("b", response, ttl=timedelta(hours=1))
+
+    clock.now += 20
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.statistics.expirations == 1
+    assert len(cache) == 1
+
+
+def test_size_bounded_eviction(tmp_path):
+    clock = FakeClock()
+    response = KustoResponseDataSetV2(_load_response())
+    probe = DiskQueryResultCache(tmp_path / "probe")
+    probe.put("a", response)
+    entry_size = probe.statistics.size_bytes
+
+    cache = DiskQueryResultCache(tmp_path / "cache", max_size_bytes=entry_size * 2 + 100, time_provider=clock)
+    cache.put("a", response)
+    clock.now += 1
+    cache.put("b", response)
+    clock.now += 1
+    # Use "a", so that "b" is the least recently used
+    assert cache.get("a") is not None
+    clock.now += 1
+    cache.put("c", response)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.statistics.evictions == 1
+
+
+class TestKustoClientDiskQueryCache(KustoClientTestsMixin):
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_query_served_from_disk(self, mock_post, tmp_path):
+        with KustoClient(self.HOST) as client:
+            client.set_query_cache(DiskQueryResultCache(tmp_path))
+            client.execute_query("PythonTest", "Deft")
+
+        with KustoClient(self.HOST) as client:
+            client.set_query_cache(DiskQueryResultCache(tmp_path))
+            response = client.execute_query("PythonTest", "Deft")
+
+        assert mock_post.call_count == 1
+        self._assert_sanity_query_response(response)
+
+    def test_results_are_not_shared_across_identities(self, tmp_path):
+        requests = []
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            requests.append(client)
+            return make_v2_response({"x": "int"}, [[1]])
+
+        with patch.object(KustoClient, "_execute_once", execute_once):
+            for token in ["first", "second", "first"]:
+                with KustoClient(KustoConnectionStringBuilder.with_aad_application_token_authentication(self.HOST, token)) as client:
+                    client.set_query_cache(DiskQueryResultCache(tmp_path))
+                    client.execute_query("PythonTest", "T")
+
+        assert len(requests) == 2
+        assert len(DiskQueryResultCache(tmp_path)) == 2
+
+    @pytest.mark.asyncio
+    async def test_aio_client_uses_the_disk_off_the_event_loop(self, tmp_path):
+        loop_thread = threading.get_ident()
+        threads = []
+        cache = DiskQueryResultCache(tmp_path)
+        get, put = cache.get, cache.put
+
+        def record(method):
+            def wrapper(*args, **kwargs):
+                threads.append(threading.get_ident())
+                return method(*args, **kwargs)
+
+            return wrapper
+
+        cache.get, cache.put = record(get), record(put)
+
+        async def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            return make_v2_response({"x": "int"}, [[1]])
+
+        async with AsyncKustoClient(self.HOST) as client:
+            with patch.object(AsyncKustoClient, "_execute_once", execute_once):
+                client.set_query_cache(cache)
+                await client.execute_query("PythonTest", "T")
+                response = await client.execute_query("PythonTest", "T")
+
+        assert response.primary_results[0][0]["x"] == 1
+        assert len(threads) == 3
+        assert loop_thread not in threads
@@ -0,0 +1,193 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import ClientRequestProperties, KustoClient
+from azure.kusto.data.aio.client import KustoClient as AsyncKustoClient
+from azure.kusto.data.exceptions import KustoServiceError
+from azure.kusto.data.hedging import HedgingPolicy
+from tests.kusto_client_common import KustoClientTestsMixin, make_v2_response
+
+FAST = {"initial_delay": timedelta(milliseconds=20), "min_delay": timedelta(milliseconds=1)}
+
+
+def test_delay_is_a_percentile_of_recent_latencies():
+    policy = HedgingPolicy(percentile=90, window_size=10, min_samples=10, min_delay=timedelta(0), max_delay=timedelta(seconds=5))
+    assert policy.get_delay() == 1
+    for latency in range(1, 11):
+        policy._record_result(latency / 10, False, False)
+    assert policy.get_delay() == 1.0
+    # Pushes the fastest latency out of the window
+    policy._record_result(100, False, False)
+    assert policy.get_delay() == 5
+
+    with pytest.raises(ValueError):
+        HedgingPolicy(percentile=101)
+
+
+class TestHedging(KustoClientTestsMixin):
+    def test_fast_queries_are_not_hedged(self):
+        sent = []
+
+        def send_query(client, database, query, properties):
+            sent.append(properties.client_request_id)
+            return make_v2_response({"x": "int"}, [[1]])
+
+        policy = HedgingPolicy(**FAST)
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_send_query", send_query):
+            client.set_hedging_policy(policy)
+            client.execute_query("db", "T")
+
+        assert len(sent) == 1 and sent[0].startswith("KPC.execute;")
+        assert policy.hedged_count == 0
+
+    def test_slow_query_is_hedged_and_the_loser_cancelled(self):
+        sent = []
+        cancelled = []
+        release = threading.Event()
+
+        def send_query(client, database, query, properties):
+            sent.append(properties.client_request_id)
+            if len(sent) == 1:
+                release.wait(5)
+                return make_v2_response({"Request": "string"}, [["primary"]])
+            return make_v2_response({"Request": "string"}, [["hedge"]])
+
+        def cancel_query(client, database, client_request_id):
+            cancelled.append(client_request_id)
+            release.set()
+
+        policy = HedgingPolicy(**FAST)
+        properties = ClientRequestProperties()
+        properties.client_request_id = "my-request"
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_send_query", send_query), patch.object(KustoClient, "cancel_query", cancel_query):
+            client.set_hedging_policy(policy)
+            response = client.execute_query("db", "T", properties)
+            assert release.wait(5)
+
+        assert response.primary_results[0][0]["Request"] == "hedge"
+        assert sent == ["my-request", "my-request;hedge"]
+        assert cancelled == ["my-request"]
+        assert (policy.hedged_count, policy.hedge_wins) == (1, 1)
+
+    def test_winner_is_returned_without_waiting_for_the_loser(self):
+        stalled = threading.Event()
+        cancelled = []
+        cancel_sent = threading.Event()
+
+        def send_query(client, database, query, properties):
+            if not properties.client_request_id.endswith(";hedge"):
+                # A stalled connection, which the service-side cancellation doesn't unblock
+                stalled.wait(5)
+            return make_v2_response({"Request": "string"}, [[properties.client_request_id]])
+
+        def cancel_query(client, database, client_request_id):
+            cancelled.append(client_request_id)
+            cancel_sent.set()
+
+        policy = HedgingPolicy(**FAST)
+        properties = ClientRequestProperties()
+        properties.client_request_id = "my-request"
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_send_query", send_query), patch.object(KustoClient, "cancel_query", cancel_query):
+            client.set_hedging_policy(policy)
+            response = client.execute_query("db", "T", properties)
+            assert not stalled.is_set()
+            assert cancel_sent.wait(5)
+            stalled.set()
+
+        assert response.primary_results[0][0]["Request"] == "my-request;hedge"
+        assert cancelled == ["my-request"]
+        policy.close()
+
+    def test_closing_the_policy_during_a_query(self):
+        def send_query(client, database, query, properties):
+            if not properties.client_request_id.endswith(";hedge"):
+                policy.close()
+                threading.Event().wait(0.1)
+            return make_v2_response({"Request": "string"}, [[properties.client_request_id]])
+
+        policy = HedgingPolicy(**FAST)
+        properties = ClientRequestProperties()
+        properties.client_request_id = "my-request"
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_send_query", send_query):
+            client.set_hedging_policy(policy)
+            # The closed policy doesn't hedge anymore, and the original request completes
+            assert client.execute_query("db", "T", properties).primary_results[0][0]["Request"] == "my-request"
+        policy.close()
+
+    def test_closed_policy_can_be_used_again(self):
+        def send_query(client, database, query, properties):
+            return make_v2_response({"x": "int"}, [[1]])
+
+        policy = HedgingPolicy(**FAST)
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_send_query", send_query):
+            client.set_hedging_policy(policy)
+            client.execute_query("db", "T")
+            executor = policy._executor
+            policy.close()
+            assert executor._shutdown and policy._executor is None
+            client.execute_query("db", "T")
+            assert policy._executor is not executor
+        policy.close()
+
+    def test_failed_hedge_waits_for_the_original(self):
+        calls = []
+
+        def send_query(client, database, query, properties):
+            calls.append(properties.client_request_id)
+            if len(calls) == 1:
+                threading.Event().wait(0.1)
+                return make_v2_response({"Request": "string"}, [["primary"]])
+            raise KustoServiceError("failed")
+
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_send_query", send_query):
+            client.set_hedging_policy(HedgingPolicy(**FAST))
+            assert client.execute_query("db", "T").primary_results[0][0]["Request"] == "primary"
+
+    def test_both_failing(self):
+        def send_query(client, database, query, properties):
+            threading.Event().wait(0.05)
+            raise KustoServiceError(properties.client_request_id)
+
+        properties = ClientRequestProperties()
+        properties.client_request_id = "my-request"
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_send_query", send_query):
+            client.set_hedging_policy(HedgingPolicy(**FAST))
+            with pytest.raises(KustoServiceError, match="^my-request$"):
+                client.execute_query("db", "T", properties)
+
+    @pytest.mark.asyncio
+    async def test_async_slow_query_is_hedged_and_the_loser_cancelled(self):
+        sent = []
+        cancelled = []
+        primary_cancelled = asyncio.Event()
+
+        async def send_query(client, database, query, properties):
+            sent.append(properties.client_request_id)
+            if len(sent) == 1:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    primary_cancelled.set()
+                    raise
+            return make_v2_response({"Request": "string"}, [["hedge"]])
+
+        async def cancel_query(client, database, client_request_id):
+            cancelled.append(client_request_id)
+
+        policy = HedgingPolicy(**FAST)
+        async with AsyncKustoClient(self.HOST) as client:
+            with patch.object(AsyncKustoClient, "_send_query", send_query), patch.object(AsyncKustoClient, "cancel_query", cancel_query):
+                client.set_hedging_policy(policy)
+                response = await client.execute_query("db", "T")
+                await asyncio.wait_for(primary_cancelled.wait(), 5)
+                await asyncio.sleep(0)
+
+        assert response.primary_results[0][0]["Request"] == "hedge"
+        assert cancelled == [sent[0]]
+        assert policy.hedge_wins == 1
@@ -0,0 +1,115 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from azure.kusto.data.exceptions import KustoClientError
+from azure.kusto.data.incremental_query import IncrementalQuery
+from tests.kusto_client_common import make_v2_response
+
+
+class FakeClient:
+    """Returns the given responses in order, and records the queries and their parameters."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def execute_query(self, database, query, properties=None):
+        self.requests.append((query, dict(properties._parameters)))
+        return self.responses.pop(0)
+
+
+def _events(*rows):
+    return make_v2_response({"Message": "string", "_IngestionTime": "datetime"}, list(rows))
+
+
+def test_refresh_fetches_only_new_rows():
+    client = FakeClient(
+        _events(["a", "2024-01-01T00:00:00.1234567Z"], ["b", "2024-01-01T00:01:00Z"]),
+        _events(),
+        _events(["c", "2024-01-01T00:02:00Z"]),
+    )
+    events = IncrementalQuery(client, "db", "Events | where Level == 'Error' ")
+
+    assert events.refresh() == 2
+    assert client.requests[0] == ("Events | where Level == 'Error'\n| extend _IngestionTime = ingestion_time()", {})
+    assert events.watermark == "2024-01-01T00:01:00Z"
+
+    assert events.refresh() == 0
+    assert client.requests[1] == (
+        "declare query_parameters(_watermark:datetime);\n"
+        "Events | where Level == 'Error'\n| extend _IngestionTime = ingestion_time()\n| where _IngestionTime > _watermark",
+        {"_watermark": "datetime(2024-01-01T00:01:00Z)"},
+    )
+    assert events.watermark == "2024-01-01T00:01:00Z"
+
+    assert events.refresh() == 1
+    assert [row["Message"] for row in events.result] == ["a", "b", "c"]
+    assert list(events.to_dataframe()["Message"]) == ["a", "b", "c"]
+
+
+def test_custom_watermark_column():
+    client = FakeClient(
+        make_v2_response({"Id": "long", "Value": "string"}, [[3, "c"], [7, "g"]]),
+        make_v2_response({"Id": "long", "Value": "string"}, [[8, "h"]]),
+    )
+    rows = IncrementalQuery(client, "db", "Items", watermark_column="Id")
+    rows.refresh()
+    rows.refresh()
+
+    assert client.requests[0] == ("Items", {})
+    assert client.requests[1] == ("declare query_parameters(_watermark:long);\nItems\n| where Id > _watermark", {"_watermark": "long(7)"})
+    assert rows.watermark == 8
+    assert len(rows) == 3
+
+
+def test_retention():
+    now = datetime(2024, 1, 1, 1, 0, tzinfo=timezone.utc)
+    client = FakeClient(
+        _events(["a", "2024-01-01T00:00:00Z"], ["b", "2024-01-01T00:30:00Z"]),
+        _events(["c", "2024-01-01T01:20:00Z"]),
+    )
+    events = IncrementalQuery(client, "db", "Events", retention=timedelta(hours=1), time_provider=lambda: now)
+
+    events.refresh()
+    assert client.requests[0][1] == {"_watermark": "datetime(2024-01-01T00:00:00.000000Z)"}
+    assert [row["Message"] for row in events.result] == ["a", "b"]
+
+    now = datetime(2024, 1, 1, 1, 20, tzinfo=timezone.utc)
+    events.refresh()
+    assert [row["Message"] for row in events.result] == ["b", "c"]
+
+
+def test_missing_watermark_column():
+    client = FakeClient(make_v2_response({"Value": "string"}, []))
+    with pytest.raises(KustoClientError):
+        IncrementalQuery(client, "db", "Items", watermark_column="Id").refresh()
+
+
+def test_lookback_finds_late_rows_once():
+    client = FakeClient(
+        _events(["a", "2024-01-01T00:00:00Z"], ["b", "2024-01-01T00:10:00Z"]),
+        # "late" was committed after "b", with an earlier ingestion time
+        _events(["b", "2024-01-01T00:10:00Z"], ["late", "2024-01-01T00:05:00Z"], ["c", "2024-01-01T00:12:00Z"]),
+    )
+    events = IncrementalQuery(client, "db", "Events", lookback=timedelta(minutes=10))
+
+    assert events.refresh() == 2
+    assert events.refresh() == 2
+    assert client.requests[1][1] == {"_watermark": "datetime(2024-01-01T00:00:00.000000Z)"}
+    assert [row["Message"] for row in events.result] == ["a", "b", "late", "c"]
+    assert events.watermark == "2024-01-01T00:12:00Z"
+    # Only the rows within the window before the watermark are remembered
+    assert len(events._recent_rows) == 3
+
+
+def test_watermark_type_is_validated():
+    client = FakeClient(make_v2_response({"Name": "string"}, [["a"]]))
+    with pytest.raises(KustoClientError, match="datetime or a number"):
+        IncrementalQuery(client, "db", "Items", watermark_column="Name").refresh()
+
+    client = FakeClient(make_v2_response({"Id": "long"}, [[1]]))
+    with pytest.raises(KustoClientError, match="lookback"):
+        IncrementalQuery(client, "db", "Items", watermark_column="Id", lookback=timedelta(minutes=1)).refresh()
@@ -0,0 +1,109 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient
+from azure.kusto.data.exceptions import KustoUnsupportedLocalQueryError
+from azure.kusto.data.local_query import evaluate, find_refinement, split_pipes
+from azure.kusto.data.query_cache import QueryResultCache
+from tests.kusto_client_common import KustoClientTestsMixin, make_v2_response, mocked_requests_post
+
+EVENTS = make_v2_response(
+    {"Source": "string", "Level": "string", "Count": "long", "Timestamp": "datetime"},
+    [
+        ["web", "Error", 5, "2024-01-01T00:00:00Z"],
+        ["web", "Info", 1, "2024-01-02T00:00:00Z"],
+        ["db", "error", None, "2024-01-03T00:00:00Z"],
+        ["db", "Warning", 3, None],
+        ["queue", "Error", 8, "2024-01-05T00:00:00.1234567Z"],
+    ],
+)
+
+
+def _evaluate(operators: str) -> list:
+    return evaluate(EVENTS.primary_results[0], operators).raw_rows
+
+
+def test_split_pipes():
+    assert split_pipes("T | where a == '|' | where b contains @\"x|\" // c | d\n| take 1") == [
+        "T ",
+        " where a == '|' ",
+        ' where b contains @"x|" // c | d\n',
+        " take 1",
+    ]
+    assert split_pipes("union (A | take 1), (B | take 1) | count") == ["union (A | take 1), (B | take 1) ", " count"]
+
+
+def test_where():
+    assert [r[0] for r in _evaluate("where Level == 'Error'")] == ["web", "queue"]
+    assert [r[0] for r in _evaluate("where Level =~ 'error'")] == ["web", "db", "queue"]
+    assert [r[0] for r in _evaluate("where Count > 2 and Source != 'web'")] == ["db", "queue"]
+    assert [r[0] for r in _evaluate("where Count < 2 or isnull(Count)")] == ["web", "db"]
+    assert [r[0] for r in _evaluate("where not(Count > 2)")] == ["web"]
+    assert [r[0] for r in _evaluate('where Source in ("db", "queue") and Level !contains "warn"')] == ["db", "queue"]
+    assert [r[0] for r in _evaluate("where Timestamp >= datetime(2024-01-03)")] == ["db", "queue"]
+    assert [r[0] for r in _evaluate("where Count >= -1 and (Level startswith 'ERR' or Level endswith 'NG')")] == ["web", "db", "queue"]
+
+
+def test_project_take_top():
+    assert _evaluate("project Level, Amount = Count | take 2") == [["Error", 5], ["Info", 1]]
+    assert [r[0] for r in _evaluate("top 3 by Count")] == ["queue", "web", "db"]
+    assert [r[0] for r in _evaluate("top 2 by Count asc")] == ["db", "web"]
+    assert [r[0] for r in _evaluate("top 2 by Count asc nulls last")] == ["web", "db"]
+
+
+def test_count_and_summarize():
+    assert _evaluate("count") == [[5]]
+    assert _evaluate("where Source == 'none' | count") == [[0]]
+    assert _evaluate("summarize count() by Source") == [["web", 2], ["db", 2], ["queue", 1]]
+    table = evaluate(EVENTS.primary_results[0], "summarize Events = count() by Source, Level | where Events > 1")
+    assert table.raw_rows == []
+    assert [c.column_name for c in table.columns] == ["Source", "Level", "Events"]
+    assert _evaluate("summarize count()") == [[5]]
+
+
+@pytest.mark.parametrize(
+    "operators",
+    ["extend x = 1", "where Level has 'Error'", "summarize sum(Count) by Source", "where Timestamp > ago(1d)", "where Source == 5", "where Missing == 1"],
+)
+def test_unsupported(operators):
+    with pytest.raises(KustoUnsupportedLocalQueryError):
+        _evaluate(operators)
+
+
+def test_find_refinement():
+    lookups = []
+
+    def lookup(query):
+        lookups.append(query.strip())
+        return EVENTS if query.strip() == "Events | where Timestamp > datetime(2024-01-01)" else None
+
+    result = find_refinement("Events | where Timestamp > datetime(2024-01-01) | where Level == 'Error' | take 10", lookup)
+    assert lookups == ["Events | where Timestamp > datetime(2024-01-01) | where Level == 'Error'", "Events | where Timestamp > datetime(2024-01-01)"]
+    assert [r[0] for r in result.primary_results[0].raw_rows] == ["web", "queue"]
+    assert len(result.tables) == len(EVENTS.tables)
+
+    assert find_refinement("Events | where Timestamp > datetime(2024-01-01) | extend x = 1", lookup) is None
+
+
+class TestKustoClientLocalRefinement(KustoClientTestsMixin):
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_refinement_is_answered_from_cache(self, mock_post):
+        with KustoClient(self.HOST) as client:
+            client.set_query_cache(QueryResultCache(), answer_refinements_locally=True)
+            client.execute_query("PythonTest", "Deft")
+            response = client.execute_query("PythonTest", "Deft | where xbool == true | project rownumber | take 2")
+
+            assert mock_post.call_count == 1
+            assert response.primary_results[0].raw_rows == [[1], [3]]
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_refinement_is_disabled_by_default(self, mock_post):
+        with KustoClient(self.HOST) as client:
+            client.set_query_cache(QueryResultCache())
+            client.execute_query("PythonTest", "Deft")
+            client.execute_query("PythonTest", "Deft | take 2")
+
+            assert mock_post.call_count == 2
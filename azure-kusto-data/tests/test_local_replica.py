@@ -0,0 +1,113 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+from datetime import timedelta
+from io import BytesIO
+
+import pytest
+
+from azure.kusto.data.exceptions import KustoClientError, KustoMultiApiError
+from azure.kusto.data.local_replica import LocalReplica
+from azure.kusto.data.response import KustoStreamingResponseDataSet
+from azure.kusto.data.streaming_response import JsonTokenReader, StreamingDataSetEnumerator
+
+
+def _streaming_response(columns, rows) -> KustoStreamingResponseDataSet:
+    frames = [
+        {"FrameType": "DataSetHeader", "IsProgressive": False, "Version": "v2.0"},
+        {
+            "FrameType": "DataTable",
+            "TableId": 0,
+            "TableKind": "PrimaryResult",
+            "TableName": "PrimaryResult",
+            "Columns": [{"ColumnName": name, "ColumnType": column_type} for name, column_type in columns.items()],
+            "Rows": rows,
+        },
+        {"FrameType": "DataSetCompletion", "HasErrors": False, "Cancelled": False},
+    ]
+    return KustoStreamingResponseDataSet(StreamingDataSetEnumerator(JsonTokenReader(BytesIO(json.dumps(frames).encode()))))
+
+
+class FakeClient:
+    """Returns the given rows of each partition, and records the queries and their parameters."""
+
+    columns = {"DeviceId": "string", "Payload": "dynamic", "_IngestionTime": "datetime"}
+
+    def __init__(self):
+        self.rows = {}
+        self.requests = []
+
+    def execute_streaming_query(self, database, query, timeout=None, properties=None):
+        self.requests.append((query, dict(properties._parameters)))
+        partition = int(query.split("== ")[1][0]) if "hash(" in query else 0
+        return _streaming_response(self.columns, self.rows.pop(partition, []))
+
+
+def test_sync_fetches_new_rows_per_partition(tmp_path):
+    client = FakeClient()
+    client.rows = {
+        0: [["a", {"x": 1}, "2024-01-01T00:00:00Z"], ["b", None, "2024-01-01T00:02:00Z"]],
+        1: [["c", [1, 2], "2024-01-01T00:01:00Z"]],
+    }
+    with LocalReplica(client, "db", "Events", tmp_path / "replica.db", "Events", partition_key="DeviceId", partitions=2) as replica:
+        assert replica.replicated_until is None
+        assert replica.sync() == 3
+        assert client.requests[0] == ("Events\n| extend _IngestionTime = ingestion_time()\n| where hash(DeviceId, 2) == 0", {})
+        assert replica.watermarks == {0: "2024-01-01T00:02:00Z", 1: "2024-01-01T00:01:00Z"}
+        assert replica.replicated_until == "2024-01-01T00:01:00Z"
+        assert replica.execute_sql('SELECT DeviceId, Payload FROM "Events" ORDER BY DeviceId') == [("a", '{"x": 1}'), ("b", None), ("c", "[1, 2]")]
+
+        client.rows = {1: [["d", None, "2024-01-01T00:03:00Z"]]}
+        assert replica.sync() == 1
+        assert client.requests[2] == (
+            "declare query_parameters(_watermark:datetime);\n"
+            "Events\n| extend _IngestionTime = ingestion_time()\n| where hash(DeviceId, 2) == 0\n| where _IngestionTime > _watermark",
+            {"_watermark": "datetime(2024-01-01T00:02:00Z)"},
+        )
+
+    # The watermarks are persisted with the rows
+    with LocalReplica(client, "db", "Events", tmp_path / "replica.db", "Events", partition_key="DeviceId", partitions=2) as replica:
+        assert replica.watermarks == {0: "2024-01-01T00:02:00Z", 1: "2024-01-01T00:03:00Z"}
+        assert replica.execute_sql('SELECT COUNT(*) FROM "Events"') == [(4,)]
+
+
+def test_failed_partition_is_rolled_back(tmp_path):
+    client = FakeClient()
+    client.rows = {0: [["a", None, "2024-01-01T00:00:00Z"], {"error": "boom"}]}
+    with LocalReplica(client, "db", "Events", tmp_path / "replica.db", "Events") as replica:
+        with pytest.raises(KustoMultiApiError):
+            replica.sync()
+        assert replica.watermarks == {}
+        assert replica.execute_sql('SELECT COUNT(*) FROM "Events"') == [(0,)]
+
+
+def test_empty_partition_counts_as_synced(tmp_path):
+    client = FakeClient()
+    client.rows = {0: [["a", None, "2024-01-01T00:00:00Z"]]}
+    with LocalReplica(client, "db", "Events", tmp_path / "replica.db", "Events", partition_key="DeviceId", partitions=2) as replica:
+        replica.sync()
+        assert replica.watermarks == {0: "2024-01-01T00:00:00Z"}
+        assert replica.replicated_until == "2024-01-01T00:00:00Z"
+
+
+def test_lookback_replicates_late_rows_once(tmp_path):
+    client = FakeClient()
+    client.rows = {0: [["a", None, "2024-01-01T00:00:00Z"], ["b", None, "2024-01-01T00:10:00Z"]]}
+    with LocalReplica(client, "db", "Events", tmp_path / "replica.db", "Events", lookback=timedelta(minutes=10)) as replica:
+        assert replica.sync() == 2
+        # "late" was committed after "b", with an earlier ingestion time
+        client.rows = {0: [["b", None, "2024-01-01T00:10:00Z"], ["late", None, "2024-01-01T00:05:00Z"], ["c", None, "2024-01-01T00:12:00Z"]]}
+        assert replica.sync() == 2
+        assert client.requests[1][1] == {"_watermark": "datetime(2024-01-01T00:00:00.000000Z)"}
+        assert replica.execute_sql('SELECT DeviceId FROM "Events" ORDER BY _IngestionTime') == [("a",), ("late",), ("b",), ("c",)]
+        assert replica.watermarks == {0: "2024-01-01T00:12:00Z"}
+
+
+def test_watermark_type_is_validated(tmp_path):
+    client = FakeClient()
+    client.columns = {"DeviceId": "string"}
+    client.rows = {0: [["a"]]}
+    with LocalReplica(client, "db", "Devices", tmp_path / "replica.db", "Devices", watermark_column="DeviceId") as replica:
+        with pytest.raises(KustoClientError, match="datetime or a number"):
+            replica.sync()
+        assert replica.execute_sql("SELECT name FROM sqlite_master WHERE name = 'Devices'") == []
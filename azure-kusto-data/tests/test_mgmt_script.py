@@ -0,0 +1,122 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+from unittest.mock import patch
+
+import pytest
+import requests
+import urllib3
+
+from azure.kusto.data.exceptions import KustoClientError, KustoNetworkError, KustoThrottlingError
+from azure.kusto.data.mgmt_script import build_script_command, execute_mgmt_script
+
+from .kusto_client_common import make_v2_response
+
+SCRIPT_COLUMNS = {"OperationId": "guid", "CommandType": "string", "CommandText": "string", "Result": "string", "Reason": "string"}
+SCRIPT_PREFIX = ".execute database script with (ContinueOnErrors = true) <|\n"
+
+
+class FakeClient:
+    """Runs scripts whose commands fail as long as they have failures left in `failures`."""
+
+    def __init__(self, failures=None, errors=(), missing_results=False):
+        self.failures = dict(failures or {})
+        self.errors = list(errors)
+        self.missing_results = missing_results
+        self.scripts = []
+
+    def execute_mgmt(self, database, query, properties=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        assert query.startswith(SCRIPT_PREFIX)
+        commands = query[len(SCRIPT_PREFIX) :].split("\n\n")
+        self.scripts.append(commands)
+        rows = []
+        for i, command in enumerate(commands):
+            if self.failures.get(command, 0) > 0:
+                self.failures[command] -= 1
+                rows.append(["op{}".format(i), "", command, "Failed", "Conflict"])
+            else:
+                rows.append(["op{}".format(i), "", command, "Completed", ""])
+        return make_v2_response(SCRIPT_COLUMNS, rows[:-1] if self.missing_results else rows)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    with patch("azure.kusto.data.mgmt_script.time.sleep"), patch("azure.kusto.data.bulk.time.sleep"):
+        yield
+
+
+def test_build_script_command():
+    assert build_script_command([".create table T (a:int)", ".alter table T policy caching hot = 1d"]) == (
+        SCRIPT_PREFIX + ".create table T (a:int)\n\n.alter table T policy caching hot = 1d"
+    )
+    with pytest.raises(KustoClientError):
+        build_script_command([])
+
+
+def test_blank_lines_dont_split_commands():
+    function = ".create-or-alter function F() {\n    let a = T | take 1;\n\n  \n    // The result\n    a\n}\n\n"
+    command = build_script_command([function, ".show tables"])
+    assert command == SCRIPT_PREFIX + ".create-or-alter function F() {\n    let a = T | take 1;\n    // The result\n    a\n}\n\n.show tables"
+    assert len(command[len(SCRIPT_PREFIX) :].split("\n\n")) == 2
+
+    # Blank lines in multi-line strings can't be removed
+    assert build_script_command(["print ```a\n b```\n\n| count"]) == SCRIPT_PREFIX + "print ```a\n b```\n| count"
+    with pytest.raises(KustoClientError):
+        build_script_command(["print ```a\n\nb```"])
+
+
+def test_batches():
+    client = FakeClient()
+    commands = [".command {}".format(i) for i in range(5)]
+    outcomes = execute_mgmt_script(client, "db", commands, batch_size=2)
+
+    assert client.scripts == [commands[0:2], commands[2:4], commands[4:5]]
+    assert [o.index for o in outcomes] == list(range(5))
+    assert all(o.succeeded and o.attempts == 1 for o in outcomes)
+    assert outcomes[3].operation_id == "op1"
+
+
+def test_retries_only_failed_commands():
+    client = FakeClient(failures={".command 1": 1, ".command 2": 5})
+    commands = [".command {}".format(i) for i in range(4)]
+    outcomes = execute_mgmt_script(client, "db", commands, retries=2)
+
+    assert client.scripts == [commands, [".command 1", ".command 2"], [".command 2"]]
+    assert [(o.succeeded, o.attempts) for o in outcomes] == [(True, 1), (True, 2), (False, 3), (True, 1)]
+    assert outcomes[2].result == "Failed"
+    assert outcomes[2].reason == "Conflict"
+
+
+def network_error(cause: Exception) -> KustoNetworkError:
+    try:
+        raise KustoNetworkError("https://example") from cause
+    except KustoNetworkError as e:
+        return e
+
+
+def test_requests_that_never_reached_the_service_are_retried():
+    connect_failure = requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(None, "/", urllib3.exceptions.NewConnectionError(None, "refused")))
+    client = FakeClient(errors=[KustoThrottlingError("throttled"), network_error(connect_failure)])
+    outcomes = execute_mgmt_script(client, "db", [".command"])
+    assert outcomes[0].succeeded
+    assert len(client.scripts) == 1
+
+
+def test_requests_that_may_have_run_are_only_retried_when_idempotent():
+    # The connection dropped after the script was sent, so it may have run
+    def dropped_connection():
+        return network_error(requests.exceptions.ConnectionError("Connection aborted"))
+
+    with pytest.raises(KustoNetworkError):
+        execute_mgmt_script(FakeClient(errors=[dropped_connection()]), "db", [".append T <| U"])
+
+    client = FakeClient(errors=[dropped_connection()])
+    outcomes = execute_mgmt_script(client, "db", [".create-or-alter function f() { T }"], idempotent=True)
+    assert outcomes[0].succeeded
+    assert len(client.scripts) == 1
+
+
+def test_missing_results():
+    with pytest.raises(KustoClientError):
+        execute_mgmt_script(FakeClient(missing_results=True), "db", [".a", ".b"])
@@ -0,0 +1,79 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import ClientRequestProperties, KustoClient
+from azure.kusto.data.exceptions import KustoClientError, KustoServiceError
+from azure.kusto.data.multi_cluster import MultiClusterExecutor
+from tests.kusto_client_common import make_v2_response
+
+WEST = "https://west.kusto.windows.net"
+EAST = "https://east.kusto.windows.net"
+NORTH = "https://north.kusto.windows.net"
+
+
+def execute_query(self, database, query, properties=None):
+    if "north" in self._kusto_cluster:
+        raise KustoServiceError("unavailable")
+    region = "west" if "west" in self._kusto_cluster else "east"
+    return make_v2_response({"Level": "string", "Count": "long"}, [[region + "-error", 1], [region + "-warning", 2]])
+
+
+@patch.object(KustoClient, "execute_query", execute_query)
+def test_results_are_merged_with_a_source_column():
+    with MultiClusterExecutor({"west": WEST, "east": EAST}) as executor:
+        result = executor.execute("db", "Events | summarize Count = count() by Level")
+
+    assert result.errors == {}
+    table = result.to_table()
+    assert [c.column_name for c in table.columns] == ["SourceCluster", "Level", "Count"]
+    assert table.raw_rows == [["west", "west-error", 1], ["west", "west-warning", 2], ["east", "east-error", 1], ["east", "east-warning", 2]]
+
+
+@patch.object(KustoClient, "execute_query", execute_query)
+def test_partial_failures():
+    with MultiClusterExecutor([WEST, NORTH]) as executor:
+        result = executor.execute("db", "Events")
+
+    assert list(result.errors) == [NORTH]
+    assert [row[0] for row in result.to_table().raw_rows] == [WEST, WEST]
+    with pytest.raises(KustoServiceError):
+        result.raise_for_errors()
+
+
+@patch.object(KustoClient, "execute_query", execute_query)
+def test_all_failed():
+    with MultiClusterExecutor([NORTH]) as executor:
+        with pytest.raises(KustoClientError):
+            executor.execute("db", "Events").to_table()
+
+
+def test_timeout_and_properties_are_set_per_cluster():
+    seen = []
+
+    def record(self, database, query, properties=None):
+        seen.append((self._kusto_cluster, properties.get_option("servertimeout", None), properties.get_option("query_language", None)))
+        return make_v2_response({"x": "int"}, [])
+
+    properties = ClientRequestProperties()
+    properties.set_option("query_language", "kql")
+    with patch.object(KustoClient, "execute_query", record), MultiClusterExecutor([WEST, EAST]) as executor:
+        executor.execute("db", "T", properties, timeout=timedelta(seconds=30))
+
+    assert sorted(seen) == [(EAST + "/", timedelta(seconds=30), "kql"), (WEST + "/", timedelta(seconds=30), "kql")]
+    assert not properties.has_option("servertimeout")
+
+
+def test_given_clients_are_reused_and_not_closed():
+    client = KustoClient(WEST)
+    with MultiClusterExecutor({"west": client, "east": EAST}) as executor:
+        assert executor.client("west") is client
+        assert executor.clusters == ["west", "east"]
+        east = executor.client("east")
+
+    assert not client._is_closed
+    assert east._is_closed
+    client.close()
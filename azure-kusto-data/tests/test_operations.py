@@ -0,0 +1,126 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import re
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient
+from azure.kusto.data.aio.client import KustoClient as AsyncKustoClient
+from azure.kusto.data.exceptions import KustoClientError, KustoClosedError, KustoNetworkError, KustoOperationError, KustoServiceError
+from azure.kusto.data.operations import _AsyncOperationPoller, _OperationPoller
+
+from tests.kusto_client_common import KustoClientTestsMixin, make_v2_response
+
+OPERATION_COLUMNS = {"OperationId": "guid", "LastUpdatedOn": "datetime", "State": "string", "Status": "string"}
+FAST = {"min_interval": timedelta(milliseconds=5), "max_interval": timedelta(milliseconds=20)}
+
+
+class FakeOperations:
+    """Answers `.show operations` commands, advancing every listed operation through its states, one per poll."""
+
+    def __init__(self, states, errors=None):
+        self.states = {operation_id: list(operation_states) for operation_id, operation_states in states.items()}
+        self.errors = list(errors or [])
+        self.commands = []
+        self.lock = threading.Lock()
+
+    def _show_operations(self, query):
+        with self.lock:
+            self.commands.append(query)
+            if self.errors:
+                raise self.errors.pop(0)
+            ids = re.fullmatch(r"\.show operations \((.*)\)", query).group(1).split(", ")
+            rows = []
+            for operation_id in ids:
+                states = self.states.get(operation_id)
+                if states:
+                    state = states.pop(0) if len(states) > 1 else states[0]
+                    # A stale record, which the latest one overrides
+                    rows.append([operation_id, "2024-01-01T00:00:00Z", "InProgress", ""])
+                    rows.append([operation_id, "2024-01-01T00:00:01Z", state, "status of " + state])
+            return make_v2_response(OPERATION_COLUMNS, rows)
+
+    def execute_mgmt(self, database, query, properties=None):
+        if query.startswith(".show operations"):
+            return self._show_operations(query)
+        return make_v2_response({"OperationId": "guid"}, [[query.split()[-1]]])
+
+    async def execute_mgmt_async(self, database, query, properties=None):
+        return self.execute_mgmt(database, query, properties)
+
+
+class TestOperations(KustoClientTestsMixin):
+    def test_operations_are_polled_together(self):
+        operations = FakeOperations({"a": ["InProgress", "Completed"], "b": ["Completed"], "c": ["InProgress", "Failed"]})
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "execute_mgmt", operations.execute_mgmt):
+            client._operation_poller = _OperationPoller(client, **FAST)
+            handles = [client.execute_mgmt_async_operation("db", ".export async {}".format(operation_id)) for operation_id in "abc"]
+
+            assert handles[0].wait(timeout=5)["State"] == "Completed"
+            assert handles[1].as_future().result(timeout=5)["Status"] == "status of Completed"
+            with pytest.raises(KustoOperationError) as error:
+                handles[2].wait(timeout=5)
+            assert (error.value.operation_id, error.value.state) == ("c", "Failed")
+
+        assert operations.commands[0] == ".show operations (a, b, c)"
+        assert operations.commands[1] == ".show operations (a, c)"
+        assert [handle.state for handle in handles] == ["Completed", "Completed", "Failed"]
+        assert client._operation_poller.in_flight_count() == 0
+
+    def test_transient_errors_are_retried(self):
+        operations = FakeOperations({"a": ["Completed"]}, errors=[KustoNetworkError(self.HOST)])
+        poller = _OperationPoller(operations, **FAST)
+        assert poller.add("db", "a").wait(timeout=5)["State"] == "Completed"
+        assert len(operations.commands) == 2
+
+    def test_permanent_errors_fail_the_operations(self):
+        error = KustoServiceError("Forbidden")
+        poller = _OperationPoller(FakeOperations({"a": ["Completed"]}, errors=[error]), **FAST)
+        assert poller.add("db", "a").as_future().exception(timeout=5) is error
+
+    def test_close_fails_operations_in_flight(self):
+        poller = _OperationPoller(FakeOperations({"a": ["InProgress"]}), **FAST)
+        handle = poller.add("db", "a")
+        poller.close()
+        with pytest.raises(KustoClosedError):
+            handle.wait(timeout=5)
+        with pytest.raises(KustoClosedError):
+            poller.add("db", "b")
+
+    def test_batches_are_split(self):
+        operations = FakeOperations({str(i): ["Completed"] for i in range(5)})
+        poller = _OperationPoller(operations, max_batch_size=2, **FAST)
+        handles = [poller.add("db", str(i)) for i in range(5)]
+        for handle in handles:
+            handle.wait(timeout=5)
+        assert all(len(command.split(",")) <= 2 for command in operations.commands)
+
+    def test_command_without_operation_id(self):
+        with (
+            KustoClient(self.HOST) as client,
+            patch.object(KustoClient, "execute_mgmt", lambda *args, **kwargs: make_v2_response({"Result": "string"}, [["done"]])),
+        ):
+            with pytest.raises(KustoClientError):
+                client.execute_mgmt_async_operation("db", ".set-or-append T <| Events")
+
+    @pytest.mark.asyncio
+    async def test_async_operations(self):
+        operations = FakeOperations({"a": ["InProgress", "Completed"], "b": ["Failed"]})
+        async with AsyncKustoClient(self.HOST) as client:
+            with patch.object(AsyncKustoClient, "execute_mgmt", operations.execute_mgmt_async):
+                client._operation_poller = _AsyncOperationPoller(client, **FAST)
+                first = await client.execute_mgmt_async_operation("db", ".export async a")
+                second = await client.execute_mgmt_async_operation("db", ".export async b")
+
+                assert (await first)["State"] == "Completed"
+                with pytest.raises(KustoOperationError):
+                    await second
+
+                pending = await client.execute_mgmt_async_operation("db", ".export async c")
+        assert operations.commands[0] == ".show operations (a, b)"
+        with pytest.raises(KustoClosedError):
+            await asyncio.wait_for(pending, 5)
@@ -0,0 +1,76 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import pickle
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient, KustoConnectionStringBuilder
+from azure.kusto.data.partitioned_reader import HashPartitionedReader
+from tests.kusto_client_common import KustoClientTestsMixin, make_v2_response
+
+
+class TestHashPartitionedReader(KustoClientTestsMixin):
+    def test_partition_queries(self):
+        reader = HashPartitionedReader(self.HOST, "db", " Events | where Level == 'Error' ", "DeviceId", 3)
+        assert reader.partition_queries() == [
+            "Events | where Level == 'Error'\n| where hash(DeviceId, 3) == 0",
+            "Events | where Level == 'Error'\n| where hash(DeviceId, 3) == 1",
+            "Events | where Level == 'Error'\n| where hash(DeviceId, 3) == 2",
+        ]
+        with pytest.raises(IndexError):
+            reader.partition_query(3)
+
+    def test_read_partition(self):
+        queries = []
+
+        def execute_query(self, database, query, properties=None):
+            queries.append((database, query))
+            return make_v2_response({"DeviceId": "string", "Count": "long"}, [["a", 1], ["b", 2]])
+
+        reader = HashPartitionedReader(
+            KustoConnectionStringBuilder.with_aad_application_key_authentication(self.HOST, "app", "key", "tenant"), "db", "T", "DeviceId", 2
+        )
+        with patch.object(KustoClient, "execute_query", execute_query):
+            frame = reader.read_partition(1)
+
+        assert queries == [("db", "T\n| where hash(DeviceId, 2) == 1")]
+        assert list(frame.columns) == ["DeviceId", "Count"]
+        assert list(frame["Count"]) == [1, 2]
+
+    def test_readers_share_clients_by_identity(self):
+        clients = []
+
+        def execute_query(self, database, query, properties=None):
+            clients.append(self)
+            return make_v2_response({"DeviceId": "string"}, [["a"]])
+
+        first = KustoConnectionStringBuilder.with_aad_managed_service_identity_authentication(self.HOST, client_id="first")
+        second = KustoConnectionStringBuilder.with_aad_managed_service_identity_authentication(self.HOST, client_id="second")
+        with patch.object(KustoClient, "execute_query", execute_query):
+            for kcsb in [first, first, second]:
+                HashPartitionedReader(kcsb, "db", "T", "DeviceId", 2).read_partition(0)
+
+        # Managed identities aren't part of the connection string, but still get clients of their own
+        assert clients[0] is clients[1]
+        assert clients[2] is not clients[0]
+
+    def test_reader_is_picklable(self):
+        kcsb = KustoConnectionStringBuilder.with_aad_application_key_authentication(self.HOST, "app", "key", "tenant")
+        reader = pickle.loads(pickle.dumps(HashPartitionedReader(kcsb, "db", "T", "DeviceId", 4)))
+        assert reader.partitions == 4
+        assert reader.kcsb.data_source == self.HOST
+        assert reader.kcsb.application_key == "key"
+
+    def test_to_dask(self):
+        pytest.importorskip("dask.dataframe")
+
+        def execute_query(self, database, query, properties=None):
+            partition = int(query.rsplit("==", 1)[1])
+            return make_v2_response({"Partition": "long"}, [[partition]])
+
+        reader = HashPartitionedReader(self.HOST, "db", "T", "DeviceId", 3)
+        with patch.object(KustoClient, "execute_query", execute_query):
+            frame = reader.to_dask().compute(scheduler="sync")
+
+        assert sorted(frame["Partition"]) == [0, 1, 2]
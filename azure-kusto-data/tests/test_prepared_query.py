@@ -0,0 +1,91 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from azure.kusto.data import ClientRequestProperties
+from azure.kusto.data.prepared_query import PreparedQuery, kql_parameter_value, kql_type_of, normalize_template, prepare
+
+
+@pytest.mark.parametrize(
+    "value, kql_type, parameter_value",
+    [
+        (True, "bool", "true"),
+        (5, "long", "long(5)"),
+        (1.5, "real", "real(1.5)"),
+        (float("nan"), "real", "real(nan)"),
+        (float("-inf"), "real", "real(-inf)"),
+        (Decimal("1.10"), "decimal", "decimal(1.10)"),
+        ("it's", "string", "it's"),
+        (datetime(2024, 1, 2, 3, 4, 5, 6), "datetime", "datetime(2024-01-02T03:04:05.000006Z)"),
+        (datetime(2024, 1, 2, 5, tzinfo=timezone(timedelta(hours=2))), "datetime", "datetime(2024-01-02T03:00:00.000000Z)"),
+        (date(2024, 1, 2), "datetime", "datetime(2024-01-02T00:00:00.000000Z)"),
+        (timedelta(days=1, hours=2, seconds=3, microseconds=4), "timespan", "timespan(1.02:00:03.000004)"),
+        (-timedelta(minutes=90), "timespan", "timespan(-0.01:30:00.000000)"),
+        (uuid.UUID(int=1), "guid", "guid(00000000-0000-0000-0000-000000000001)"),
+        ({"a": [1, "b"]}, "dynamic", 'dynamic({"a": [1, "b"]})'),
+    ],
+)
+def test_parameter_values(value, kql_type, parameter_value):
+    assert kql_type_of(value) == kql_type
+    assert kql_parameter_value(value, kql_type) == parameter_value
+
+
+def test_unknown_type():
+    with pytest.raises(TypeError):
+        kql_type_of(object())
+
+
+def test_normalize_template():
+    assert normalize_template("  Events  \r\n| where Level == level   \r\n| count;  \n") == "Events\n| where Level == level\n| count"
+
+
+def test_query_text_depends_only_on_the_shape():
+    query = PreparedQuery("Events | where Level == level and Count > minimum")
+    first, first_properties = query.bind({"level": "Error", "minimum": 5})
+    second, second_properties = query.bind({"minimum": 10, "level": "Warning"})
+
+    assert first == second == "declare query_parameters(level:string, minimum:long);\nEvents | where Level == level and Count > minimum"
+    assert first_properties.get_parameter("level", None) == "Error"
+    assert second_properties.get_parameter("minimum", None) == "long(10)"
+    assert query.query_text({"level": "a", "minimum": 1.5}) == (
+        "declare query_parameters(level:string, minimum:real);\nEvents | where Level == level and Count > minimum"
+    )
+
+
+def test_explicit_types():
+    query = PreparedQuery("T | where Id == id", types={"id": "int"})
+    text, properties = query.bind({"id": None})
+    assert text.startswith("declare query_parameters(id:int);")
+    assert properties.get_parameter("id", None) == "int(null)"
+
+    with pytest.raises(TypeError):
+        PreparedQuery("T").bind({"id": None})
+    with pytest.raises(ValueError):
+        PreparedQuery("T").bind({"not a name": 1})
+
+
+def test_bind_keeps_the_properties():
+    properties = ClientRequestProperties()
+    properties.set_option("servertimeout", "1m")
+    _, bound = PreparedQuery("T").bind({"x": 1}, properties)
+    assert bound.get_option("servertimeout", None) == "1m"
+    assert not properties.has_parameter("x")
+
+
+def test_prepare_is_cached():
+    assert prepare("Events | take n") is prepare("Events | take n")
+
+
+def test_execute():
+    calls = []
+
+    class FakeClient:
+        def execute_query(self, database, query, properties=None):
+            calls.append((database, query, properties.get_parameter("n", None)))
+
+    prepare("Events | take n").execute(FakeClient(), "db", {"n": 10})
+    assert calls == [("db", "declare query_parameters(n:long);\nEvents | take n", "long(10)")]
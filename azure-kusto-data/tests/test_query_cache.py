@@ -0,0 +1,154 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+import os
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from azure.kusto.data import ClientRequestProperties, KustoClient, KustoConnectionStringBuilder
+from azure.kusto.data.query_cache import QueryResultCache, cache_identity, normalize_query
+from azure.kusto.data.response import KustoResponseDataSetV2
+from tests.kusto_client_common import FakeClock, KustoClientTestsMixin, make_v2_response, mocked_requests_post
+
+
+def _load_response() -> KustoResponseDataSetV2:
+    with open(os.path.join(os.path.dirname(__file__), "input", "deft.json"), "r") as f:
+        return KustoResponseDataSetV2(json.loads(f.read()))
+
+
+def test_normalize_query():
+    assert normalize_query("  T \n|   take 10 ") == "T | take 10"
+    assert normalize_query("T | where a == 'x   y'") == "T | where a == 'x   y'"
+    assert normalize_query('T | where a == "it\\"s   here"  |  count') == 'T | where a == "it\\"s   here" | count'
+    assert normalize_query('T | where a == @"c:\\"   |  count') == 'T | where a == @"c:\\" | count'
+
+
+def test_normalize_query_keeps_comments_and_multiline_strings():
+    # A comment ends at the line break, so the pipe after it is only part of the query when it is on the next line
+    assert normalize_query("T  // c  \n  | take 1") == "T // c\n| take 1"
+    assert normalize_query("T // c | take 1") == "T // c | take 1"
+    assert normalize_query("T // c\n| take 1") != normalize_query("T // c | take 1")
+    assert normalize_query("T | where a == 'x // y'   | count // done\n") == "T | where a == 'x // y' | count // done"
+    assert normalize_query("print ```a  //\n  b```  |  count") == "print ```a  //\n  b``` | count"
+
+
+def test_key_is_scoped_to_the_identity():
+    first = cache_identity(KustoConnectionStringBuilder.with_aad_managed_service_identity_authentication("https://c.kusto.windows.net", client_id="a"))
+    same = cache_identity(KustoConnectionStringBuilder.with_aad_managed_service_identity_authentication("https://c.kusto.windows.net/db", client_id="a"))
+    other = cache_identity(KustoConnectionStringBuilder.with_aad_managed_service_identity_authentication("https://c.kusto.windows.net", client_id="b"))
+    assert first == same
+    assert first != other
+    credential = MagicMock()
+    assert cache_identity(KustoConnectionStringBuilder.with_azure_token_credential("https://c.kusto.windows.net", credential)) == cache_identity(
+        KustoConnectionStringBuilder.with_azure_token_credential("https://c.kusto.windows.net", credential)
+    )
+    assert cache_identity(KustoConnectionStringBuilder.with_azure_token_credential("https://c.kusto.windows.net", credential)) != cache_identity(
+        KustoConnectionStringBuilder.with_azure_token_credential("https://c.kusto.windows.net", MagicMock())
+    )
+    assert QueryResultCache.make_key("cluster", "db", "T", None, first) != QueryResultCache.make_key("cluster", "db", "T", None, other)
+
+
+def test_key_ignores_request_id_and_timeout():
+    first = ClientRequestProperties()
+    first.client_request_id = "first"
+    first.set_option(ClientRequestProperties.request_timeout_option_name, timedelta(minutes=1))
+    first.set_parameter("x", "1")
+    second = ClientRequestProperties()
+    second.client_request_id = "second"
+    second.set_parameter("x", "1")
+
+    assert QueryResultCache.make_key("cluster", "db", "T |  take 1", first) == QueryResultCache.make_key("cluster", "db", "T | take 1", second)
+
+    second.set_parameter("x", "2")
+    assert QueryResultCache.make_key("cluster", "db", "T | take 1", first) != QueryResultCache.make_key("cluster", "db", "T | take 1", second)
+
+
+def test_ttl_expiration():
+    clock = FakeClock(0.0)
+    cache = QueryResultCache(ttl=timedelta(seconds=10), time_provider=clock)
+    response = _load_response()
+
+    cache.put("a", response)
+    cache.put("b", response, ttl=timedelta(seconds=60))
+    clock.now = 5
+    assert cache.get("a") is response
+
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.get("b") is response
+
+    statistics = cache.statistics
+    assert (statistics.hits, statistics.misses, statistics.expirations, statistics.entries_count) == (2, 1, 1, 1)
+
+
+def test_lru_eviction_by_size():
+    response = _load_response()
+    cache = QueryResultCache()
+    cache.put("probe", response)
+    entry_size = cache.statistics.size_bytes
+
+    cache = QueryResultCache(max_size_bytes=entry_size * 2)
+    cache.put("a", response)
+    cache.put("b", response)
+    # Touch "a", so that "b" becomes the least recently used
+    assert cache.get("a") is response
+    cache.put("c", response)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is response
+    assert cache.get("c") is response
+    assert cache.statistics.evictions == 1
+    assert cache.statistics.size_bytes == entry_size * 2
+
+
+def test_result_larger_than_cache_is_not_cached():
+    cache = QueryResultCache(max_size_bytes=10)
+    cache.put("a", _load_response())
+    assert len(cache) == 0
+
+
+class TestKustoClientQueryCache(KustoClientTestsMixin):
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_repeated_query_is_served_from_cache(self, mock_post):
+        cache = QueryResultCache()
+        with KustoClient(self.HOST) as client:
+            client.set_query_cache(cache)
+            first = client.execute_query("PythonTest", "Deft")
+            second = client.execute_query("PythonTest", "  Deft ")
+            self._assert_sanity_query_response(second)
+
+            assert first is second
+            assert mock_post.call_count == 1
+            assert cache.statistics.hits == 1
+
+            client.execute_query("OtherDatabase", "Deft")
+            assert mock_post.call_count == 2
+
+            client.set_query_cache(None)
+            client.execute_query("PythonTest", "Deft")
+            assert mock_post.call_count == 3
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_mgmt_is_not_cached(self, mock_post):
+        with KustoClient(self.HOST) as client:
+            client.set_query_cache(QueryResultCache())
+            client.execute_mgmt("NetDefaultDB", ".show version")
+            client.execute_mgmt("NetDefaultDB", ".show version")
+            assert mock_post.call_count == 2
+
+    def test_clients_only_share_results_of_the_same_identity(self):
+        requests = []
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            requests.append(client)
+            return make_v2_response({"x": "int"}, [[1]])
+
+        cache = QueryResultCache()
+        with patch.object(KustoClient, "_execute_once", execute_once):
+            for token in ["first", "second", "first"]:
+                with KustoClient(KustoConnectionStringBuilder.with_aad_user_token_authentication(self.HOST, token)) as client:
+                    client.set_query_cache(cache)
+                    client.execute_query("PythonTest", "Deft")
+
+        assert len(requests) == 2
+        assert cache.statistics.hits == 1
@@ -0,0 +1,165 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import threading
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from azure.kusto.data import KustoClient, KustoConnectionStringBuilder
+from azure.kusto.data.aio.client import KustoClient as AsyncKustoClient
+from azure.kusto.data.aio.registry import AsyncKustoClientRegistry
+from azure.kusto.data.exceptions import KustoClientError, KustoClosedError
+from azure.kusto.data.registry import KustoClientRegistry, client_key
+from tests.kusto_client_common import FakeClock, KustoClientTestsMixin, make_v2_response
+
+
+class TestClientRegistry(KustoClientTestsMixin):
+    def test_client_key(self):
+        credential = MagicMock()
+        first = KustoConnectionStringBuilder.with_azure_token_credential(self.HOST, credential)
+        second = KustoConnectionStringBuilder.with_azure_token_credential(self.HOST, credential)
+        second.initial_catalog = "other"
+        assert client_key(first) == client_key(second)
+        assert client_key(first) != client_key(KustoConnectionStringBuilder.with_azure_token_credential(self.HOST, MagicMock()))
+        assert client_key(first) != client_key(KustoConnectionStringBuilder.with_aad_application_key_authentication(self.HOST, "app", "key", "tenant"))
+        assert client_key(KustoConnectionStringBuilder(self.HOST)) != client_key(KustoConnectionStringBuilder("https://other.kusto.windows.net"))
+
+    def test_clients_are_shared_and_reference_counted(self):
+        clock = FakeClock()
+        with KustoClientRegistry(idle_timeout=timedelta(seconds=60), time_provider=clock) as registry:
+            first = registry.acquire(self.HOST + ";Initial Catalog=db1")
+            second = registry.acquire(KustoConnectionStringBuilder(self.HOST + ";Initial Catalog=db2"))
+            other = registry.acquire("https://other.kusto.windows.net")
+            assert first.client is second.client
+            assert other.client is not first.client
+            assert len(registry) == 2
+
+            shared = first.client
+            first.close()
+            first.close()
+            with pytest.raises(KustoClosedError):
+                first.execute_query("db", "T")
+            second.close()
+            # Idle clients stay open for the idle timeout
+            assert not shared._is_closed
+            third = registry.acquire(self.HOST)
+            assert third.client is shared
+            third.close()
+
+            clock.now += 60
+            other.close()
+            assert shared._is_closed
+            assert len(registry) == 1
+            assert registry.acquire(self.HOST).client is not shared
+
+        assert len(registry) == 0
+
+    def test_handles_default_to_their_database(self):
+        databases = []
+
+        def execute_query(client, database, query, properties=None):
+            databases.append(database)
+            return make_v2_response({"x": "int"}, [[1]])
+
+        with KustoClientRegistry() as registry, patch.object(KustoClient, "execute_query", execute_query):
+            with registry.acquire(self.HOST + ";Initial Catalog=db1") as first, registry.acquire(self.HOST + ";Initial Catalog=db2") as second:
+                first.execute_query(None, "T")
+                second.execute_query(database=None, query="T")
+                second.execute_query("explicit", "T")
+                assert first._kusto_cluster == first.client._kusto_cluster
+
+        assert databases == ["db1", "db2", "explicit"]
+
+    def test_settings_apply_to_the_shared_client(self):
+        with KustoClientRegistry() as registry:
+            first = registry.acquire(self.HOST)
+            second = registry.acquire(self.HOST)
+            first.set_request_coalescing(True)
+            assert second.client._request_coalescer is not None
+
+    def test_registry_without_idle_timeout_keeps_clients(self):
+        clock = FakeClock()
+        registry = KustoClientRegistry(idle_timeout=None, time_provider=clock)
+        handle = registry.acquire(self.HOST)
+        client = handle.client
+        handle.close()
+        clock.now += 10**6
+        assert registry.acquire(self.HOST).client is client
+        registry.close()
+        assert client._is_closed
+
+    def test_idle_clients_are_closed_by_a_timer(self):
+        with KustoClientRegistry(idle_timeout=timedelta(milliseconds=50)) as registry:
+            handle = registry.acquire(self.HOST)
+            client = handle.client
+            handle.close()
+            assert not client._is_closed
+            closed = threading.Event()
+            for _ in range(100):
+                if client._is_closed:
+                    break
+                closed.wait(0.01)
+            assert client._is_closed
+            assert len(registry) == 0
+
+    def test_handles_reject_proxies(self):
+        with KustoClientRegistry() as registry, registry.acquire(self.HOST) as handle:
+            with pytest.raises(KustoClientError):
+                handle.set_proxy("https://my-proxy.com")
+            assert handle.client._proxy_url is None
+
+    @pytest.mark.asyncio
+    async def test_aio_registry(self):
+        async with AsyncKustoClientRegistry(idle_timeout=timedelta(0)) as registry:
+            first = await registry.acquire(self.HOST)
+            async with await registry.acquire(self.HOST) as second:
+                assert isinstance(second.client, AsyncKustoClient)
+                assert second.client is first.client
+            shared = first.client
+            await first.close()
+            assert shared._is_closed
+            assert len(registry) == 0
+
+    def test_aio_clients_are_only_closed_on_their_loop(self):
+        clock = FakeClock()
+        registry = AsyncKustoClientRegistry(idle_timeout=timedelta(seconds=60), time_provider=clock)
+
+        async def acquire_and_release(cluster: str):
+            with patch.object(registry, "_schedule_sweep"):
+                handle = await registry.acquire(cluster)
+                await handle.close()
+            return handle._entry.client
+
+        loop = asyncio.new_event_loop()
+        try:
+            client = loop.run_until_complete(acquire_and_release(self.HOST))
+            clock.now += 60
+            # Another loop closes its own expired clients, but not the first loop's one
+            other_client = asyncio.run(acquire_and_release("https://other.kusto.windows.net"))
+            assert not client._is_closed
+            assert not other_client._is_closed
+            assert len(registry) == 2
+            assert loop.run_until_complete(acquire_and_release(self.HOST)) is not client
+            assert client._is_closed
+        finally:
+            loop.close()
+        # The clients of closed loops can't be closed anymore, so they are dropped
+        clock.now += 60
+        asyncio.run(acquire_and_release(self.HOST))
+        assert len(registry) == 1
+
+    @pytest.mark.asyncio
+    async def test_aio_idle_clients_are_closed_by_a_timer(self):
+        async with AsyncKustoClientRegistry(idle_timeout=timedelta(milliseconds=50)) as registry:
+            handle = await registry.acquire(self.HOST)
+            client = handle.client
+            await handle.close()
+            assert not client._is_closed
+            for _ in range(100):
+                if client._is_closed:
+                    break
+                await asyncio.sleep(0.01)
+            assert client._is_closed
+            assert len(registry) == 0
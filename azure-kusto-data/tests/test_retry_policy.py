@@ -0,0 +1,239 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+from io import BytesIO
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from azure.kusto.data import ClientRequestProperties, KustoClient
+from azure.kusto.data.aio.client import KustoClient as AsyncKustoClient
+from azure.kusto.data.exceptions import KustoApiError, KustoNetworkError, KustoServiceError, KustoThrottlingError
+from azure.kusto.data.retry import RetryPolicy, _is_transient_error
+from tests.kusto_client_common import KustoClientTestsMixin, make_v2_response
+
+
+def throttled(retry_after=None) -> KustoThrottlingError:
+    response = MagicMock()
+    response.headers = {} if retry_after is None else {"Retry-After": retry_after}
+    return KustoThrottlingError("throttled", response)
+
+
+def api_error(permanent) -> KustoApiError:
+    return KustoApiError({"error": {"code": "E", "message": "m", "@type": "t", "@message": "failed", "@permanent": permanent}})
+
+
+def test_retry_after_header():
+    assert throttled("7").get_retry_after() == 7
+    assert throttled().get_retry_after() is None
+    assert throttled("soon").get_retry_after() is None
+    assert KustoThrottlingError("throttled").get_retry_after() is None
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < throttled(format_datetime(retry_at, usegmt=True)).get_retry_after() <= 30
+
+
+def test_errors_are_classified():
+    policy = RetryPolicy()
+    assert policy.is_retryable(throttled(), is_query=False)
+    assert policy.is_retryable(api_error(False), is_query=False)
+    assert not policy.is_retryable(api_error(True), is_query=True)
+    # Unknown permanence isn't retried
+    assert not policy.is_retryable(api_error(None), is_query=True)
+    assert policy.is_retryable(KustoNetworkError("endpoint"), is_query=True)
+    assert not policy.is_retryable(KustoNetworkError("endpoint"), is_query=False)
+    assert not policy.is_retryable(KustoServiceError("failed"), is_query=True)
+    # Requests that are idempotent regardless of their endpoint, e.g. the queries of bulk execution, retry network errors as well
+    assert _is_transient_error(KustoNetworkError("endpoint"))
+    assert not _is_transient_error(KustoNetworkError("endpoint"), is_idempotent=False)
+
+
+def test_delay_honours_retry_after():
+    policy = RetryPolicy(base_delay=timedelta(seconds=1), max_delay=timedelta(seconds=5))
+    assert 10 <= policy.get_delay(0, throttled("10")) <= 11
+    for retry in range(10):
+        assert 0 <= policy.get_delay(retry, throttled()) <= min(5, 2**retry)
+
+
+class TestRetryPolicy(KustoClientTestsMixin):
+    def test_throttled_query_is_retried(self):
+        errors = [throttled("2"), api_error(False)]
+        timeouts = []
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            timeouts.append(request.timeout)
+            if errors:
+                raise errors.pop(0)
+            return make_v2_response({"x": "int"}, [[1]])
+
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_execute_once", execute_once), patch("time.sleep") as sleep:
+            client.set_retry_policy(RetryPolicy(deadline=timedelta(minutes=5)))
+            response = client.execute_query("db", "T")
+
+        assert response.primary_results[0][0]["x"] == 1
+        assert len(timeouts) == 3
+        assert 2 <= sleep.call_args_list[0][0][0] <= 3
+
+    def test_permanent_errors_and_mgmt_network_errors_are_not_retried(self):
+        errors = [api_error(True), KustoNetworkError("mgmt")]
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            raise errors.pop(0)
+
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_execute_once", execute_once), patch("time.sleep") as sleep:
+            client.set_retry_policy(RetryPolicy())
+            with pytest.raises(KustoApiError):
+                client.execute_query("db", "T")
+            with pytest.raises(KustoNetworkError):
+                client.execute_mgmt("db", ".show tables")
+
+        assert not errors
+        sleep.assert_not_called()
+
+    def test_retries_stop_at_the_deadline(self):
+        attempts = []
+        now = [1000.0]
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            attempts.append(request.timeout)
+            raise throttled("20")
+
+        def sleep(delay):
+            now[0] += delay
+
+        with (
+            KustoClient(self.HOST) as client,
+            patch.object(KustoClient, "_execute_once", execute_once),
+            patch("time.sleep", sleep),
+            patch("azure.kusto.data.retry.time.monotonic", lambda: now[0]),
+        ):
+            client.set_retry_policy(RetryPolicy(max_retries=10, deadline=timedelta(seconds=30)))
+            with pytest.raises(KustoThrottlingError):
+                client.execute_query("db", "T")
+
+        # A third attempt would have to wait past the deadline
+        assert len(attempts) == 2
+        assert attempts[0] == timedelta(seconds=30)
+        assert attempts[1] < timedelta(seconds=10)
+
+    def test_attempt_timeout_is_cut_to_the_time_left(self):
+        timeouts = []
+        now = [1000.0]
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            timeouts.append(request.timeout)
+            if len(timeouts) == 1:
+                now[0] += 50
+                raise throttled("1")
+            return make_v2_response({"x": "int"}, [[1]])
+
+        with (
+            KustoClient(self.HOST) as client,
+            patch.object(KustoClient, "_execute_once", execute_once),
+            patch("time.sleep"),
+            patch("azure.kusto.data.retry.time.monotonic", lambda: now[0]),
+        ):
+            client.set_retry_policy(RetryPolicy(deadline=timedelta(seconds=60)))
+            client.execute_query("db", "T")
+
+        assert timeouts[0] == timedelta(seconds=60)
+        assert timeouts[1] == timedelta(seconds=10)
+
+    def test_retries_have_new_request_ids_and_capped_server_timeouts(self):
+        attempts = []
+        now = [1000.0]
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            attempts.append((request.request_headers["x-ms-client-request-id"], json.loads(request.json_payload.get("properties", "{}")).get("Options", {})))
+            if len(attempts) < 3:
+                now[0] += 20
+                raise throttled("1")
+            return make_v2_response({"x": "int"}, [[1]])
+
+        with (
+            KustoClient(self.HOST) as client,
+            patch.object(KustoClient, "_execute_once", execute_once),
+            patch("time.sleep"),
+            patch("azure.kusto.data.retry.time.monotonic", lambda: now[0]),
+        ):
+            client.set_retry_policy(RetryPolicy(deadline=timedelta(seconds=60)))
+            client.execute_query("db", "T")
+            properties = ClientRequestProperties()
+            properties.client_request_id = "my-request"
+            properties.set_option(ClientRequestProperties.request_timeout_option_name, timedelta(minutes=2))
+            attempts.clear()
+            client.execute_query("db", "T", properties)
+
+        ids = [request_id for request_id, _ in attempts]
+        assert ids == ["my-request", "my-request;retry1", "my-request;retry2"]
+        # The service's timeout is cut to the time left before the deadline, keeping its margin from the client's timeout
+        assert [options.get("servertimeout") for _, options in attempts] == ["0:00:30", "0:00:10", "0:00:01"]
+
+    def test_generated_request_ids_are_not_reused(self):
+        ids = []
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            ids.append(request.request_headers["x-ms-client-request-id"])
+            if len(ids) == 1:
+                raise throttled("1")
+            return make_v2_response({"x": "int"}, [[1]])
+
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_execute_once", execute_once), patch("time.sleep"):
+            client.set_retry_policy(RetryPolicy())
+            client.execute_query("db", "T")
+
+        assert len(set(ids)) == 2
+        assert all(request_id.startswith("KPC.execute;") for request_id in ids)
+
+    def test_streaming_query_cancels_its_last_attempt(self):
+        ids = []
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            ids.append(request.request_headers["x-ms-client-request-id"])
+            if len(ids) == 1:
+                raise throttled("1")
+            return MagicMock(raw=BytesIO(b"[{}"))
+
+        properties = ClientRequestProperties()
+        properties.client_request_id = "my-request"
+        with (
+            KustoClient(self.HOST) as client,
+            patch.object(KustoClient, "_execute_once", execute_once),
+            patch.object(KustoClient, "execute_mgmt") as execute_mgmt,
+            patch("time.sleep"),
+        ):
+            client.set_retry_policy(RetryPolicy())
+            client.execute_streaming_query("db", "T", properties=properties).close()
+
+        assert ids == ["my-request", "my-request;retry1"]
+        execute_mgmt.assert_called_once_with("db", '.cancel query "my-request;retry1"')
+
+    def test_without_a_policy_nothing_is_retried(self):
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            raise throttled("1")
+
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_execute_once", execute_once):
+            with pytest.raises(KustoThrottlingError):
+                client.execute_query("db", "T")
+
+    @pytest.mark.asyncio
+    async def test_aio_client_retries(self):
+        errors = [throttled("1")]
+
+        async def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            if errors:
+                raise errors.pop(0)
+            return make_v2_response({"x": "int"}, [[1]])
+
+        async def sleep(delay):
+            sleeps.append(delay)
+
+        sleeps = []
+        async with AsyncKustoClient(self.HOST) as client:
+            with patch.object(AsyncKustoClient, "_execute_once", execute_once), patch("asyncio.sleep", sleep):
+                client.set_retry_policy(RetryPolicy())
+                response = await client.execute_mgmt("db", ".show tables")
+
+        assert response.primary_results[0][0]["x"] == 1
+        assert len(sleeps) == 1 and 1 <= sleeps[0] <= 2
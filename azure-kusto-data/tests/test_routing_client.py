@@ -0,0 +1,107 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient
+from azure.kusto.data.exceptions import KustoNetworkError, KustoServiceError
+from azure.kusto.data.routing_client import RoutingKustoClient
+from tests.kusto_client_common import make_v2_response
+
+LEADER = "https://leader.kusto.windows.net/"
+FOLLOWER1 = "https://follower1.kusto.windows.net/"
+FOLLOWER2 = "https://follower2.kusto.windows.net/"
+
+
+class FakeClusters:
+    """Answers the queries of every cluster after its latency, on a fake clock, or fails them with the cluster's error."""
+
+    def __init__(self, latencies):
+        self.now = 0.0
+        self.latencies = latencies
+        self.errors = {}
+        self.calls = []
+
+    def time(self):
+        return self.now
+
+    def execute_query(self, client, database, query, properties=None):
+        cluster = client._kusto_cluster
+        self.calls.append(cluster)
+        self.now += self.latencies[cluster]
+        if cluster in self.errors:
+            raise self.errors[cluster]
+        return make_v2_response({"Cluster": "string"}, [[cluster]])
+
+    def execute_mgmt(self, client, database, query, properties=None):
+        self.calls.append(client._kusto_cluster)
+        return make_v2_response({"Cluster": "string"}, [[client._kusto_cluster]])
+
+
+@pytest.fixture
+def clusters():
+    fake = FakeClusters({LEADER: 1.0, FOLLOWER1: 0.5, FOLLOWER2: 0.1})
+    with (
+        patch.object(KustoClient, "execute_query", lambda *args, **kwargs: fake.execute_query(*args, **kwargs)),
+        patch.object(KustoClient, "execute_mgmt", lambda *args, **kwargs: fake.execute_mgmt(*args, **kwargs)),
+    ):
+        yield fake
+
+
+def make_client(clusters, **kwargs):
+    return RoutingKustoClient(KustoClient(LEADER), [KustoClient(FOLLOWER1), KustoClient(FOLLOWER2)], time_provider=clusters.time, **kwargs)
+
+
+def test_queries_go_to_the_fastest_replica(clusters):
+    with make_client(clusters) as client:
+        # Every replica is measured before they are ranked by latency
+        for _ in range(3):
+            client.execute_query("db", "T")
+        assert sorted(clusters.calls) == sorted([LEADER, FOLLOWER1, FOLLOWER2])
+
+        assert client.get_ranked_replicas() == [FOLLOWER2, FOLLOWER1, LEADER]
+        assert client.execute("db", "T").primary_results[0][0]["Cluster"] == FOLLOWER2
+
+
+def test_mgmt_commands_go_to_the_leader(clusters):
+    with make_client(clusters) as client:
+        client.execute_mgmt("db", ".show tables")
+        client.execute("db", ".show tables")
+    assert clusters.calls == [LEADER, LEADER]
+
+
+def test_failing_replicas_are_demoted(clusters):
+    with make_client(clusters) as client:
+        for _ in range(3):
+            client.execute_query("db", "T")
+        clusters.errors[FOLLOWER2] = KustoNetworkError(FOLLOWER2)
+        clusters.calls.clear()
+
+        # Fails over to the next replica
+        assert client.execute_query("db", "T").primary_results[0][0]["Cluster"] == FOLLOWER1
+        assert clusters.calls == [FOLLOWER2, FOLLOWER1]
+        assert client.get_ranked_replicas() == [FOLLOWER1, LEADER, FOLLOWER2]
+
+        # Recovers once its failures age out of the moving average
+        del clusters.errors[FOLLOWER2]
+        clusters.now += 60
+        client.get_ranked_replicas()
+        assert client._replicas[FOLLOWER2].get_rank() == 1
+
+
+def test_query_errors_are_not_retried(clusters):
+    with make_client(clusters, read_from_leader=False) as client:
+        clusters.errors[FOLLOWER1] = clusters.errors[FOLLOWER2] = KustoServiceError("Semantic error")
+        with pytest.raises(KustoServiceError):
+            client.execute_query("db", "T")
+    assert len(clusters.calls) == 1
+
+
+def test_all_replicas_failing(clusters):
+    with make_client(clusters) as client:
+        for cluster in (LEADER, FOLLOWER1, FOLLOWER2):
+            clusters.errors[cluster] = KustoNetworkError(cluster)
+        with pytest.raises(KustoNetworkError):
+            client.execute_query("db", "T")
+    assert len(clusters.calls) == 3
@@ -0,0 +1,223 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import functools
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient
+from azure.kusto.data.admission import AdmissionController, _execute_admitted
+from azure.kusto.data.aio.client import KustoClient as AsyncKustoClient
+from azure.kusto.data.exceptions import KustoCircuitOpenError, KustoThrottlingError
+from azure.kusto.data.scheduler import (
+    BATCH_LANE,
+    INTERACTIVE_LANE,
+    RequestScheduler,
+    _execute_scheduled,
+    _execute_scheduled_async,
+    get_request_lane,
+    request_lane,
+)
+from tests.kusto_client_common import KustoClientTestsMixin, make_v2_response
+
+
+def _raise(error: Exception):
+    raise error
+
+
+def wait_until(condition, timeout: float = 5):
+    event = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        event.wait(0.01)
+    raise AssertionError("Timed out")
+
+
+def test_request_lane_context():
+    assert get_request_lane() is None
+    with request_lane(BATCH_LANE):
+        assert get_request_lane() == BATCH_LANE
+        with request_lane(INTERACTIVE_LANE):
+            assert get_request_lane() == INTERACTIVE_LANE
+        assert get_request_lane() == BATCH_LANE
+    assert get_request_lane() is None
+
+
+def test_lanes_are_validated():
+    scheduler = RequestScheduler(max_concurrency=10)
+    assert scheduler.lanes == [INTERACTIVE_LANE, BATCH_LANE]
+    assert scheduler.get_stats()[BATCH_LANE].max_concurrency == 5
+    with pytest.raises(ValueError):
+        RequestScheduler({"a": 1}, default_lane="b")
+    with request_lane("unknown"), pytest.raises(ValueError):
+        _execute_scheduled(scheduler, lambda: None)
+
+
+def test_max_concurrency_defaults_to_the_pool_size():
+    assert RequestScheduler().max_concurrency == KustoClient._max_pool_size
+
+
+@pytest.mark.parametrize("handed_over", [False, True])
+def test_interrupted_wait_frees_the_slot(handed_over: bool):
+    scheduler = RequestScheduler(max_concurrency=1)
+    lane = scheduler._acquire()
+
+    def interrupt(event, timeout=None):
+        if handed_over:
+            scheduler._release_slot(lane)
+        raise KeyboardInterrupt()
+
+    with patch.object(threading.Event, "wait", interrupt), pytest.raises(KeyboardInterrupt):
+        scheduler._acquire()
+
+    if not handed_over:
+        scheduler._release_slot(lane)
+    assert scheduler.in_flight == 0
+    assert scheduler.get_stats()[INTERACTIVE_LANE].queued == 0
+    assert _execute_scheduled(scheduler, lambda: "free") == "free"
+
+
+def test_interactive_requests_are_not_queued_behind_batch_requests():
+    scheduler = RequestScheduler({INTERACTIVE_LANE: None, BATCH_LANE: None}, max_concurrency=2)
+    release = {name: threading.Event() for name in ["batch0", "batch1", "batch2", "batch3", "interactive"]}
+    started = []
+
+    def run(lane: str, name: str):
+        def send():
+            started.append(name)
+            release[name].wait(5)
+
+        with request_lane(lane):
+            _execute_scheduled(scheduler, send)
+
+    threads = [threading.Thread(target=run, args=(BATCH_LANE, name)) for name in ["batch0", "batch1", "batch2", "batch3"]]
+    for thread in threads[:2]:
+        thread.start()
+    wait_until(lambda: len(started) == 2)
+    started.sort()
+    for thread in threads[2:]:
+        thread.start()
+    wait_until(lambda: scheduler.get_stats()[BATCH_LANE].queued == 2)
+    threads.append(threading.Thread(target=run, args=(INTERACTIVE_LANE, "interactive")))
+    threads[-1].start()
+    wait_until(lambda: scheduler.get_stats()[INTERACTIVE_LANE].queued == 1)
+
+    # The freed slot goes to the interactive request, even though the batch requests were queued first
+    release["batch0"].set()
+    wait_until(lambda: "interactive" in started)
+    assert started == ["batch0", "batch1", "interactive"]
+    for event in release.values():
+        event.set()
+    for thread in threads:
+        thread.join(5)
+
+    stats = scheduler.get_stats()
+    assert stats[BATCH_LANE].started == 4 and stats[INTERACTIVE_LANE].started == 1
+    assert stats[INTERACTIVE_LANE].max_queue_time > 0
+    assert scheduler.in_flight == 0
+
+
+def test_lane_cap_keeps_slots_for_higher_lanes():
+    scheduler = RequestScheduler({INTERACTIVE_LANE: None, BATCH_LANE: 1}, max_concurrency=2)
+    release = threading.Event()
+
+    def run_batch(send):
+        with request_lane(BATCH_LANE):
+            _execute_scheduled(scheduler, send)
+
+    batch = threading.Thread(target=run_batch, args=(lambda: release.wait(5),))
+    batch.start()
+    wait_until(lambda: scheduler.in_flight == 1)
+
+    # The interactive lane still has a slot
+    assert _execute_scheduled(scheduler, lambda: "interactive") == "interactive"
+    queued = threading.Thread(target=run_batch, args=(lambda: None,))
+    queued.start()
+    wait_until(lambda: scheduler.get_stats()[BATCH_LANE].queued == 1)
+    release.set()
+    batch.join(5)
+    queued.join(5)
+    assert scheduler.get_stats()[BATCH_LANE].started == 2
+
+
+@pytest.mark.asyncio
+async def test_aio_scheduling_and_cancellation():
+    scheduler = RequestScheduler({INTERACTIVE_LANE: None, BATCH_LANE: None}, max_concurrency=1)
+    release = asyncio.Event()
+    order = []
+
+    async def send(name: str):
+        order.append(name)
+        await release.wait()
+
+    async def run(lane: str, name: str):
+        with request_lane(lane):
+            await _execute_scheduled_async(scheduler, lambda: send(name))
+
+    first = asyncio.ensure_future(run(BATCH_LANE, "first"))
+    await asyncio.sleep(0.01)
+    batch = asyncio.ensure_future(run(BATCH_LANE, "batch"))
+    cancelled = asyncio.ensure_future(run(INTERACTIVE_LANE, "cancelled"))
+    interactive = asyncio.ensure_future(run(INTERACTIVE_LANE, "interactive"))
+    await asyncio.sleep(0.01)
+    cancelled.cancel()
+    release.set()
+    await asyncio.gather(first, batch, interactive)
+
+    assert order == ["first", "interactive", "batch"]
+    assert scheduler.in_flight == 0
+    assert scheduler.get_stats()[INTERACTIVE_LANE].queued == 0
+
+
+class TestRequestScheduler(KustoClientTestsMixin):
+    def test_client_requests_run_in_the_current_lane(self):
+        scheduler = RequestScheduler()
+        lanes = []
+
+        def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            lanes.append({name: stats.in_flight for name, stats in scheduler.get_stats().items()})
+            return make_v2_response({"x": "int"}, [[1]])
+
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "_execute_once", execute_once):
+            client.set_request_scheduler(scheduler)
+            client.execute_query("db", "T")
+            with request_lane(BATCH_LANE):
+                client.execute_mgmt("db", ".show tables")
+                # The requests of execute_many run on other threads, in the caller's lane
+                list(client.execute_many(["T"]))
+
+        assert lanes == [{INTERACTIVE_LANE: 1, BATCH_LANE: 0}] + [{INTERACTIVE_LANE: 0, BATCH_LANE: 1}] * 2
+        assert scheduler.in_flight == 0
+
+    def test_requests_are_admitted_before_they_are_scheduled(self):
+        scheduler = RequestScheduler()
+        controller = AdmissionController(failure_threshold=1)
+        with pytest.raises(KustoThrottlingError):
+            _execute_admitted(controller, functools.partial(_raise, KustoThrottlingError("throttled")))
+
+        with KustoClient(self.HOST) as client:
+            client.set_request_scheduler(scheduler)
+            client.set_admission_controller(controller)
+            with pytest.raises(KustoCircuitOpenError):
+                client.execute_query("db", "T")
+
+        # The rejected request never took a slot
+        assert scheduler.get_stats()[INTERACTIVE_LANE].started == 0
+
+    @pytest.mark.asyncio
+    async def test_aio_client_requests_are_scheduled(self):
+        scheduler = RequestScheduler()
+
+        async def execute_once(client, endpoint, request, properties=None, stream_response=False):
+            assert scheduler.get_stats()[BATCH_LANE].in_flight == 1
+            return make_v2_response({"x": "int"}, [[1]])
+
+        async with AsyncKustoClient(self.HOST) as client:
+            with patch.object(AsyncKustoClient, "_execute_once", execute_once):
+                client.set_request_scheduler(scheduler)
+                with request_lane(BATCH_LANE):
+                    await client.execute_query("db", "T")
+        assert scheduler.get_stats()[BATCH_LANE].started == 1
@@ -0,0 +1,146 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+import multiprocessing
+import os
+import pickle
+
+import pytest
+
+from azure.kusto.data._models import KustoResultTable
+from azure.kusto.data.response import KustoResponseDataSetV1, KustoResponseDataSetV2
+from azure.kusto.data.shared_result import SharedResult, SharedResultHandle, SharedResultTable
+
+from .kusto_client_common import make_v2_response
+
+
+def _load_response(file_name: str):
+    with open(os.path.join(os.path.dirname(__file__), "input", file_name), "r") as f:
+        return json.loads(f.read())
+
+
+def test_pickle_without_sharing_keeps_table():
+    response = KustoResponseDataSetV2(_load_response("deft.json"))
+    table = response.primary_results[0]
+    # Materialize the rows, they should not be pickled
+    assert len(table.rows) == 11
+
+    restored = pickle.loads(pickle.dumps(table))
+    assert restored.table_name == table.table_name
+    assert restored.table_kind == table.table_kind
+    assert restored.kusto_result_rows is None
+    assert [r.to_list() for r in restored] == [r.to_list() for r in table]
+
+
+def test_pickle_without_sharing_keeps_data_set():
+    response = KustoResponseDataSetV1(_load_response("adminthenquery.json"))
+
+    restored = pickle.loads(pickle.dumps(response))
+    assert type(restored) is KustoResponseDataSetV1
+    assert restored.tables_names == response.tables_names
+    assert [t.table_kind for t in restored] == [t.table_kind for t in response]
+    assert restored.errors_count == response.errors_count
+
+
+def test_shared_table_pickles_as_handle():
+    response = KustoResponseDataSetV2(_load_response("deft.json"))
+    table = response.primary_results[0]
+    unshared_size = len(pickle.dumps(table))
+
+    with SharedResult(table) as shared:
+        assert isinstance(shared.handle, SharedResultHandle)
+        pickled = pickle.dumps(table)
+        assert len(pickled) < unshared_size
+
+        restored = pickle.loads(pickled)
+        assert [r.to_list() for r in restored] == [r.to_list() for r in table]
+
+    assert table._shared_handle is None
+    assert len(pickle.dumps(table)) == unshared_size
+    # The opened copy doesn't depend on the owner's segment to be pickled again
+    repickled = pickle.loads(pickle.dumps(restored))
+    assert type(repickled) is KustoResultTable
+    assert [r.to_list() for r in repickled] == [r.to_list() for r in table]
+
+
+def test_tables_of_opened_data_sets_can_be_pickled():
+    response = KustoResponseDataSetV2(_load_response("deft.json"))
+
+    with SharedResult(response) as shared:
+        opened = shared.handle.open()
+    table = opened.primary_results[0]
+    assert isinstance(table, SharedResultTable)
+
+    restored = pickle.loads(pickle.dumps(table))
+    assert type(restored) is KustoResultTable
+    assert restored.table_kind == table.table_kind
+    assert [r.to_list() for r in restored] == [r.to_list() for r in response.primary_results[0]]
+    assert [r.to_list() for r in pickle.loads(pickle.dumps(opened)).primary_results[0]] == [r.to_list() for r in restored]
+
+
+def test_shared_data_set():
+    response = KustoResponseDataSetV2(_load_response("deft.json"))
+
+    with SharedResult(response) as shared:
+        restored = pickle.loads(pickle.dumps(response))
+        assert type(restored) is KustoResponseDataSetV2
+        assert restored.tables_names == response.tables_names
+        assert len(restored.primary_results[0]) == len(response.primary_results[0])
+        assert restored.primary_results[0][1]["xdate"] == response.primary_results[0][1]["xdate"]
+
+        opened = shared.handle.open()
+        assert opened.tables_count == response.tables_count
+
+
+def test_shared_result_rejects_other_types():
+    with pytest.raises(TypeError):
+        SharedResult([1, 2, 3])
+
+
+def test_columns_are_views_of_the_segment():
+    rows = [
+        [1, 1.5, True, "a", {"x": [1]}, 2**64, None],
+        [None, None, None, None, None, 5, None],
+        [-3, 2.0, False, "ü", [1, "b"], "NaN", None],
+    ]
+    columns = {"i": "long", "r": "real", "b": "bool", "s": "string", "d": "dynamic", "mixed": "dynamic", "empty": "string"}
+    table = make_v2_response(columns, rows).primary_results[0]
+
+    with SharedResult(table) as shared:
+        opened = shared.handle.open()
+        assert isinstance(opened, SharedResultTable)
+        assert [list(row) for row in opened.raw_rows] == rows
+        assert [row.to_list() for row in opened] == [row.to_list() for row in table]
+
+        numbers = opened.column("i")
+        assert numbers.encoding == "int64"
+        assert numbers.values.format == "q" and numbers.values.readonly
+        assert numbers.values.tolist() == [1, 0, -3]
+        assert numbers.validity.tolist() == [1, 0, 1]
+        assert opened.column(1).values.tolist() == [1.5, 0.0, 2.0]
+        assert opened.column("b").values.tolist() == [True, False, False]
+
+        strings = opened.column("s")
+        assert strings.encoding == "utf8"
+        assert bytes(strings.values) == "aü".encode("utf-8")
+        assert strings.offsets.tolist() == [0, 1, 1, 3]
+        assert [opened.column(name).encoding for name in ["d", "mixed", "empty"]] == ["json", "json", "utf8"]
+        assert list(opened.column("mixed")) == [2**64, 5, "NaN"]
+        assert opened.raw_rows[-1] == rows[-1]
+        assert opened.raw_rows[0:2] == rows[0:2]
+
+
+def _read_in_child(table):
+    return type(table).__name__, [row.to_list() for row in table], table.column("xint64").values.tolist()
+
+
+def test_open_in_spawned_process():
+    response = KustoResponseDataSetV2(_load_response("deft.json"))
+    table = response.primary_results[0]
+
+    with SharedResult(table), multiprocessing.get_context("spawn").Pool(1) as pool:
+        table_type, rows, numbers = pool.apply(_read_in_child, (table,))
+
+    assert table_type == "SharedResultTable"
+    assert rows == [row.to_list() for row in table]
+    assert numbers == [row["xint64"] or 0 for row in table]
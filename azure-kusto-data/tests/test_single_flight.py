@@ -0,0 +1,122 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient
+from azure.kusto.data._single_flight import _AsyncSingleFlight, _SingleFlight
+from tests.kusto_client_common import KustoClientTestsMixin, mocked_requests_post
+
+
+def test_concurrent_calls_share_result():
+    single_flight = _SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait(5)
+        return object()
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(single_flight.do, "key", func) for _ in range(8)]
+        time.sleep(0.2)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert single_flight.in_flight_count() == 0
+
+
+def test_concurrent_calls_share_exception():
+    single_flight = _SingleFlight()
+    release = threading.Event()
+    error = ValueError("failed")
+
+    def func():
+        release.wait(5)
+        raise error
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(single_flight.do, "key", func) for _ in range(4)]
+        time.sleep(0.2)
+        release.set()
+        errors = [f.exception() for f in futures]
+
+    assert all(e is error for e in errors)
+    assert single_flight.in_flight_count() == 0
+
+
+def test_sequential_calls_are_not_shared():
+    single_flight = _SingleFlight()
+    assert single_flight.do("key", lambda: 1) == 1
+    assert single_flight.do("key", lambda: 2) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_concurrent_calls_share_result():
+    single_flight = _AsyncSingleFlight()
+    release = asyncio.Event()
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await release.wait()
+        return object()
+
+    tasks = [asyncio.ensure_future(single_flight.do("key", func)) for _ in range(8)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert single_flight.in_flight_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_async_cancelled_caller_does_not_cancel_others():
+    single_flight = _AsyncSingleFlight()
+    release = asyncio.Event()
+
+    async def func():
+        await release.wait()
+        return 42
+
+    first = asyncio.ensure_future(single_flight.do("key", func))
+    second = asyncio.ensure_future(single_flight.do("key", func))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == 42
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+class TestKustoClientRequestCoalescing(KustoClientTestsMixin):
+    def test_identical_queries_share_request(self):
+        release = threading.Event()
+
+        def slow_post(*args, **kwargs):
+            release.wait(5)
+            return mocked_requests_post(*args, **kwargs)
+
+        with patch("requests.Session.post", side_effect=slow_post) as mock_post:
+            with KustoClient(self.HOST) as client:
+                client.set_request_coalescing(True)
+                with ThreadPoolExecutor(4) as pool:
+                    futures = [pool.submit(client.execute_query, "PythonTest", "Deft") for _ in range(4)]
+                    time.sleep(0.2)
+                    release.set()
+                    responses = [f.result() for f in futures]
+
+        assert mock_post.call_count == 1
+        assert all(r is responses[0] for r in responses)
+        self._assert_sanity_query_response(responses[0])
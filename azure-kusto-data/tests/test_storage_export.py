@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import os
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data.exceptions import KustoOperationError
+from azure.kusto.data.operations import OperationHandle
+from azure.kusto.data.storage_export import build_export_command, export_to_directory
+
+from .kusto_client_common import make_v2_response
+
+CONTAINER = "https://account.blob.core.windows.net/exports"
+DETAILS_COLUMNS = {"Path": "string", "NumRecords": "long", "SizeInBytes": "long"}
+
+
+class FakeClient:
+    def __init__(self, error=None):
+        self.error = error
+        self.commands = []
+
+    def execute_mgmt_async_operation(self, database, query, properties=None):
+        self.commands.append(query)
+        handle = OperationHandle(database, "op1")
+        if self.error is None:
+            handle._future.set_result(None)
+        else:
+            handle._future.set_exception(self.error)
+        return handle
+
+    def execute_mgmt(self, database, query, properties=None):
+        self.commands.append(query)
+        paths = ["{}/prefix_{}.snappy.parquet".format(CONTAINER, i) for i in range(3)]
+        return make_v2_response(DETAILS_COLUMNS, [[path, 10 * (i + 1), 100] for i, path in enumerate(paths)])
+
+
+class FakeBlobClient:
+    urls = []
+
+    def __init__(self, url, credential):
+        self.url = url
+        self.credential = credential
+
+    @classmethod
+    def from_blob_url(cls, url, credential=None):
+        cls.urls.append((url, credential))
+        return cls(url, credential)
+
+    def download_blob(self):
+        return self
+
+    def readinto(self, file):
+        file.write(self.url.encode())
+
+
+@pytest.fixture(autouse=True)
+def fake_blob_client():
+    FakeBlobClient.urls = []
+    with patch("azure.storage.blob.BlobClient", FakeBlobClient):
+        yield
+
+
+def test_build_export_command():
+    assert build_export_command(" Events ", CONTAINER + ";impersonate", "prefix") == (
+        '.export async compressed to parquet (h@"https://account.blob.core.windows.net/exports;impersonate") with (namePrefix = @"prefix") <| Events'
+    )
+    assert build_export_command("Events", CONTAINER, 'a"b\\') == (
+        '.export async compressed to parquet (h@"https://account.blob.core.windows.net/exports") with (namePrefix = @"a""b\\") <| Events'
+    )
+
+
+def test_export_with_credential(tmp_path):
+    client = FakeClient()
+    credential = object()
+    exported = export_to_directory(client, "db", "Events", CONTAINER + ";impersonate", tmp_path / "out", credential=credential, name_prefix="prefix")
+
+    assert client.commands[1] == ".show operation op1 details"
+    assert exported.operation_id == "op1"
+    assert exported.records == 60
+    assert [os.path.basename(path) for path in exported.files] == ["prefix_{}.snappy.parquet".format(i) for i in range(3)]
+    with open(exported.files[2], "rb") as file:
+        assert file.read() == "{}/prefix_2.snappy.parquet".format(CONTAINER).encode()
+    assert all(used_credential is credential for _, used_credential in FakeBlobClient.urls)
+
+
+def test_export_with_sas(tmp_path):
+    exported = export_to_directory(FakeClient(), "db", "Events", CONTAINER + "?sv=token", str(tmp_path), credential=object())
+    assert len(exported.files) == 3
+    assert all(url.endswith(".parquet?sv=token") and credential is None for url, credential in FakeBlobClient.urls)
+
+
+def test_failed_export(tmp_path):
+    with pytest.raises(KustoOperationError):
+        export_to_directory(FakeClient(KustoOperationError("op1", "Failed", "no access")), "db", "Events", CONTAINER, str(tmp_path))
+    assert FakeBlobClient.urls == []
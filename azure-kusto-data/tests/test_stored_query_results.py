@@ -0,0 +1,85 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import re
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient
+from azure.kusto.data.stored_query_results import PagedQueryResult
+from tests.kusto_client_common import KustoClientTestsMixin, make_v2_response
+
+
+class FakeStoredQueryResults:
+    """Serves the count and page queries of a stored query result with `rows_count` rows, numbered from 1."""
+
+    def __init__(self, rows_count: int):
+        self.rows_count = rows_count
+        self.commands = []
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def execute_mgmt(self, database, query, properties=None):
+        self.commands.append(query)
+        return make_v2_response({}, [])
+
+    def execute_query(self, database, query, properties=None):
+        with self.lock:
+            self.queries.append(query)
+        if query.endswith("| count"):
+            return make_v2_response({"Count": "long"}, [[self.rows_count]])
+        first, last = map(int, re.search(r"between \((\d+) \.\. (\d+)\)", query).groups())
+        return make_v2_response({"Value": "long"}, [[i] for i in range(first, min(last, self.rows_count) + 1)])
+
+
+class TestPagedQueryResult(KustoClientTestsMixin):
+    def test_create(self):
+        service = FakeStoredQueryResults(0)
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "execute_mgmt", service.execute_mgmt):
+            pages = PagedQueryResult.create(client, "db", "Events | sort by Timestamp asc ", name="events", page_size=10)
+            pages.drop()
+
+        assert pages.name == "events"
+        assert pages.page_size == 10
+        assert service.commands == [
+            ".set stored_query_result events with (previewCount = 0, expiresAfter = 86400s) <| Events | sort by Timestamp asc\n| serialize Num = row_number()",
+            ".drop stored_query_result events",
+        ]
+
+    def test_names_must_be_identifiers(self):
+        service = FakeStoredQueryResults(0)
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "execute_mgmt", service.execute_mgmt):
+            for name in ["events <| print 1", 'events")', "1events"]:
+                with pytest.raises(ValueError):
+                    PagedQueryResult.create(client, "db", "Events", name=name)
+                with pytest.raises(ValueError):
+                    PagedQueryResult(client, "db", name)
+
+        assert service.commands == []
+
+    def test_reads_all_pages_in_order(self):
+        service = FakeStoredQueryResults(25)
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "execute_query", service.execute_query):
+            pages = PagedQueryResult(client, "db", "events", page_size=10, prefetch=3)
+            assert pages.page_count == 3
+            values = [row["Value"] for row in pages]
+
+        assert values == list(range(1, 26))
+        assert pages.next_page == 3
+        assert 'stored_query_result("events")\n| where Num between (11 .. 20)\n| order by Num asc\n| project-away Num' in service.queries
+
+    def test_resume_after_interruption(self):
+        service = FakeStoredQueryResults(50)
+        with KustoClient(self.HOST) as client, patch.object(KustoClient, "execute_query", service.execute_query):
+            pages = PagedQueryResult(client, "db", "events", page_size=10)
+            for page in pages.iter_pages():
+                if page.raw_rows[0][0] == 21:
+                    break
+            assert pages.next_page == 3
+
+            resumed = PagedQueryResult(client, "db", "events", page_size=10, next_page=pages.next_page)
+            frame = resumed.to_dataframe()
+
+        assert list(frame["Value"]) == list(range(31, 51))
+        assert not any(query.startswith(".set") for query in service.queries)
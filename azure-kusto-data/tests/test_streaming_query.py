@@ -1,8 +1,13 @@
+import asyncio
 import os
+import threading
 from io import BytesIO
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from azure.kusto.data import ClientRequestProperties, KustoClient
+from azure.kusto.data.aio.client import KustoClient as AsyncKustoClient
 from azure.kusto.data._models import WellKnownDataSet, KustoResultRow, KustoResultColumn
 from azure.kusto.data.aio.response import KustoStreamingResponseDataSet as AsyncKustoStreamingResponseDataSet
 from azure.kusto.data.aio.streaming_response import JsonTokenReader as AsyncJsonTokenReader, StreamingDataSetEnumerator as AsyncProgressiveDataSetEnumerator
@@ -26,6 +31,12 @@ class MockAioFile:
     async def read(self, n=-1):
         return self.file.read(n)
 
+    @staticmethod
+    def from_file(file) -> "MockAioFile":
+        mock_file = MockAioFile(file.name)
+        mock_file.file = file
+        return mock_file
+
 
 class AsyncBytesIO:
     def __init__(self, string):
@@ -211,6 +222,170 @@ class TestStreamingQuery(KustoClientTestsMixin):
                 rows = [r async for r in table]
 
 
+class InterruptedStream:
+    """Returns the first bytes of a file, then raises KeyboardInterrupt as if the user pressed Ctrl+C while waiting for more."""
+
+    def __init__(self, filename, first_read_size):
+        with open(filename, "rb") as f:
+            self.data = f.read(first_read_size)
+        self.reads = 0
+
+    def read(self, n=-1):
+        self.reads += 1
+        if self.reads > 1:
+            raise KeyboardInterrupt()
+        return self.data
+
+
+class StalledAioStream:
+    """Returns the first bytes of a file, then waits forever for more."""
+
+    def __init__(self, filename, first_read_size):
+        with open(filename, "rb") as f:
+            self.data = f.read(first_read_size)
+        self.reads = 0
+
+    async def read(self, n=-1):
+        self.reads += 1
+        if self.reads > 1:
+            await asyncio.Event().wait()
+        return self.data
+
+
+class TestStreamingQueryClose(KustoClientTestsMixin):
+    @staticmethod
+    def input_path(file_name: str) -> str:
+        return os.path.join(os.path.dirname(__file__), "input", file_name)
+
+    def test_close_before_completion_abandons_the_query(self):
+        closes = []
+        with open(self.input_path("deft.json"), "rb") as f:
+            with KustoStreamingResponseDataSet(StreamingDataSetEnumerator(JsonTokenReader(f), closes.append)) as response:
+                for _ in next(response.iter_primary_results()):
+                    break
+            response.close()
+
+        assert closes == [True]
+
+    def test_close_after_completion(self):
+        closes = []
+        with open(self.input_path("deft.json"), "rb") as f:
+            with KustoStreamingResponseDataSet(StreamingDataSetEnumerator(JsonTokenReader(f), closes.append)) as response:
+                for table in response.iter_primary_results():
+                    list(table)
+
+        assert closes == [False]
+
+    def test_keyboard_interrupt_closes(self):
+        closes = []
+        stream = InterruptedStream(self.input_path("deft.json"), 2000)
+        response = KustoStreamingResponseDataSet(StreamingDataSetEnumerator(JsonTokenReader(stream), closes.append))
+        with pytest.raises(KeyboardInterrupt):
+            for table in response.iter_primary_results():
+                list(table)
+
+        assert closes == [True]
+
+    def test_client_cancels_abandoned_query(self):
+        properties = ClientRequestProperties()
+        properties.client_request_id = "my-request-id"
+        with open(self.input_path("deft.json"), "rb") as f:
+            http_response = MagicMock(raw=f)
+            with KustoClient(self.HOST) as client:
+                with patch.object(KustoClient, "_execute", return_value=http_response), patch.object(KustoClient, "execute_mgmt") as execute_mgmt:
+                    with client.execute_streaming_query("PythonTest", "Deft", properties=properties) as response:
+                        next(next(response.iter_primary_results()))
+
+        http_response.close.assert_called_once()
+        execute_mgmt.assert_called_once_with("PythonTest", '.cancel query "my-request-id"')
+
+    def test_interrupted_query_is_cancelled_in_the_background(self):
+        properties = ClientRequestProperties()
+        properties.client_request_id = "my-request-id"
+        http_response = MagicMock(raw=InterruptedStream(self.input_path("deft.json"), 2000))
+        cancels = []
+        sent = threading.Event()
+        release = threading.Event()
+
+        def execute_mgmt(client, database, query, properties=None):
+            cancels.append((query, properties.get_option(ClientRequestProperties.request_timeout_option_name, None)))
+            sent.set()
+            release.wait(5)
+            raise KustoServiceError("unreachable")
+
+        with KustoClient(self.HOST) as client:
+            with patch.object(KustoClient, "_execute", return_value=http_response), patch.object(KustoClient, "execute_mgmt", execute_mgmt):
+                response = client.execute_streaming_query("PythonTest", "Deft", properties=properties)
+                with pytest.raises(KeyboardInterrupt):
+                    for table in response.iter_primary_results():
+                        list(table)
+                # The connection is released before the cancellation completes
+                http_response.close.assert_called_once()
+                assert sent.wait(5)
+                release.set()
+
+        assert cancels == [('.cancel query "my-request-id"', KustoClient._interrupted_cancel_timeout)]
+
+    def test_client_doesnt_cancel_completed_query(self):
+        with open(self.input_path("deft.json"), "rb") as f:
+            http_response = MagicMock(raw=f)
+            with KustoClient(self.HOST) as client:
+                with patch.object(KustoClient, "_execute", return_value=http_response), patch.object(KustoClient, "execute_mgmt") as execute_mgmt:
+                    with client.execute_streaming_query("PythonTest", "Deft") as response:
+                        for table in response.iter_primary_results():
+                            list(table)
+
+        http_response.close.assert_called_once()
+        execute_mgmt.assert_not_called()
+
+    def test_cancel_query_command_escaping(self):
+        assert KustoClient._get_cancel_query_command('a"b\\c') == '.cancel query "a\\"b\\\\c"'
+
+    @pytest.mark.asyncio
+    async def test_task_cancellation_closes_async(self):
+        closed = asyncio.Event()
+        closes = []
+
+        async def on_close(abandoned):
+            closes.append(abandoned)
+            closed.set()
+
+        stream = StalledAioStream(self.input_path("deft.json"), 2000)
+        response = AsyncKustoStreamingResponseDataSet(AsyncProgressiveDataSetEnumerator(AsyncJsonTokenReader(stream), on_close))
+
+        async def consume():
+            async for table in response.iter_primary_results():
+                async for _ in table:
+                    pass
+
+        task = asyncio.ensure_future(consume())
+        while stream.reads < 2:
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await asyncio.wait_for(closed.wait(), 5)
+        assert closes == [True]
+
+    @pytest.mark.asyncio
+    async def test_client_cancels_abandoned_query_async(self):
+        properties = ClientRequestProperties()
+        properties.client_request_id = "my-request-id"
+        with open(self.input_path("deft.json"), "rb") as f:
+            http_response = MagicMock(content=MockAioFile.from_file(f))
+            async with AsyncKustoClient(self.HOST) as client:
+                with (
+                    patch.object(AsyncKustoClient, "_execute", AsyncMock(return_value=http_response)),
+                    patch.object(AsyncKustoClient, "execute_mgmt", AsyncMock()) as execute_mgmt,
+                ):
+                    async with await client.execute_streaming_query("PythonTest", "Deft", properties=properties) as response:
+                        await (await response.iter_primary_results().__anext__()).__anext__()
+
+        http_response.close.assert_called_once()
+        execute_mgmt.assert_awaited_once_with("PythonTest", '.cancel query "my-request-id"')
+
+
 class TestJsonTokenReader:
     def get_reader(self, data) -> JsonTokenReader:
         return JsonTokenReader(BytesIO(data.encode()))
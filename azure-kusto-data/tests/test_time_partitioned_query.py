@@ -0,0 +1,97 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from azure.kusto.data import KustoClient
+from azure.kusto.data.bulk import execute_time_partitioned_query, split_time_range
+from azure.kusto.data.exceptions import KustoApiError, KustoThrottlingError
+from tests.kusto_client_common import KustoClientTestsMixin, make_v2_response
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 1, 5)
+
+
+def test_split_time_range():
+    ranges = split_time_range(START, END, 4)
+    assert ranges == [(START + timedelta(days=i), START + timedelta(days=i + 1)) for i in range(4)]
+
+    ranges = split_time_range(START, START + timedelta(seconds=10), 3)
+    assert ranges[0][0] == START and ranges[-1][1] == START + timedelta(seconds=10)
+    assert all(r[1] == n[0] for r, n in zip(ranges, ranges[1:]))
+
+    with pytest.raises(ValueError):
+        split_time_range(END, START, 2)
+
+
+class TestTimePartitionedQuery(KustoClientTestsMixin):
+    def test_slices_are_merged_in_order(self):
+        calls = []
+        lock = threading.Lock()
+
+        def execute_query(self, database, query, properties=None):
+            start = properties.get_parameter("_startTime", None)
+            with lock:
+                calls.append((database, query, start, properties.get_parameter("_endTime", None)))
+            return make_v2_response({"Start": "string"}, [[start]])
+
+        with patch.object(KustoClient, "execute_query", execute_query):
+            with KustoClient(self.HOST) as client:
+                response = execute_time_partitioned_query(client, "db", "T | where Timestamp >= _startTime and Timestamp < _endTime", START, END, 4)
+
+        assert len(calls) == 4
+        assert all(c[1].startswith("declare query_parameters(_startTime:datetime, _endTime:datetime);\nT | where") for c in calls)
+        assert sorted(c[2] for c in calls) == [
+            "datetime(2024-01-01T00:00:00.000000Z)",
+            "datetime(2024-01-02T00:00:00.000000Z)",
+            "datetime(2024-01-03T00:00:00.000000Z)",
+            "datetime(2024-01-04T00:00:00.000000Z)",
+        ]
+        assert [row["Start"] for row in response.primary_results[0]] == sorted(c[2] for c in calls)
+
+    def test_aware_datetimes_are_converted_to_utc(self):
+        seen = []
+
+        def execute_query(self, database, query, properties=None):
+            seen.append(properties.get_parameter("_startTime", None))
+            return make_v2_response({"x": "int"}, [])
+
+        start = datetime(2024, 1, 1, 2, tzinfo=timezone(timedelta(hours=2)))
+        with patch.object(KustoClient, "execute_query", execute_query):
+            with KustoClient(self.HOST) as client:
+                execute_time_partitioned_query(client, "db", "T", start, start + timedelta(hours=1), 1)
+
+        assert seen == ["datetime(2024-01-01T00:00:00.000000Z)"]
+
+    @patch("azure.kusto.data.bulk.time.sleep")
+    def test_transient_failures_are_retried_per_slice(self, mock_sleep):
+        failures = {"datetime(2024-01-02T00:00:00.000000Z)": 2}
+
+        def execute_query(self, database, query, properties=None):
+            start = properties.get_parameter("_startTime", None)
+            if failures.get(start, 0) > 0:
+                failures[start] -= 1
+                raise KustoThrottlingError("throttled")
+            return make_v2_response({"Start": "string"}, [[start]])
+
+        with patch.object(KustoClient, "execute_query", execute_query):
+            with KustoClient(self.HOST) as client:
+                response = execute_time_partitioned_query(client, "db", "T", START, END, 4, retries=2)
+
+        assert len(response.primary_results[0]) == 4
+        assert mock_sleep.call_count == 2
+
+    @patch("azure.kusto.data.bulk.time.sleep")
+    def test_permanent_failure_is_raised(self, mock_sleep):
+        def execute_query(self, database, query, properties=None):
+            raise KustoApiError({"error": {"code": "BadRequest", "message": "Syntax error", "@permanent": True}})
+
+        with patch.object(KustoClient, "execute_query", execute_query):
+            with KustoClient(self.HOST) as client:
+                with pytest.raises(KustoApiError):
+                    execute_time_partitioned_query(client, "db", "T", START, END, 2)
+
+        mock_sleep.assert_not_called()
@@ -11,6 +11,7 @@ from azure.storage.queue import QueueServiceClient, TextBase64EncodePolicy
 from azure.kusto.data import KustoClient, KustoConnectionStringBuilder
 from azure.kusto.data._telemetry import MonitoredActivity
 from azure.kusto.data.exceptions import KustoClosedError
+from azure.kusto.data.registry import KustoClientRegistry
 
 from ._ingest_telemetry import IngestTracingAttributes
 from ._resource_manager import _ResourceManager, _ResourceUri
@@ -33,9 +34,13 @@ class QueuedIngestClient(BaseIngestClient):
     _SERVICE_CLIENT_TIMEOUT_SECONDS = 10 * 60
     _MAX_RETRIES = 3
 
-    def __init__(self, kcsb: Union[str, KustoConnectionStringBuilder], auto_correct_endpoint: bool = True):
+    def __init__(
+        self, kcsb: Union[str, KustoConnectionStringBuilder], auto_correct_endpoint: bool = True, client_registry: Optional[KustoClientRegistry] = None
+    ):
         """Kusto Ingest Client constructor.
         :param kcsb: The connection string to initialize KustoClient.
+        :param client_registry: If provided, the client of the ingestion endpoint is shared through the registry instead of created for this client.
+            `set_proxy` isn't supported then, set the proxy in the registry's client factory instead.
         """
         super().__init__()
         if not isinstance(kcsb, KustoConnectionStringBuilder):
@@ -46,7 +51,7 @@ class QueuedIngestClient(BaseIngestClient):
 
         self._proxy_dict: Optional[Dict[str, str]] = None
         self._connection_datasource = kcsb.data_source
-        self._resource_manager = _ResourceManager(KustoClient(kcsb))
+        self._resource_manager = _ResourceManager(client_registry.acquire(kcsb) if client_registry is not None else KustoClient(kcsb))
         self._endpoint_service_type = None
         self._suggested_endpoint_uri = None
         self.application_for_tracing = kcsb.client_details.application_for_tracing
@@ -11,6 +11,7 @@ from azure.core.tracing import SpanKind
 from azure.kusto.data import KustoConnectionStringBuilder
 from azure.kusto.data.exceptions import KustoApiError, KustoClosedError, KustoThrottlingError
 from azure.kusto.data._telemetry import MonitoredActivity
+from azure.kusto.data.registry import KustoClientRegistry
 
 from . import BlobDescriptor, FileDescriptor, IngestionProperties, StreamDescriptor
 from ._ingest_telemetry import IngestTracingAttributes
@@ -42,10 +43,11 @@ class ManagedStreamingIngestClient(BaseIngestClient):
         engine_kcsb: Union[KustoConnectionStringBuilder, str],
         dm_kcsb: Union[KustoConnectionStringBuilder, str, None] = None,
         auto_correct_endpoint: bool = True,
+        client_registry: Optional[KustoClientRegistry] = None,
     ):
         super().__init__()
-        self.queued_client = QueuedIngestClient(dm_kcsb if dm_kcsb is not None else engine_kcsb, auto_correct_endpoint)
-        self.streaming_client = KustoStreamingIngestClient(engine_kcsb, auto_correct_endpoint)
+        self.queued_client = QueuedIngestClient(dm_kcsb if dm_kcsb is not None else engine_kcsb, auto_correct_endpoint, client_registry)
+        self.streaming_client = KustoStreamingIngestClient(engine_kcsb, auto_correct_endpoint, client_registry)
         self._set_retry_settings()
 
     def close(self) -> None:
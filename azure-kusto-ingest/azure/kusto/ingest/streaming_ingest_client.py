@@ -7,6 +7,7 @@ from azure.core.tracing.decorator import distributed_trace
 from azure.core.tracing import SpanKind
 
 from azure.kusto.data import KustoClient, KustoConnectionStringBuilder, ClientRequestProperties
+from azure.kusto.data.registry import KustoClientRegistry
 
 from ._ingest_telemetry import IngestTracingAttributes
 from .base_ingest_client import BaseIngestClient, IngestionResult, IngestionStatus
@@ -21,9 +22,13 @@ class KustoStreamingIngestClient(BaseIngestClient):
     Tests are run using pytest.
     """
 
-    def __init__(self, kcsb: Union[KustoConnectionStringBuilder, str], auto_correct_endpoint: bool = True):
+    def __init__(
+        self, kcsb: Union[KustoConnectionStringBuilder, str], auto_correct_endpoint: bool = True, client_registry: Optional[KustoClientRegistry] = None
+    ):
         """Kusto Streaming Ingest Client constructor.
         :param KustoConnectionStringBuilder kcsb: The connection string to initialize KustoClient.
+        :param client_registry: If provided, the client of the engine is shared through the registry instead of created for this client.
+            `set_proxy` isn't supported then, set the proxy in the registry's client factory instead.
         """
         super().__init__()
 
@@ -32,7 +37,7 @@ class KustoStreamingIngestClient(BaseIngestClient):
 
         if auto_correct_endpoint:
             kcsb["Data Source"] = BaseIngestClient.get_query_endpoint(kcsb.data_source)
-        self._kusto_client = KustoClient(kcsb)
+        self._kusto_client = client_registry.acquire(kcsb) if client_registry is not None else KustoClient(kcsb)
 
     def close(self):
         if not self._is_closed:
@@ -10,6 +10,8 @@ import responses
 from pandas import DataFrame
 
 from azure.kusto.data.data_format import DataFormat
+from azure.kusto.data.exceptions import KustoClientError
+from azure.kusto.data.registry import KustoClientRegistry
 from azure.kusto.ingest import KustoStreamingIngestClient, IngestionProperties, IngestionStatus, ManagedStreamingIngestClient
 
 UUID_REGEX = "[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}"
@@ -192,3 +194,24 @@ class TestKustoStreamingIngestClient:
         assert (
             KustoStreamingIngestClient("https://ingest-somecluster.kusto.windows.net")._kusto_client._kusto_cluster == "https://somecluster.kusto.windows.net/"
         ), "Client URI was not extracted correctly from ingestion endpoint"
+
+    def test_clients_share_the_registry_client(self):
+        with KustoClientRegistry() as registry:
+            engine_client = registry.acquire("https://somecluster.kusto.windows.net")
+            managed_client = ManagedStreamingIngestClient("https://somecluster.kusto.windows.net", client_registry=registry)
+            streaming_client = KustoStreamingIngestClient("https://ingest-somecluster.kusto.windows.net", client_registry=registry)
+
+            assert managed_client.streaming_client._kusto_client.client is engine_client.client
+            assert streaming_client._kusto_client.client is engine_client.client
+            assert managed_client.queued_client._resource_manager._kusto_client._kusto_cluster == "https://ingest-somecluster.kusto.windows.net/"
+
+            # A proxy would reroute the requests of every user of the shared client
+            with pytest.raises(KustoClientError):
+                streaming_client.set_proxy("https://my-proxy.com")
+            with pytest.raises(KustoClientError):
+                managed_client.queued_client.set_proxy("https://my-proxy.com")
+
+            managed_client.close()
+            streaming_client.close()
+            assert not engine_client.client._is_closed
+            engine_client.close()